@@ -57,6 +57,7 @@ const ChatUI = ({
 
 		// Exit handling like DESIGN-1
 		if (input.toLowerCase() === "exit") {
+			await chatManager.endSession();
 			console.log(chalk.dim("\nSession ended\n"));
 			process.exit(0);
 		}
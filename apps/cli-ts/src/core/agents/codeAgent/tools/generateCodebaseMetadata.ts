@@ -1,36 +1,34 @@
 import { startLoader, stopLoader } from "@cli/ui/Loader/loaderManager";
-import { parseCodebase } from "@codebase";
+import { streamCodebase } from "@codebase";
 import generateCallGraph from "@core/context/codebaseMetaData/callgraph";
 import generateClassMetadata from "@core/context/codebaseMetaData/classMetadata";
 import { generateCssMetadata } from "@core/context/codebaseMetaData/cssMetadata";
 import generateFileMetadata from "@core/context/codebaseMetaData/filesMetadata";
 import generateFunctionMetadata from "@core/context/codebaseMetaData/functionMeta";
 import { generateHtmlMetadata } from "@core/context/codebaseMetaData/htmlMetadata";
-import callRAG, { RagClient } from "@transport/zeromqClient";
+import { RagClient } from "@transport/zeromqClient";
 import chalk from "chalk";
 import path from "path";
 
-type CodeEntity = {
-	entity_name: string;
-	code: string;
-	entity_type: string;
-	file_path: string;
-	start_line: number;
-	end_line: number;
-	description?: string;
-};
-
-interface QueryData {
-	path: string;
-	query: "none";
-	parsedCodebase?: CodeEntity[];
-	type: "codebase";
-}
-
 const metadataPath = path.resolve("./.codr/metadata");
 const rag = new RagClient();
 const dirname = process.cwd();
 
+// Groups files into upload batches as they come out of the parser, so the
+// server embeds while later files are still being parsed. A batch is cut as
+// soon as it holds `size` entities; a file's entities always share a batch.
+async function* batchByFile(files: AsyncIterable<any[]>, size = 500) {
+	let batch: any[] = [];
+	for await (const entities of files) {
+		batch.push(...entities);
+		if (batch.length >= size) {
+			yield batch;
+			batch = [];
+		}
+	}
+	if (batch.length > 0) yield batch;
+}
+
 const generateCodebaseMetadata = async () => {
 	startLoader(`Generating Codebase Metadata`);
 	try {
@@ -53,23 +51,16 @@ const generateCodebaseMetadata = async () => {
 		// }
 
 		if (!response.exists) {
-			// Parse codebase
+			// Parse and send to RAG as a streaming index job, uploading files as
+			// they are parsed; no query is needed to build the collection
 			startLoader(
-				chalk.cyan("🔍 Parsing and summarizing codebase..., path: ") + dirname,
+				chalk.cyan("🔍 Parsing and sending codebase to RAG..., path: ") +
+					dirname,
+			);
+			const { success: ragSuccess } = await rag.streamIndexJob(
+				{ target: "codebase", path: dirname },
+				batchByFile(streamCodebase(dirname)),
 			);
-			const parsed = await parseCodebase(dirname);
-			stopLoader(chalk.cyanBright("📄 Parsed: ") + parsed?.length + " items");
-
-			// Send to RAG
-			startLoader(chalk.yellowBright("📡 Sending to RAG..."));
-			const data: QueryData = {
-				path: dirname,
-				parsedCodebase: parsed,
-				type: "codebase",
-				query: "none",
-			};
-
-			const { success: ragSuccess, response: context } = await callRAG(data);
 
 			if (!ragSuccess) {
 				stopLoader("❌ Failed to retrieve context from RAG.");
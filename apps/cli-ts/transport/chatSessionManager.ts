@@ -75,6 +75,21 @@ export class ChatSessionManager {
 		return decision;
 	}
 
+	/**
+	 * Free the server-side session; it would otherwise linger until it expires.
+	 * Best effort: gives up after a second so exiting never hangs on the server.
+	 */
+	async endSession() {
+		await this.ragClient.callRagOnce(
+			{
+				chat_type: "end_chat",
+				session_id: this.sessionId,
+				type: this.type,
+			},
+			1000,
+		);
+	}
+
 	private async updateSummary(currentChat: any) {
 		const { success, decision: newSummary } = await getSummarizeChat({
 			chat: currentChat,
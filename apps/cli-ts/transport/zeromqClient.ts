@@ -50,8 +50,11 @@ export class RagClient {
 		return new Promise((resolve) => setTimeout(resolve, ms));
 	}
 
-	async callRagOnce(payload: any) {
-		const socket = new zmq.Request();
+	/** `receiveTimeout` (ms) bounds the wait for a reply; by default it waits forever. */
+	async callRagOnce(payload: any, receiveTimeout?: number) {
+		const socket = new zmq.Request(
+			receiveTimeout === undefined ? {} : { receiveTimeout, linger: 0 },
+		);
 
 		try {
 			await socket.connect(this.endpoint);
@@ -73,6 +76,71 @@ export class RagClient {
 			await socket.close();
 		}
 	}
+
+	/**
+	 * Upload entities to a streaming `index` job batch by batch, then wait for
+	 * the job to finish. Each batch must hold all entities of its files.
+	 */
+	async streamIndexJob(
+		payload: any,
+		batches: Iterable<any[]> | AsyncIterable<any[]>,
+	) {
+		const socket = new zmq.Request();
+		// The server also takes msgpack and zstd/lz4 bodies (see codec.py), but
+		// this client has no codec dependencies and keeps to JSON; parsed
+		// entities are mostly source text, which msgpack barely shrinks
+		const contentType = "application/json";
+
+		const request = async (frames: string | string[]) => {
+			await socket.send(frames);
+			const reply = await socket.receive();
+			// Replies to a content-typed request carry the content type first
+			return JSON.parse(reply[reply.length - 1].toString());
+		};
+
+		try {
+			await socket.connect(this.endpoint);
+			await this.delay(100);
+
+			const job = await request(
+				JSON.stringify({ ...payload, type: "index", stream: true }),
+			);
+			if (!job.success) {
+				return { success: false, error: job.error };
+			}
+
+			const upload = async (body: string) => {
+				while (true) {
+					const reply = await request([contentType, body, job.job_id]);
+					if (!reply.busy) return reply;
+					await this.delay(200); // Server is still embedding earlier batches
+				}
+			};
+
+			for await (const entities of batches) {
+				const reply = await upload(JSON.stringify({ entities }));
+				if (!reply.success) {
+					return { success: false, error: reply.error };
+				}
+			}
+			await upload(""); // End of stream
+
+			while (true) {
+				const status = await request(
+					JSON.stringify({ type: "job_status", job_id: job.job_id }),
+				);
+				if (["done", "failed", "cancelled"].includes(status.status)) {
+					return { success: status.status === "done", response: status };
+				}
+				await this.delay(500);
+			}
+		} catch (error) {
+			return { success: false, error };
+		} finally {
+			await this.delay(50);
+			await socket.close();
+		}
+	}
 }
 
 // void (async () => {
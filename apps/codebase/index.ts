@@ -5,90 +5,126 @@ import { fileURLToPath } from "url";
 import { extractCodeEntities as extractTSEntities } from "./src/ts/parser/extractCodeEntities";
 import type { CodeEntity } from "./src/ts/shared/types/codeEntity.types";
 
+const ignoredDirs = [
+	".vs",
+	"node_modules",
+	".venv",
+	"__pycache__",
+	".mypy_cache",
+	"pyenv",
+	"myenv",
+	".git",
+	"venv",
+	"dist",
+];
+
+function* walk(dir: string): Generator<string> {
+	for (const entry of fs.readdirSync(dir, { withFileTypes: true })) {
+		const fullPath = path.join(dir, entry.name);
+		if (entry.isDirectory() && !ignoredDirs.includes(entry.name)) {
+			yield* walk(fullPath);
+		} else if (entry.isFile()) {
+			yield fullPath;
+		}
+	}
+}
+
 export async function parseCodebase(folderPath: string): Promise<CodeEntity[]> {
 	const results: CodeEntity[] = [];
+	for await (const entities of streamCodebase(folderPath)) {
+		results.push(...entities);
+	}
+	return results;
+}
 
-	const ignoredDirs = [
-		".vs",
-		"node_modules",
-		".venv",
-		"__pycache__",
-		".mypy_cache",
-		"pyenv",
-		"myenv",
-		".git",
-		"venv",
-		"dist",
-	];
-
-	async function walk(dir: string) {
-		const entries = fs.readdirSync(dir, { withFileTypes: true });
-		const promises: Promise<void>[] = []; // Store promises
+/**
+ * Yields each file's entities as soon as that file is parsed, so callers can
+ * upload them while the rest of the codebase is still being parsed.
+ */
+export async function* streamCodebase(
+	folderPath: string,
+): AsyncGenerator<CodeEntity[]> {
+	const pythonFiles: string[] = [];
 
-		for (const entry of entries) {
-			const fullPath = path.join(dir, entry.name);
+	for (const fullPath of walk(folderPath)) {
+		const ext = path.extname(fullPath);
+		if (ext === ".ts" || ext === ".js" || ext === ".jsx" || ext === ".tsx") {
+			yield extractTSEntities(fullPath);
+		} else if (ext === ".py") {
+			// Parsed together in one interpreter once the walk is done
+			pythonFiles.push(fullPath);
+		}
+	}
 
-			if (entry.isDirectory() && ignoredDirs.includes(entry.name)) {
-				continue;
-			}
+	if (pythonFiles.length > 0) {
+		yield* runPythonParser(pythonFiles);
+	}
+}
 
-			if (entry.isDirectory()) {
-				promises.push(walk(fullPath)); // Recursively call
-			} else if (entry.isFile()) {
-				// Create a promise for each file processing task
-				const fileProcessingPromise = (async () => {
-					const ext = path.extname(entry.name);
-					if (
-						ext === ".ts" ||
-						ext === ".js" ||
-						ext === ".jsx" ||
-						ext === ".tsx"
-					) {
-						const tsResults = extractTSEntities(fullPath);
-						results.push(...tsResults);
-					} else if (ext === ".py") {
-						const pyResults = await runPythonParser(fullPath);
-						results.push(...pyResults);
-					}
-				})();
-				promises.push(fileProcessingPromise);
-			}
+async function* readLines(stream: ReadableStream<Uint8Array>) {
+	const decoder = new TextDecoder();
+	let buffered = "";
+	for await (const chunk of stream) {
+		buffered += decoder.decode(chunk, { stream: true });
+		let newline: number;
+		while ((newline = buffered.indexOf("\n")) !== -1) {
+			yield buffered.slice(0, newline);
+			buffered = buffered.slice(newline + 1);
 		}
-		// Wait for all files and subdirectories in the current directory to be processed
-		await Promise.all(promises);
 	}
-
-	await walk(folderPath);
-	return results;
+	buffered += decoder.decode();
+	if (buffered) yield buffered;
 }
 
-async function runPythonParser(filePath: string): Promise<CodeEntity[]> {
+async function* runPythonParser(filePaths: string[]): AsyncGenerator<CodeEntity[]> {
 	const __dirname = path.dirname(fileURLToPath(import.meta.url));
 	const pythonScriptPath = path.join(__dirname, "src/py/parser/run_parser.py");
 
-	const process = spawn(["uv", "run", pythonScriptPath, filePath], {
-		stdout: "pipe",
-		stderr: "pipe",
-	});
-
-	const output = await new Response(process.stdout).text();
-	const errorOutput = await new Response(process.stderr).text();
+	// One long-lived parser process: paths go in as JSONL on stdin and one
+	// JSON result line per file comes back on stdout, read as it arrives.
+	// Classes are emitted as skeletons so method bodies are not embedded twice.
+	const process = spawn(
+		["uv", "run", pythonScriptPath, "--batch", "--hierarchical"],
+		{
+			stdin: "pipe",
+			stdout: "pipe",
+			stderr: "pipe",
+		},
+	);
+	const errorOutput = new Response(process.stderr).text();
 
-	if (errorOutput) {
-		console.error(
-			`❌ Error from Python parser for ${filePath}:\n${errorOutput}`,
-		);
-		return [];
+	for (const filePath of filePaths) {
+		process.stdin.write(`${JSON.stringify(filePath)}\n`);
 	}
+	process.stdin.end();
 
 	try {
-		return JSON.parse(output);
-	} catch (err) {
-		console.error(
-			`❌ Failed to parse Python parser output for ${filePath}`,
-			err,
-		);
-		console.error(`   Raw output was: "${output}"`);
-		return [];
+		for await (const line of readLines(process.stdout)) {
+			if (!line.trim()) continue;
+			let result: any;
+			try {
+				result = JSON.parse(line);
+			} catch (err) {
+				console.error("❌ Failed to parse Python parser output", err);
+				console.error(`   Raw output was: "${line}"`);
+				continue;
+			}
+			if (result.error) {
+				console.error(
+					`❌ Error from Python parser for ${result.file_path}:\n${result.error}`,
+				);
+				continue;
+			}
+			yield result.entities;
+		}
+	} finally {
+		// The caller may stop early, e.g. when an upload fails
+		if (process.exitCode === null) process.kill();
+	}
+
+	// Per-file errors arrive inline on stdout; stderr only carries diagnostics
+	const diagnostics = (await errorOutput).trim();
+	if (diagnostics) {
+		console.warn(diagnostics);
 	}
 }
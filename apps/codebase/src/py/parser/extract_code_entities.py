@@ -1,59 +1,327 @@
 import ast
+import hashlib
 import os
 
-from typing import List, Dict, Union
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Union
 
+if TYPE_CHECKING:
+    from parse_cache import ParseCache
+
+
+# Bump whenever the shape of extracted entities changes so cached results are invalidated
+PARSER_VERSION = "2"
 
 CodeEntity = Dict[str, Union[str, int]]
+FileResult = Dict[str, Any]
+
+IGNORED_DIRS = {
+    ".vs",
+    "node_modules",
+    ".venv",
+    "__pycache__",
+    ".mypy_cache",
+    ".pytest_cache",
+    ".ruff_cache",
+    ".tox",
+    ".nox",
+    "pyenv",
+    "myenv",
+    ".git",
+    "venv",
+    "env",
+    "site-packages",
+    "dist",
+    "build",
+}
+
+# Files larger than this are generated or vendored far more often than written by hand
+MAX_FILE_SIZE = 1024 * 1024
+BINARY_SNIFF_BYTES = 8192
+
+
+# Statement-list fields that can hold nested defs; expressions never do
+_BODY_FIELDS = ("body", "orelse", "finalbody", "handlers", "cases")
+_DEF_TYPES = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+
+def _line_offsets(data: bytes) -> List[int]:
+    """Byte offset of the start of every line, plus one past the last newline."""
+    offsets = [0]
+    pos = data.find(b"\n")
+    while pos != -1:
+        offsets.append(pos + 1)
+        pos = data.find(b"\n", pos + 1)
+    return offsets
+
+
+def _body_on_header_line(node: ast.AST, lines: List[str]) -> bool:
+    """Whether a def/class body starts on its signature's last line, as in `def f(self): pass`."""
+    first = node.body[0]
+    line = lines[first.lineno - 1]
+    return first.col_offset > len(line) - len(line.lstrip())
+
 
+def _header_lines(node: ast.AST, lines: List[str]) -> List[str]:
+    """Decorators and signature of a def/class, up to where its body starts."""
+    start = node.decorator_list[0].lineno if node.decorator_list else node.lineno
+    body_start = node.body[0].lineno
+    if _body_on_header_line(node, lines):
+        return lines[start - 1:body_start]
+    return lines[start - 1:body_start - 1]
 
-def extract_code_entities(file_path: str) -> List[CodeEntity]:
-    with open(file_path, "r", encoding="utf-8") as f:
-        code = f.read()
-    lines = code.splitlines()
 
-    tree = ast.parse(code)
+def _class_skeleton(node: ast.ClassDef, lines: List[str]) -> str:
+    """Signature, docstring, attributes and member signatures of a class."""
+    skeleton = _header_lines(node, lines)
+    # Statements sharing the header's last line, as in `class A: x = 1`, are already in it
+    header_end = node.body[0].lineno if _body_on_header_line(node, lines) else 0
+    for stmt in node.body:
+        if stmt.lineno <= header_end:
+            continue
+        end = getattr(stmt, "end_lineno", None) or stmt.lineno
+        is_docstring = (
+            stmt is node.body[0]
+            and isinstance(stmt, ast.Expr)
+            and isinstance(stmt.value, ast.Constant)
+            and isinstance(stmt.value.value, str)
+        )
+        if is_docstring or isinstance(stmt, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+            skeleton.extend(lines[stmt.lineno - 1:end])
+        elif isinstance(stmt, (ast.ClassDef,) + _DEF_TYPES):
+            header = _header_lines(stmt, lines)
+            skeleton.extend(header)
+            if not _body_on_header_line(stmt, lines):
+                # Indent from the def line itself: a wrapped signature's last
+                # line may be `) -> int:` or an indented parameter
+                def_line = lines[stmt.lineno - 1]
+                skeleton.append(def_line[:len(def_line) - len(def_line.lstrip())] + "    ...")
+    return "\n".join(skeleton)
+
+
+def extract_code_entities(
+    file_path: str,
+    source: Optional[Union[str, bytes]] = None,
+    include_code: bool = True,
+    hierarchical: bool = False,
+) -> List[CodeEntity]:
+    """Extract classes, functions and methods from a Python file in one pass.
+
+    With `include_code=False` entities carry `start_byte`/`end_byte` offsets
+    into the file instead of a copy of their source text.
+
+    With `hierarchical=True` a class's code is only its skeleton (see
+    `_class_skeleton`) so method bodies are not emitted twice; classes list
+    their members' qualified names in `children` and members name their class
+    in `parent`.
+    """
+    if source is None:
+        with open(file_path, "rb") as f:
+            source = f.read()
+
+    tree = ast.parse(source)
     entities: List[CodeEntity] = []
 
-    def get_code(start: int, end: int) -> str:
-        return "\n".join(lines[start - 1:end])
-
-    class CodeVisitor(ast.NodeVisitor):
-        def visit_FunctionDef(self, node: ast.FunctionDef):
-            entity_type = "method" if isinstance(getattr(node, "parent", None), ast.ClassDef) else "function"
-            entities.append({
-                "entity_name": node.name,
-                "entity_type": entity_type,
-                "start_line": node.lineno,
-                "end_line": getattr(node, "end_lineno", node.lineno),
-                "code": get_code(node.lineno, getattr(node, "end_lineno", node.lineno)),
-                "file_path": file_path
-            })
-            self.generic_visit(node)
-
-        def visit_ClassDef(self, node: ast.ClassDef):
-            start = node.lineno
-            end = getattr(node, "end_lineno", start)
-            entities.append({
-                "entity_name": node.name,
-                "entity_type": "class",
-                "start_line": start,
-                "end_line": end,
-                "code": get_code(start, end),
-                "file_path": file_path
-            })
-
-            # Add parent info to detect methods
-            for child in node.body:
-                setattr(child, "parent", node)
-
-            self.generic_visit(node)
-
-    # Add parent tracking to tree
-    for node in ast.walk(tree):
-        for child in ast.iter_child_nodes(node):
-            setattr(child, "parent", node)
-
-    visitor = CodeVisitor()
-    visitor.visit(tree)
+    if include_code or hierarchical:
+        text = source.decode("utf-8") if isinstance(source, bytes) else source
+        lines = text.splitlines()
+    if not include_code:
+        data = source.encode("utf-8") if isinstance(source, str) else source
+        offsets = _line_offsets(data)
+
+    classes: Dict[str, CodeEntity] = {}
+
+    def add_entity(node: ast.AST, entity_type: str, qualified_name: str) -> CodeEntity:
+        start = node.lineno
+        end = getattr(node, "end_lineno", None) or start
+        entity: CodeEntity = {
+            "entity_name": node.name,
+            "entity_type": entity_type,
+            "qualified_name": qualified_name,
+            "start_line": start,
+            "end_line": end,
+        }
+        if hierarchical and entity_type == "class":
+            entity["code"] = _class_skeleton(node, lines)
+        elif include_code:
+            entity["code"] = "\n".join(lines[start - 1:end])
+        else:
+            end_byte = offsets[end] - 1 if end < len(offsets) else len(data)
+            if data[end_byte - 1:end_byte] == b"\r":
+                end_byte -= 1
+            entity["start_byte"] = offsets[start - 1]
+            entity["end_byte"] = end_byte
+        entity["file_path"] = file_path
+        entities.append(entity)
+        return entity
+
+    # Explicit stack of (statement, enclosing scope node, qualified prefix)
+    stack = [(node, None, "") for node in reversed(tree.body)]
+    while stack:
+        node, scope, prefix = stack.pop()
+
+        if isinstance(node, (ast.ClassDef,) + _DEF_TYPES):
+            qualified_name = prefix + node.name
+            if isinstance(node, ast.ClassDef):
+                entity_type = "class"
+            else:
+                entity_type = "method" if isinstance(scope, ast.ClassDef) else "function"
+            entity = add_entity(node, entity_type, qualified_name)
+            if hierarchical:
+                if isinstance(scope, ast.ClassDef):
+                    entity["parent"] = prefix[:-1]
+                    classes[entity["parent"]]["children"].append(qualified_name)
+                if entity_type == "class":
+                    entity["children"] = []
+                    classes[qualified_name] = entity
+            scope, prefix = node, qualified_name + "."
+
+        children = []
+        for field in _BODY_FIELDS:
+            children.extend(getattr(node, field, None) or ())
+        stack.extend((child, scope, prefix) for child in reversed(children))
+
     return entities
+
+
+def iter_source_files(root: str) -> Iterator[str]:
+    """Walk `root` and yield every .py file outside ignored/vendor directories."""
+    for dirpath, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if d not in IGNORED_DIRS and not d.endswith(".egg-info")]
+        for name in files:
+            if name.endswith(".py"):
+                yield os.path.join(dirpath, name)
+
+
+def get_skip_reason(file_path: str, max_file_size: int = MAX_FILE_SIZE) -> Optional[str]:
+    size = os.path.getsize(file_path)
+    if size > max_file_size:
+        return f"file too large ({size} bytes)"
+    with open(file_path, "rb") as f:
+        if b"\0" in f.read(BINARY_SNIFF_BYTES):
+            return "binary file"
+    return None
+
+
+def hash_content(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def extract_file_result(
+    file_path: str,
+    max_file_size: int = MAX_FILE_SIZE,
+    known_hash: Optional[str] = None,
+    include_code: bool = True,
+    hierarchical: bool = False,
+) -> FileResult:
+    """Parse one file, reporting failures and skips in the result instead of raising.
+
+    When `known_hash` matches the file's content the parse is skipped and the
+    result is flagged "unchanged" so the caller can reuse its cached entities.
+    """
+    try:
+        reason = get_skip_reason(file_path, max_file_size)
+        if reason:
+            return {"file_path": file_path, "entities": [], "skipped": reason}
+
+        with open(file_path, "rb") as f:
+            data = f.read()
+        content_hash = hash_content(data)
+        if content_hash == known_hash:
+            return {"file_path": file_path, "content_hash": content_hash, "unchanged": True}
+
+        entities = extract_code_entities(file_path, data, include_code, hierarchical)
+        return {"file_path": file_path, "entities": entities, "content_hash": content_hash}
+    except Exception as e:
+        return {"file_path": file_path, "error": str(e)}
+
+
+def extract_files_entities(
+    file_paths: Iterable[str],
+    max_workers: Optional[int] = None,
+    max_file_size: int = MAX_FILE_SIZE,
+    cache: Optional["ParseCache"] = None,
+    include_code: bool = True,
+    hierarchical: bool = False,
+) -> Iterator[FileResult]:
+    """Parse files across a process pool, yielding each result as its file finishes.
+
+    Files with a fresh `cache` entry are answered without being parsed.
+    Results come in completion order, not input order. At most two files per
+    worker are in flight, so `file_paths` is read lazily and a stream on
+    stdin gets answers before it ends. A worker crash is reported as that
+    file's error instead of ending the run.
+    """
+
+    def resolve(result: FileResult) -> FileResult:
+        if cache is None or "error" in result or "skipped" in result:
+            return result
+        if result.pop("unchanged", False):
+            result["entities"] = cache.refresh(result["file_path"])
+        else:
+            cache.store(result["file_path"], result["content_hash"], result["entities"])
+        return result
+
+    def misses() -> Iterator[tuple]:
+        for file_path in file_paths:
+            known_hash = None
+            if cache is not None:
+                entities, known_hash = cache.lookup(file_path)
+                if entities is not None:
+                    hits.append({"file_path": file_path, "entities": entities, "content_hash": known_hash})
+                    continue
+            yield file_path, known_hash
+
+    hits: List[FileResult] = []
+
+    if max_workers == 1:
+        for file_path, known_hash in misses():
+            yield from hits
+            hits.clear()
+            yield resolve(extract_file_result(file_path, max_file_size, known_hash, include_code, hierarchical))
+        yield from hits
+        return
+
+    def collect(future) -> FileResult:
+        try:
+            return resolve(future.result())
+        except Exception as e:  # e.g. BrokenProcessPool
+            return {"file_path": in_flight[future], "error": f"{type(e).__name__}: {e}"}
+
+    window = 2 * (max_workers or os.cpu_count() or 1)
+    in_flight: Dict[Any, str] = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        for path, known_hash in misses():
+            yield from hits
+            hits.clear()
+            if len(in_flight) >= window:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield collect(future)
+                    del in_flight[future]
+            try:
+                future = pool.submit(extract_file_result, path, max_file_size, known_hash, include_code, hierarchical)
+            except Exception as e:  # the pool broke; later files can't be submitted
+                yield {"file_path": path, "error": f"{type(e).__name__}: {e}"}
+                continue
+            in_flight[future] = path
+        yield from hits
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield collect(future)
+                del in_flight[future]
+
+
+def extract_directory_entities(
+    root: str,
+    max_workers: Optional[int] = None,
+    max_file_size: int = MAX_FILE_SIZE,
+    cache: Optional["ParseCache"] = None,
+    include_code: bool = True,
+    hierarchical: bool = False,
+) -> Iterator[FileResult]:
+    """Parse every Python file under `root` in parallel."""
+    return extract_files_entities(
+        iter_source_files(root), max_workers, max_file_size, cache, include_code, hierarchical
+    )
@@ -0,0 +1,132 @@
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+from typing import Any, List, Optional, Tuple
+
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "CODR_PARSE_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "codr", "parse_cache.sqlite3"),
+)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Stores per commit, so a killed run keeps most of what it parsed
+COMMIT_EVERY = 100
+
+
+class ParseCache:
+    """On-disk cache of extracted entities, keyed by path, mtime, size and content hash.
+
+    A file whose mtime and size are unchanged is served without being read.
+    If only the stat changed, the caller re-hashes the file and can refresh the
+    entry instead of re-parsing when the content is identical. Payloads are
+    zlib-compressed JSON; the least recently used entries are evicted once the
+    stored payloads exceed `max_bytes`.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES, variant: str = ""):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        # Parser version and output options; entries from another variant are misses
+        self.variant = variant
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                file_path TEXT NOT NULL,
+                variant TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                payload_size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (file_path, variant)
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        self.hits = 0
+        self.misses = 0
+        self._uncommitted = 0
+
+    def _row(self, file_path: str):
+        return self.conn.execute(
+            "SELECT mtime_ns, size, content_hash, payload FROM entries WHERE file_path = ? AND variant = ?",
+            (os.path.abspath(file_path), self.variant),
+        ).fetchone()
+
+    def lookup(self, file_path: str) -> Tuple[Optional[List[Any]], Optional[str]]:
+        """Return (entities, content_hash) on a stat match, else (None, last known hash)."""
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None, None
+
+        row = self._row(file_path)
+        if row is None:
+            return None, None
+
+        mtime_ns, size, content_hash, payload = row
+        if mtime_ns != st.st_mtime_ns or size != st.st_size:
+            return None, content_hash
+
+        self.hits += 1
+        self._touch(file_path, st)
+        return json.loads(zlib.decompress(payload)), content_hash
+
+    def refresh(self, file_path: str) -> List[Any]:
+        """Accept the cached entities for a file whose content hash still matches."""
+        self.hits += 1
+        self._touch(file_path, os.stat(file_path))
+        return json.loads(zlib.decompress(self._row(file_path)[3]))
+
+    def _touch(self, file_path: str, st: os.stat_result) -> None:
+        self.conn.execute(
+            "UPDATE entries SET mtime_ns = ?, size = ?, last_access = ? WHERE file_path = ? AND variant = ?",
+            (st.st_mtime_ns, st.st_size, time.time(), os.path.abspath(file_path), self.variant),
+        )
+
+    def store(self, file_path: str, content_hash: str, entities: List[Any]) -> None:
+        self.misses += 1
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return
+        payload = zlib.compress(json.dumps(entities, separators=(",", ":")).encode("utf-8"))
+        self.conn.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (os.path.abspath(file_path), self.variant, st.st_mtime_ns, st.st_size, content_hash, payload, len(payload), time.time()),
+        )
+        self._uncommitted += 1
+        if self._uncommitted >= COMMIT_EVERY:
+            self.conn.commit()
+            self._uncommitted = 0
+
+    def evict(self) -> int:
+        """Drop least recently used entries until payloads fit in `max_bytes`."""
+        total = self.conn.execute("SELECT COALESCE(SUM(payload_size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+
+        removed = 0
+        rows = self.conn.execute(
+            "SELECT file_path, variant, payload_size FROM entries ORDER BY last_access"
+        ).fetchall()
+        for file_path, variant, payload_size in rows:
+            if total <= self.max_bytes:
+                break
+            self.conn.execute("DELETE FROM entries WHERE file_path = ? AND variant = ?", (file_path, variant))
+            total -= payload_size
+            removed += 1
+        return removed
+
+    def close(self) -> None:
+        self.evict()
+        self.conn.commit()
+        self.conn.close()
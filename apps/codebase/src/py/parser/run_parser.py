@@ -1,16 +1,129 @@
-import sys
+import argparse
 import json
-from extract_code_entities import extract_code_entities
+import os
+import sys
 
-if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python test_parser.py <file_path>", file=sys.stderr)
+from typing import Iterable, Iterator, Optional
+
+from extract_code_entities import (
+    PARSER_VERSION,
+    extract_code_entities,
+    extract_files_entities,
+    iter_source_files,
+)
+from parse_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_BYTES, ParseCache
+
+
+def iter_python_files(paths: Iterable[str]) -> Iterator[str]:
+    """Expand files and directories into the .py files they contain."""
+    for path in paths:
+        if os.path.isdir(path):
+            yield from iter_source_files(path)
+        else:
+            yield path
+
+
+def iter_stdin_paths(stream) -> Iterator[str]:
+    """Read file paths from JSONL on stdin.
+
+    Each line is either a JSON string or an object with a "file_path" key.
+    """
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError:
+            # Tolerate plain, unquoted paths
+            item = line
+        if isinstance(item, dict):
+            item = item.get("file_path")
+        if item:
+            yield item
+
+
+def run_batch(
+    paths: Iterable[str],
+    max_workers: Optional[int] = None,
+    cache: Optional[ParseCache] = None,
+    include_code: bool = True,
+    hierarchical: bool = False,
+    verbose: bool = False,
+) -> None:
+    """Stream one JSON result line per file as soon as that file is parsed."""
+    try:
+        results = extract_files_entities(
+            paths, max_workers, cache=cache, include_code=include_code, hierarchical=hierarchical
+        )
+        for result in results:
+            sys.stdout.write(json.dumps(result) + "\n")
+            sys.stdout.flush()
+    finally:
+        if cache is not None:
+            if verbose:
+                print(f"Parse cache: {cache.hits} hits, {cache.misses} misses", file=sys.stderr)
+            cache.close()
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description="Extract code entities from Python files")
+    arg_parser.add_argument("paths", nargs="*", help="Files or directories to parse")
+    arg_parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Emit one JSON line per file; reads JSONL paths from stdin when no paths are given",
+    )
+    arg_parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Parser processes for batch mode (default: CPU count, 1 disables the pool)",
+    )
+    arg_parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="Parse cache location for batch mode")
+    arg_parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024))
+    arg_parser.add_argument("--no-cache", action="store_true", help="Always re-parse every file")
+    arg_parser.add_argument(
+        "--spans",
+        action="store_true",
+        help="Emit start_byte/end_byte offsets instead of each entity's code",
+    )
+    arg_parser.add_argument(
+        "--hierarchical",
+        action="store_true",
+        help="Emit class skeletons linked to their methods instead of full class bodies",
+    )
+    arg_parser.add_argument("--verbose", action="store_true", help="Report parse cache statistics on stderr")
+    args = arg_parser.parse_args()
+
+    if args.batch:
+        paths = iter_python_files(args.paths) if args.paths else iter_stdin_paths(sys.stdin)
+        cache = None
+        if not args.no_cache:
+            variant = f"{PARSER_VERSION}:{'spans' if args.spans else 'code'}:{'tree' if args.hierarchical else 'flat'}"
+            cache = ParseCache(args.cache, args.cache_max_mb * 1024 * 1024, variant=variant)
+        run_batch(
+            paths,
+            args.workers,
+            cache,
+            include_code=not args.spans,
+            hierarchical=args.hierarchical,
+            verbose=args.verbose,
+        )
+        return
+
+    if len(args.paths) != 1:
+        print("Usage: python run_parser.py <file_path> | --batch [paths...]", file=sys.stderr)
         sys.exit(1)
 
-    file_path = sys.argv[1]
+    file_path = args.paths[0]
     try:
-        entities = extract_code_entities(file_path)
+        entities = extract_code_entities(file_path, include_code=not args.spans, hierarchical=args.hierarchical)
         print(json.dumps(entities))
     except Exception as e:
         print(f"❌ Error parsing file {file_path}: {str(e)}", file=sys.stderr)
         sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import pytest
+
+from extract_code_entities import extract_code_entities, extract_files_entities
+
+
+def _write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_bytes(text.encode() if isinstance(text, str) else text)
+    return str(path)
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_every_file_gets_exactly_one_result(tmp_path, max_workers):
+    paths = [_write(tmp_path, f"m{i}.py", f"def f{i}():\n    pass\n") for i in range(6)]
+    broken = _write(tmp_path, "broken.py", "def (:\n")
+    binary = _write(tmp_path, "binary.py", b"x = 1\0\n")
+
+    results = {r["file_path"]: r for r in extract_files_entities(paths + [broken, binary], max_workers)}
+
+    assert sorted(results) == sorted(paths + [broken, binary])
+    assert [e["entity_name"] for e in results[paths[3]]["entities"]] == ["f3"]
+    assert "error" in results[broken]
+    assert results[binary]["skipped"] == "binary file"
+
+
+def test_large_files_are_skipped(tmp_path):
+    path = _write(tmp_path, "big.py", "x = 1\n" * 100)
+
+    [result] = extract_files_entities([path], max_workers=1, max_file_size=100)
+    assert result["entities"] == [] and result["skipped"].startswith("file too large")
+
+
+def test_paths_are_read_lazily(tmp_path):
+    paths = [_write(tmp_path, f"m{i}.py", "x = 1\n") for i in range(20)]
+    taken = []
+
+    def stream():
+        for path in paths:
+            taken.append(path)
+            yield path
+
+    results = extract_files_entities(stream(), max_workers=2)
+    next(results)
+    # At most two files per worker are in flight before the first answer
+    assert len(taken) <= 5
+    assert len(list(results)) == 19
+
+
+SOURCE = '''import os
+
+
+def top():
+    def inner():
+        return "é"
+    return inner
+
+
+class Shape:
+    def area(self):
+        return 0
+
+    async def load(self):
+        pass
+'''
+
+
+def test_one_pass_finds_nested_functions_and_methods(tmp_path):
+    entities = extract_code_entities(_write(tmp_path, "m.py", SOURCE))
+
+    assert [(e["qualified_name"], e["entity_type"]) for e in entities] == [
+        ("top", "function"),
+        ("top.inner", "function"),
+        ("Shape", "class"),
+        ("Shape.area", "method"),
+        ("Shape.load", "method"),
+    ]
+    assert entities[1]["code"] == '    def inner():\n        return "é"'
+    assert (entities[1]["start_line"], entities[1]["end_line"]) == (5, 6)
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+def test_spans_point_at_each_entitys_source(tmp_path, newline):
+    data = SOURCE.replace("\n", newline).encode()
+    path = _write(tmp_path, "m.py", data)
+
+    with_code = extract_code_entities(path)
+    spans = extract_code_entities(path, include_code=False)
+
+    assert all("code" not in e for e in spans)
+    for entity, span in zip(with_code, spans):
+        text = data[span["start_byte"]:span["end_byte"]].decode()
+        assert text.replace("\r\n", "\n") == entity["code"]
+
+
+def test_hierarchy_links_classes_and_members(tmp_path):
+    entities = {e["qualified_name"]: e for e in extract_code_entities(_write(tmp_path, "m.py", SOURCE), hierarchical=True)}
+
+    assert entities["Shape"]["children"] == ["Shape.area", "Shape.load"]
+    assert entities["Shape.area"]["parent"] == "Shape"
+    assert "parent" not in entities["top.inner"]
+    # Method bodies are only in the methods' own entities
+    assert entities["Shape"]["code"] == "class Shape:\n    def area(self):\n        ...\n    async def load(self):\n        ..."
+
+
+def test_skeleton_keeps_docstring_attributes_and_wrapped_signatures(tmp_path):
+    source = '''class Config(Base):
+    """Settings."""
+    name: str = "x"
+    retries = 3
+
+    @property
+    def label(
+        self,
+    ) -> str:
+        return self.name
+
+    def short(self): return 1
+
+    class Inner: pass
+'''
+    [config, *_] = extract_code_entities(_write(tmp_path, "m.py", source), hierarchical=True)
+
+    assert config["code"] == "\n".join([
+        "class Config(Base):",
+        '    """Settings."""',
+        '    name: str = "x"',
+        "    retries = 3",
+        "    @property",
+        "    def label(",
+        "        self,",
+        "    ) -> str:",
+        "        ...",
+        "    def short(self): return 1",
+        "    class Inner: pass",
+    ])
+
+
+def test_one_line_class_is_not_repeated(tmp_path):
+    [entity] = extract_code_entities(_write(tmp_path, "m.py", "class A: x = 1\n"), hierarchical=True)
+
+    assert entity["code"] == "class A: x = 1"
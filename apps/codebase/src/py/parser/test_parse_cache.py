@@ -0,0 +1,80 @@
+import os
+import sqlite3
+
+import parse_cache
+from parse_cache import ParseCache
+
+ENTITIES = [{"entity_name": "f", "entity_type": "function", "start_line": 1, "end_line": 2}]
+
+
+def _source(tmp_path, name="a.py", text="def f():\n    pass\n"):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+def test_lookup_hits_on_unchanged_stat(tmp_path):
+    path = _source(tmp_path)
+    cache = ParseCache(str(tmp_path / "cache.sqlite3"))
+    assert cache.lookup(path) == (None, None)
+
+    cache.store(path, "hash-1", ENTITIES)
+    assert cache.lookup(path) == (ENTITIES, "hash-1")
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
+
+
+def test_changed_stat_returns_last_hash_for_refresh(tmp_path):
+    path = _source(tmp_path)
+    cache = ParseCache(str(tmp_path / "cache.sqlite3"))
+    cache.store(path, "hash-1", ENTITIES)
+
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert cache.lookup(path) == (None, "hash-1")
+
+    # Same content under a new mtime: the entry is refreshed, not re-parsed
+    assert cache.refresh(path) == ENTITIES
+    assert cache.lookup(path) == (ENTITIES, "hash-1")
+    cache.close()
+
+
+def test_variants_do_not_share_entries(tmp_path):
+    path = _source(tmp_path)
+    db = str(tmp_path / "cache.sqlite3")
+    spans = ParseCache(db, variant="spans")
+    spans.store(path, "hash-1", ENTITIES)
+    spans.close()
+
+    code = ParseCache(db, variant="code")
+    assert code.lookup(path) == (None, None)
+    code.close()
+
+
+def test_stores_are_committed_before_close(tmp_path, monkeypatch):
+    monkeypatch.setattr(parse_cache, "COMMIT_EVERY", 2)
+    db = str(tmp_path / "cache.sqlite3")
+    cache = ParseCache(db)
+    for i in range(3):
+        cache.store(_source(tmp_path, f"m{i}.py"), f"hash-{i}", ENTITIES)
+
+    # A run killed now keeps the first COMMIT_EVERY entries
+    other = sqlite3.connect(db)
+    assert other.execute("SELECT COUNT(*) FROM entries").fetchone()[0] == 2
+    other.close()
+    cache.close()
+
+
+def test_evict_drops_least_recently_used(tmp_path):
+    cache = ParseCache(str(tmp_path / "cache.sqlite3"))
+    paths = [_source(tmp_path, f"m{i}.py") for i in range(3)]
+    for i, path in enumerate(paths):
+        cache.store(path, f"hash-{i}", ENTITIES * 50)
+    cache.lookup(paths[0])
+
+    size = cache.conn.execute("SELECT MAX(payload_size) FROM entries").fetchone()[0]
+    cache.max_bytes = size
+    assert cache.evict() == 2
+    assert cache.lookup(paths[0])[0] is not None
+    assert cache.lookup(paths[1]) == (None, None)
+    cache.close()
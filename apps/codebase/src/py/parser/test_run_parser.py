@@ -0,0 +1,45 @@
+import io
+import json
+
+from parse_cache import ParseCache
+from run_parser import iter_python_files, iter_stdin_paths, run_batch
+
+
+def test_stdin_paths_accept_strings_objects_and_bare_paths():
+    stream = io.StringIO('"a.py"\n\n{"file_path": "b.py"}\nc.py\n{"other": 1}\n')
+
+    assert list(iter_stdin_paths(stream)) == ["a.py", "b.py", "c.py"]
+
+
+def test_directories_expand_to_their_python_files(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "m.py").write_text("x = 1\n")
+    (tmp_path / "pkg" / "notes.txt").write_text("")
+    (tmp_path / "node_modules").mkdir()
+    (tmp_path / "node_modules" / "vendored.py").write_text("")
+
+    assert list(iter_python_files([str(tmp_path), "single.py"])) == [str(tmp_path / "pkg" / "m.py"), "single.py"]
+
+
+def test_batch_emits_one_line_per_file(tmp_path, capsys):
+    good = tmp_path / "good.py"
+    good.write_text("def f():\n    return 1\n")
+    bad = tmp_path / "bad.py"
+    bad.write_text("def (:\n")
+
+    run_batch([str(good), str(bad)], max_workers=1)
+
+    results = {r["file_path"]: r for r in map(json.loads, capsys.readouterr().out.splitlines())}
+    assert [e["entity_name"] for e in results[str(good)]["entities"]] == ["f"]
+    assert "error" in results[str(bad)]
+
+
+def test_cache_stats_only_when_verbose(tmp_path, capsys):
+    source = tmp_path / "m.py"
+    source.write_text("def f():\n    pass\n")
+
+    run_batch([str(source)], max_workers=1, cache=ParseCache(str(tmp_path / "cache.sqlite3")))
+    assert capsys.readouterr().err == ""
+
+    run_batch([str(source)], max_workers=1, cache=ParseCache(str(tmp_path / "cache.sqlite3")), verbose=True)
+    assert capsys.readouterr().err == "Parse cache: 1 hits, 0 misses\n"
@@ -5,4 +5,11 @@ export interface CodeEntity {
 	end_line: number;
 	code: string;
 	file_path: string;
+	qualified_name?: string;
+	// Present when the Python parser runs with --hierarchical
+	parent?: string;
+	children?: string[];
+	// Present when the Python parser runs with --spans
+	start_byte?: number;
+	end_byte?: number;
 }
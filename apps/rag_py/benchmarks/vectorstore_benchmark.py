@@ -0,0 +1,165 @@
+"""Compare the flat memory-mapped index against Chroma.
+
+For each collection size this builds both backends from the same random
+vectors, then reopens each one in a fresh process and reports open time,
+query latency (p50/p95), recall@k against exact search and peak resident
+memory.
+
+    python -m apps.rag_py.benchmarks.vectorstore_benchmark --sizes 10000 100000 1000000
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+BUILD_BATCH_SIZE = 5000
+TRUTH_BLOCK_ROWS = 65536
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def make_dataset(workdir: Path, size: int, dim: int, queries: int, k: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((size, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    # Queries near stored vectors, like real questions near real chunks
+    picks = rng.choice(size, queries, replace=False)
+    query_vectors = vectors[picks] + 0.3 * rng.standard_normal((queries, dim), dtype=np.float32) / np.sqrt(dim)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+
+    scores = np.empty((queries, 0), dtype=np.float32)
+    rows = np.empty((queries, 0), dtype=np.int64)
+    for start in range(0, size, TRUTH_BLOCK_ROWS):
+        block = query_vectors @ vectors[start:start + TRUTH_BLOCK_ROWS].T
+        scores = np.concatenate([scores, block], axis=1)
+        rows = np.concatenate([rows, np.broadcast_to(np.arange(start, start + block.shape[1]), block.shape)], axis=1)
+        keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, keep, axis=1)
+        rows = np.take_along_axis(rows, keep, axis=1)
+
+    np.save(workdir / "vectors.npy", vectors)
+    np.save(workdir / "queries.npy", query_vectors)
+    np.save(workdir / "truth.npy", rows)
+
+
+def build(backend: str, workdir: Path, dtype: str) -> dict:
+    vectors = np.load(workdir / "vectors.npy", mmap_mode="r")
+    start = time.perf_counter()
+    if backend == "chroma":
+        import chromadb
+
+        collection = chromadb.PersistentClient(path=str(workdir / "chroma")).get_or_create_collection(
+            "bench", metadata={"hnsw:space": "cosine"}
+        )
+        for i in range(0, len(vectors), BUILD_BATCH_SIZE):
+            batch = vectors[i:i + BUILD_BATCH_SIZE]
+            collection.add(ids=[str(j) for j in range(i, i + len(batch))], embeddings=batch.tolist())
+    else:
+        from apps.rag_py.core.flat_vectorstore import FlatVectorStore
+
+        store = FlatVectorStore(workdir / "flat" / "bench", embedding=None, dtype=dtype)
+        for i in range(0, len(vectors), BUILD_BATCH_SIZE):
+            batch = vectors[i:i + BUILD_BATCH_SIZE]
+            store.upsert([str(j) for j in range(i, i + len(batch))], batch)
+    return {"build_seconds": round(time.perf_counter() - start, 2)}
+
+
+def query(backend: str, workdir: Path, k: int) -> dict:
+    queries = np.load(workdir / "queries.npy")
+    truth = np.load(workdir / "truth.npy")
+
+    start = time.perf_counter()
+    if backend == "chroma":
+        import chromadb
+
+        collection = chromadb.PersistentClient(path=str(workdir / "chroma")).get_collection("bench")
+
+        def search(q):
+            return collection.query(query_embeddings=[q.tolist()], n_results=k, include=[])["ids"][0]
+    else:
+        from apps.rag_py.core.flat_vectorstore import FlatVectorStore
+
+        store = FlatVectorStore(workdir / "flat" / "bench", embedding=None)
+
+        def search(q):
+            return [doc.id for doc, _ in store.similarity_search_by_vector_with_score(q, k)]
+
+    # The first query pays for loading the index, so it counts as open time
+    search(queries[0])
+    open_seconds = time.perf_counter() - start
+
+    latencies, found = [], 0
+    for q, expected in zip(queries, truth):
+        t = time.perf_counter()
+        ids = search(q)
+        latencies.append(time.perf_counter() - t)
+        found += len({int(i) for i in ids} & set(expected.tolist()))
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "open_seconds": round(open_seconds, 3),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 2),
+        f"recall@{k}": round(found / (len(queries) * k), 4),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+def _run_child(phase: str, backend: str, workdir: Path, args) -> dict:
+    output = subprocess.run(
+        [
+            sys.executable, "-m", "apps.rag_py.benchmarks.vectorstore_benchmark",
+            "--child", phase, "--backend", backend, "--workdir", str(workdir),
+            "--k", str(args.k), "--dtype", args.dtype,
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--backends", nargs="+", default=["chroma", "flat"], choices=["chroma", "flat"])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    parser.add_argument("--workdir", type=Path)
+    parser.add_argument("--child", choices=["build", "query"], help=argparse.SUPPRESS)
+    parser.add_argument("--backend", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child == "build":
+        print(json.dumps(build(args.backend, args.workdir, args.dtype)))
+        return
+    if args.child == "query":
+        print(json.dumps(query(args.backend, args.workdir, args.k)))
+        return
+
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory(dir=args.workdir) as tmp:
+            workdir = Path(tmp)
+            make_dataset(workdir, size, args.dim, args.queries, args.k)
+            for backend in args.backends:
+                # Separate processes so open time and RSS aren't skewed by the build
+                result = {"backend": backend, "size": size, "dim": args.dim}
+                result.update(_run_child("build", backend, workdir, args))
+                result.update(_run_child("query", backend, workdir, args))
+                print(json.dumps(result), flush=True)
+
+
+if __name__ == "__main__":
+    main()
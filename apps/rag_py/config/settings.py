@@ -5,11 +5,53 @@ class Settings(BaseSettings):
     CHUNK_OVERLAP: int = 128
     TOP_K: int = 10
     PERSIST_DIR: str = "./chroma_db"
+    VECTOR_BACKEND: str = "chroma"  # or "flat" for the memory-mapped exact index
+    FLAT_INDEX_DIR: str = "./flat_index"
+    FLAT_INDEX_DTYPE: str = "float32"  # or "float16" to halve memory
     MAX_RETRIES: int = 3
     TIMEOUT: int = 10
     USER_AGENT: str = "MyRAGPipeline/1.0" 
     EMBEDDING_MODEL: str = "thenlper/gte-small"
     EMBEDDING_DEVICE: str = "cpu"
+    EMBEDDING_BACKEND: str = "huggingface"  # or "onnx"
+    EMBEDDING_THREADS: int = 0  # 0 leaves the runtime default
+    EMBEDDING_WORKERS: int = 1  # >1 embeds in a pool of worker processes
+    EMBEDDING_ONNX_QUANTIZATION: str = ""  # e.g. "avx2", "avx512_vnni", "arm64" for int8
+    EMBEDDING_ONNX_DIR: str = "./onnx_models"
+    EMBEDDING_PARITY_TOLERANCE: float = 0.02
+    EMBEDDING_BATCH_SIZE: int = 32
+    EMBEDDING_MAX_TOKENS: int = 512
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "./embedding_cache/embeddings.sqlite3"
+    EMBEDDING_CACHE_MAX_MB: int = 1024
+    EMBEDDING_CACHE_DTYPE: str = "float32"
+    QUERY_EMBEDDING_CACHE_SIZE: int = 1024
+    QUERY_RESULT_CACHE_SIZE: int = 512  # 0 disables the search result cache
+    QUERY_RESULT_CACHE_TTL: float = 60.0  # seconds
+    SERVER_FAST_WORKERS: int = 2  # ping, check_collection and chat queries
+    SERVER_HEAVY_WORKERS: int = 2  # ingestion and one-shot pipelines
+    SERVER_SHUTDOWN_GRACE: float = 5.0
+    SERVER_INLINE_DECODE_BYTES: int = 1024 * 1024  # larger bodies are decoded on a heavy worker
+    SERVER_QUEUE_LIMIT: int = 64  # waiting requests per type before replying busy
+    # 'upload' counts bodies over SERVER_INLINE_DECODE_BYTES, whatever their type,
+    # since they are queued before they are decoded
+    SERVER_QUEUE_LIMITS: dict[str, int] = {'agent': 4, 'index': 16, 'upload': 8}
+    SERVER_BUSY_RETRY_MS: int = 500
+    SERVER_MAX_CLIENTS: int = 1024  # least recently seen clients are forgotten first
+    SESSION_MAX_SESSIONS: int = 256  # least recently used chat sessions are evicted first
+    SESSION_IDLE_TTL: float = 3600.0  # seconds without a message before a session expires
+    SESSION_MAX_MEMORY_MB: int = 0  # evict sessions while RSS is above this; 0 disables
+    SESSION_WARMUP: bool = True  # init_chat preloads the index and model unless the request sends warm_up: false
+    SESSION_WARMUP_WORKERS: int = 1
+    SESSION_WARMUP_WAIT: float = 30.0  # longest a query waits for its collection's running warm-up
+    SESSION_REGISTRY_PATH: str = "sessions.sqlite3"  # relative to PERSIST_DIR; "" keeps sessions in memory only
+    SESSION_REGISTRY_TTL: float = 7 * 24 * 3600.0  # registered sessions unused this long are forgotten
+    SESSION_REGISTRY_MAX: int = 10000
+    MAX_FINISHED_JOBS: int = 100  # finished index jobs kept for polling
+    INDEX_STREAM_MAX_QUEUED: int = 8  # uploaded batches buffered per streaming job
+    INDEX_STREAM_IDLE_TIMEOUT: float = 300.0
+    METRICS_PROMETHEUS_FILE: str = ""  # e.g. a node_exporter textfile collector path
+    METRICS_DUMP_INTERVAL: float = 15.0
 
     model_config = {
         "extra": "ignore",
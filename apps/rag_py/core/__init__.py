@@ -9,6 +9,17 @@ from .embedding_pipeline import (
 from .embeddings import get_embeddings
 from .loaders import load_doc_file
 from .retriever import Retriever
-from .vectorstore import get_chroma_client, get_vectorstore, initialize_vectorstore
+from .vectorstore import (
+    collection_exists,
+    drop_collection,
+    get_chroma_client,
+    get_collection,
+    get_collection_count,
+    get_collection_version,
+    get_vectorstore,
+    initialize_vectorstore,
+    invalidate_collection,
+    release_vectorstore,
+)
 
-__all__ = ['load_and_split_documents', 'get_embeddings', 'load_documents', 'split_documents', 'create_input_texts', 'create_embeddings', 'add_embeddings_to_vectorstore', 'load_doc_file', 'Retriever', 'get_chroma_client', 'initialize_vectorstore', 'get_vectorstore']
\ No newline at end of file
+__all__ = ['load_and_split_documents', 'get_embeddings', 'load_documents', 'split_documents', 'create_input_texts', 'create_embeddings', 'add_embeddings_to_vectorstore', 'load_doc_file', 'Retriever', 'get_chroma_client', 'initialize_vectorstore', 'get_vectorstore', 'get_collection', 'collection_exists', 'get_collection_count', 'get_collection_version', 'invalidate_collection', 'release_vectorstore', 'drop_collection']
\ No newline at end of file
@@ -1,5 +1,6 @@
 from .add_embeddings_to_vectorstore import add_embeddings_to_vectorstore
 from .check_existing_collection import check_existing_collection
 from .create_embeddings import create_embeddings
+from .sync_collection import sync_codebase_collection, sync_codebase_stream
 
-__all__ = ['add_embeddings_to_vectorstore', 'check_existing_collection', 'create_embeddings']
\ No newline at end of file
+__all__ = ['add_embeddings_to_vectorstore', 'check_existing_collection', 'create_embeddings', 'sync_codebase_collection', 'sync_codebase_stream']
\ No newline at end of file
@@ -2,42 +2,51 @@ import logging
 
 from tqdm import tqdm
 
-from apps.rag_py.core.vectorstore import get_chroma_client
+from apps.rag_py.core.vectorstore import get_collection
+from apps.rag_py.utils.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+def chunk_metadata(chunk: dict) -> dict:
+    return {
+        'file_path': chunk['file_path'],
+        'entity_type': chunk['entity_type'],
+        'entity_name': chunk['entity_name'],
+        'start_line': chunk['start_line'],
+        'end_line': chunk['end_line'],
+        'description': chunk['description'],
+        'isFunction': chunk['isFunction'],
+        'qualified_name': chunk['qualified_name'],
+        'parent': chunk['parent'],
+        'children': chunk['children'],
+        'file_hash': chunk['file_hash'],
+    }
+
 def add_embeddings_to_vectorstore(collection_name: str, enriched_chunks: list[dict]):
     logger.info(f"Storing embeddings in ChromaDB for collection '{collection_name}'")
     
-    client = get_chroma_client()
-    collection = client.get_or_create_collection(name=collection_name)
+    collection = get_collection(collection_name, create=True)
 
     ids = []
     documents = []
     metadatas = []
     embeddings_list = []
 
-    for i, chunk in enumerate(tqdm(enriched_chunks, desc="Preparing chunks for Chroma")):
-        ids.append(str(i))
+    for chunk in tqdm(enriched_chunks, desc="Preparing chunks for Chroma"):
+        ids.append(chunk['id'])
         documents.append(chunk['code'])
-        metadatas.append({
-            'file_path': chunk['file_path'],
-            'entity_type': chunk['entity_type'],
-            'entity_name': chunk['entity_name'],
-            'start_line': chunk['start_line'],
-            'end_line': chunk['end_line'],
-            'description': chunk['description'],
-            'isFunction': chunk['isFunction'],
-        })
+        metadatas.append(chunk_metadata(chunk))
         embeddings_list.append(chunk['embedding'])
 
     try:
-        collection.add(
-            ids=ids,
-            documents=documents,
-            metadatas=metadatas,
-            embeddings=embeddings_list
-        )
+        # IDs are content-addressed, so re-sending an entity overwrites its row
+        with metrics.stage('store'):
+            collection.upsert(
+                ids=ids,
+                documents=documents,
+                metadatas=metadatas,
+                embeddings=embeddings_list
+            )
         logger.info(f"Successfully stored {len(documents)} embeddings in ChromaDB")
 
         return {'success' : True}
@@ -1,19 +1,37 @@
+import hashlib
 import logging
 
-from tqdm import tqdm
-
 from apps.rag_py.core.embeddings import get_embeddings
 
 logger = logging.getLogger(__name__)
-embedder = get_embeddings()
 
-def create_embeddings(code_chunks):
-    logger.info("Starting embedding creation")
+def materialize_code(code_chunks):
+    """Fill in `code` for entities the parser sent as byte spans instead of text"""
+    current_path, data = None, None
+    for chunk in code_chunks:
+        if 'code' in chunk:
+            continue
+        # The parser emits entities grouped by file, so one open file is enough
+        if chunk['file_path'] != current_path:
+            current_path = chunk['file_path']
+            with open(current_path, 'rb') as f:
+                data = f.read()
+        chunk['code'] = data[chunk['start_byte']:chunk['end_byte']].decode('utf-8', errors='replace')
+    return code_chunks
+
+def make_entity_id(chunk):
+    """Stable ID from file path, qualified name and a hash of the embedded content"""
+    content = '\0'.join((chunk['entity_type'], chunk.get('description', ''), chunk['code']))
+    content_hash = hashlib.blake2b(content.encode('utf-8'), digest_size=8).hexdigest()
+    qualified_name = chunk.get('qualified_name', chunk['entity_name'])
+    return f"{chunk['file_path']}::{qualified_name}::{content_hash}"
+
+def enrich_code_chunks(code_chunks):
+    """Build embedding input text, metadata and ID for each parsed entity"""
+    materialize_code(code_chunks)
 
-    input_texts = []
     enriched_chunks = []
-    
-    print(code_chunks[0])
+    seen_ids = set()
 
     # Build input strings and attach metadata
     for chunk in code_chunks:
@@ -28,7 +46,14 @@ def create_embeddings(code_chunks):
             f"Code:\n{chunk['code']}"
         )
 
+        entity_id = make_entity_id(chunk)
+        # Identical duplicates in one file would share an ID; keep the first
+        if entity_id in seen_ids:
+            continue
+        seen_ids.add(entity_id)
+
         enriched_chunks.append({
+            'id': entity_id,
             'file_path': chunk['file_path'],
             'entity_type': chunk['entity_type'],
             'entity_name': chunk['entity_name'],
@@ -37,17 +62,28 @@ def create_embeddings(code_chunks):
             'code': chunk['code'],
             'text': input_text,
             'description': description,
-            'isFunction': chunk['entity_type'] == 'function'
+            'isFunction': chunk['entity_type'] == 'function',
+            # Hierarchical parser output links class skeletons and their methods
+            'qualified_name': chunk.get('qualified_name', chunk['entity_name']),
+            'parent': chunk.get('parent', ''),
+            'children': ','.join(chunk.get('children', [])),
+            'file_hash': chunk.get('file_hash', ''),
         })
 
-        input_texts.append(input_text)
+    return enriched_chunks
 
+def embed_chunks(enriched_chunks):
     logger.info("Embedding all code chunks (batched)")
-    vectors = embedder.embed_documents(input_texts)
+    # Resolved per call: importing this module must not load a model or start
+    # embedding workers (spawned workers re-import the server's modules)
+    vectors = get_embeddings().embed_documents([chunk['text'] for chunk in enriched_chunks])
 
-    for i, vec in enumerate(vectors):
-        enriched_chunks[i]['embedding'] = vec
-        enriched_chunks[i]['id'] = f"{enriched_chunks[i]['file_path']}_{enriched_chunks[i]['entity_name']}_{i}"
+    for chunk, vec in zip(enriched_chunks, vectors):
+        chunk['embedding'] = vec
 
     logger.info(f"Embedding creation completed. Created {len(enriched_chunks)} embeddings.")
     return enriched_chunks
+
+def create_embeddings(code_chunks):
+    logger.info("Starting embedding creation")
+    return embed_chunks(enrich_code_chunks(code_chunks))
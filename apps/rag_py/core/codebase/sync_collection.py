@@ -0,0 +1,202 @@
+import hashlib
+import json
+import logging
+from collections import defaultdict
+from typing import Callable, Iterable, Optional
+
+from apps.rag_py.core.codebase.add_embeddings_to_vectorstore import (
+    add_embeddings_to_vectorstore,
+    chunk_metadata,
+)
+from apps.rag_py.core.codebase.create_embeddings import (
+    embed_chunks,
+    enrich_code_chunks,
+    materialize_code,
+)
+from apps.rag_py.core.vectorstore import get_collection, ingest_lock
+from apps.rag_py.utils.cancellation import check_cancelled
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+class StoreError(Exception):
+    pass
+
+
+def compute_file_fingerprints(code_chunks: list[dict]) -> dict[str, str]:
+    """Hash every file's entities so a change to any of them changes the file's fingerprint"""
+    by_file = defaultdict(list)
+    for chunk in code_chunks:
+        by_file[chunk['file_path']].append(chunk)
+
+    fingerprints = {}
+    for file_path, chunks in by_file.items():
+        digest = hashlib.blake2b(digest_size=16)
+        for chunk in sorted(chunks, key=lambda c: (c['start_line'], c['end_line'], c['entity_name'])):
+            digest.update(json.dumps(chunk, sort_keys=True, default=str).encode('utf-8'))
+        fingerprints[file_path] = digest.hexdigest()
+    return fingerprints
+
+
+def get_stored_fingerprints(collection) -> dict[str, str]:
+    """Read the per-file fingerprints recorded in a collection's metadata"""
+    stored = {}
+    for metadata in collection.get(include=['metadatas'])['metadatas']:
+        if metadata and metadata.get('file_path'):
+            file_path, file_hash = metadata['file_path'], metadata.get('file_hash', '')
+            # Mixed hashes mean an interrupted sync; treat the file as changed
+            stored[file_path] = file_hash if stored.get(file_path, file_hash) == file_hash else ''
+    return stored
+
+
+def get_file_entity_ids(collection, file_paths: list[str]) -> set[str]:
+    ids = set()
+    for i in range(0, len(file_paths), BATCH_SIZE):
+        batch = file_paths[i:i + BATCH_SIZE]
+        ids.update(collection.get(where={'file_path': {'$in': batch}}, include=[])['ids'])
+    return ids
+
+
+def delete_ids(collection, ids: list[str]):
+    for i in range(0, len(ids), BATCH_SIZE):
+        collection.delete(ids=ids[i:i + BATCH_SIZE])
+
+
+def discard_incomplete_files(collection_name: str, to_embed: list[dict], stored: int):
+    """Delete what was stored for files whose new entities were only partly stored.
+
+    Without this, a file cut off mid-way would carry its new fingerprint and
+    be skipped by the next sync despite missing entities.
+    """
+    incomplete = {chunk['file_path'] for chunk in to_embed[stored:]}
+    ids = [chunk['id'] for chunk in to_embed[:stored] if chunk['file_path'] in incomplete]
+    if ids:
+        delete_ids(get_collection(collection_name), ids)
+
+
+def _sync_files(collection_name: str, collection, code_chunks: list[dict], stored: dict, totals: dict, progress):
+    """Sync the files present in `code_chunks`, which must hold all of each file's entities"""
+    materialize_code(code_chunks)
+    fingerprints = compute_file_fingerprints(code_chunks)
+    changed = {path for path, file_hash in fingerprints.items() if stored.get(path) != file_hash}
+
+    totals['files'] += len(fingerprints)
+    totals['changed_files'] += len(changed)
+    totals['parsed'] += len(code_chunks)
+    progress('parse', parsed=totals['parsed'])
+
+    changed_chunks = [chunk for chunk in code_chunks if chunk['file_path'] in changed]
+    for chunk in changed_chunks:
+        chunk['file_hash'] = fingerprints[chunk['file_path']]
+    enriched = enrich_code_chunks(changed_chunks)
+
+    existing_ids = get_file_entity_ids(collection, [path for path in changed if path in stored])
+    new_ids = {chunk['id'] for chunk in enriched}
+    stale_ids = list(existing_ids - new_ids)
+    if stale_ids:
+        delete_ids(collection, stale_ids)
+        totals['deleted'] += len(stale_ids)
+
+    kept = [chunk for chunk in enriched if chunk['id'] in existing_ids]
+    to_embed = [chunk for chunk in enriched if chunk['id'] not in existing_ids]
+
+    done = 0
+    base = totals['embedded']
+    totals['total'] += len(to_embed)
+    progress('embed', total=totals['total'])
+    try:
+        for i in range(0, len(to_embed), BATCH_SIZE):
+            check_cancelled()
+            batch = embed_chunks(to_embed[i:i + BATCH_SIZE])
+            progress('embed', embedded=base + i + len(batch))
+            added = add_embeddings_to_vectorstore(collection_name, batch)
+            if not added or not added.get('success', False):
+                raise StoreError('Failed to add embeddings to vectorstore')
+            done = i + len(batch)
+            totals['embedded'] = base + done
+            progress('store', stored=totals['embedded'])
+    except BaseException:
+        discard_incomplete_files(collection_name, to_embed, done)
+        raise
+
+    if kept:
+        # Same content, possibly moved: refresh line numbers and file_hash only.
+        # Done last so an interrupted sync leaves these files looking changed
+        collection.update(ids=[chunk['id'] for chunk in kept], metadatas=[chunk_metadata(chunk) for chunk in kept])
+        totals['reused'] += len(kept)
+    return fingerprints
+
+
+def sync_codebase_stream(
+    collection_name: str,
+    batches: Iterable[list[dict]],
+    progress: Optional[Callable[..., None]] = None,
+) -> dict:
+    """Bring a codebase collection in line with parsed entities arriving in batches.
+
+    Only files whose fingerprint changed are looked at. Within them, entities
+    whose content-addressed ID is already stored keep their embedding and only
+    get fresh metadata; new IDs are embedded and upserted, and IDs that
+    disappeared are deleted. Once the batches run out, all entities of files
+    that were not sent are deleted too. An empty collection therefore gets a
+    full build.
+
+    Syncs and rebuilds of the same collection run one at a time.
+
+    Each batch is synced as it arrives, so memory is bounded by the batch
+    size. A batch must carry every entity of the files it contains. New
+    entities are embedded and stored BATCH_SIZE at a time, calling
+    `progress(stage, parsed=, embedded=, stored=, total=)` after each step;
+    an exception raised from `progress`, or a cancelled or expired request
+    scope, stops the sync between batches.
+    """
+    progress = progress or (lambda stage, **counts: None)
+    with ingest_lock(collection_name):
+        return _sync_stream(collection_name, batches, progress)
+
+
+def _sync_stream(collection_name: str, batches: Iterable[list[dict]], progress) -> dict:
+    """sync_codebase_stream with the collection's ingest lock held"""
+    collection = get_collection(collection_name, create=True)
+    stored = get_stored_fingerprints(collection)
+
+    totals = dict.fromkeys(('files', 'changed_files', 'parsed', 'total', 'embedded', 'reused', 'deleted'), 0)
+    seen = set()
+    try:
+        for code_chunks in batches:
+            check_cancelled()
+            split_files = seen.intersection(chunk['file_path'] for chunk in code_chunks)
+            if split_files:
+                raise ValueError(f"Entities of {sorted(split_files)[0]} were split across batches")
+            seen.update(_sync_files(collection_name, collection, code_chunks, stored, totals, progress))
+    except StoreError as e:
+        return {'success': False, 'error': str(e)}
+
+    removed = [path for path in stored if path not in seen]
+    removed_ids = list(get_file_entity_ids(collection, removed))
+    if removed_ids:
+        delete_ids(collection, removed_ids)
+
+    logger.info(
+        f"Collection '{collection_name}': {totals['changed_files']} changed files, "
+        f"{len(removed)} removed files, {totals['files'] - totals['changed_files']} unchanged"
+    )
+    return {
+        'success': True,
+        'changed_files': totals['changed_files'],
+        'removed_files': len(removed),
+        'embedded': totals['embedded'],
+        'reused': totals['reused'],
+        'deleted': totals['deleted'] + len(removed_ids),
+    }
+
+
+def sync_codebase_collection(
+    collection_name: str,
+    code_chunks: list[dict],
+    progress: Optional[Callable[..., None]] = None,
+) -> dict:
+    """Sync a fully parsed codebase in one go; see sync_codebase_stream"""
+    return sync_codebase_stream(collection_name, [code_chunks], progress)
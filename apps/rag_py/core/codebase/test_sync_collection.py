@@ -0,0 +1,102 @@
+import pytest
+
+from apps.rag_py.config.settings import settings
+from apps.rag_py.core import vectorstore
+from apps.rag_py.core.codebase import sync_collection
+from apps.rag_py.core.codebase.create_embeddings import make_entity_id
+from apps.rag_py.core.codebase.sync_collection import sync_codebase_collection, sync_codebase_stream
+
+
+@pytest.fixture
+def embedded(tmp_path, monkeypatch):
+    """Texts sent to the embedder, on a flat index under tmp_path"""
+    monkeypatch.setattr(settings, "VECTOR_BACKEND", "flat")
+    monkeypatch.setattr(settings, "FLAT_INDEX_DIR", str(tmp_path))
+    monkeypatch.setattr(vectorstore, "get_embeddings", lambda: None)
+    texts = []
+
+    def embed_chunks(chunks):
+        for chunk in chunks:
+            texts.append(chunk['code'])
+            chunk['embedding'] = [float(len(chunk['text'])), 1.0]
+        return chunks
+
+    monkeypatch.setattr(sync_collection, "embed_chunks", embed_chunks)
+    yield texts
+    for name in list(vectorstore._collections):
+        vectorstore.release_vectorstore(name)
+        vectorstore._collections.pop(name, None)
+        vectorstore._vectorstores.pop(name, None)
+
+
+def _entity(file_path: str, name: str, code: str, start_line: int = 1) -> dict:
+    return {
+        'file_path': file_path,
+        'entity_name': name,
+        'entity_type': 'function',
+        'code': code,
+        'start_line': start_line,
+        'end_line': start_line + code.count("\n"),
+    }
+
+
+def _stored(collection_name: str) -> dict:
+    result = vectorstore.get_collection(collection_name).get(include=['metadatas'])
+    return {metadata['entity_name']: metadata for metadata in result['metadatas']}
+
+
+def test_only_changed_files_are_embedded_and_removed_files_are_deleted(embedded):
+    first = [_entity("a.py", "f", "def f(): pass"), _entity("b.py", "g", "def g(): pass"), _entity("c.py", "h", "def h(): pass")]
+    assert sync_codebase_collection("c", first)['success']
+    assert sorted(embedded) == ["def f(): pass", "def g(): pass", "def h(): pass"]
+
+    embedded.clear()
+    result = sync_codebase_collection("c", [_entity("a.py", "f", "def f(): return 1"), _entity("b.py", "g", "def g(): pass")])
+
+    assert embedded == ["def f(): return 1"]
+    assert (result['changed_files'], result['removed_files']) == (1, 1)
+    assert sorted(_stored("c")) == ["f", "g"]
+
+
+def test_unchanged_codebase_embeds_nothing(embedded):
+    sync_codebase_collection("c", [_entity("a.py", "f", "def f(): pass")])
+    embedded.clear()
+
+    result = sync_codebase_collection("c", [_entity("a.py", "f", "def f(): pass")])
+    assert embedded == []
+    assert result['changed_files'] == 0 and result['deleted'] == 0
+
+
+def test_streamed_batches_must_not_split_a_file(embedded):
+    batches = [[_entity("a.py", "f", "def f(): pass")], [_entity("a.py", "g", "def g(): pass", 3)]]
+
+    with pytest.raises(ValueError):
+        sync_codebase_stream("c", batches)
+
+
+def test_entity_ids_depend_on_content_not_position():
+    entity = _entity("a.py", "f", "def f(): pass")
+    moved = _entity("a.py", "f", "def f(): pass", start_line=40)
+    edited = _entity("a.py", "f", "def f(): return 1")
+
+    assert make_entity_id(entity) == make_entity_id(moved)
+    assert make_entity_id(entity) != make_entity_id(edited)
+    assert make_entity_id(entity) != make_entity_id(_entity("b.py", "f", "def f(): pass"))
+
+
+def test_moved_entity_keeps_its_embedding_and_gets_new_lines(embedded):
+    sync_codebase_collection("c", [_entity("a.py", "f", "def f(): pass"), _entity("a.py", "g", "def g(): pass", 3)])
+    embedded.clear()
+
+    result = sync_codebase_collection("c", [_entity("a.py", "g", "def g(): pass", 1), _entity("a.py", "f", "def f(): pass", 10)])
+
+    assert embedded == []
+    assert result['reused'] == 2
+    assert _stored("c")["f"]['start_line'] == 10
+
+
+def test_identical_entities_are_stored_once(embedded):
+    result = sync_codebase_collection("c", [_entity("a.py", "f", "def f(): pass"), _entity("a.py", "f", "def f(): pass", 5)])
+
+    assert result['embedded'] == 1
+    assert vectorstore.get_collection_count("c") == 1
@@ -7,6 +7,7 @@ from langchain_core.documents import Document
 
 from apps.rag_py.config.settings import settings
 from apps.rag_py.core.loaders import load_doc_file
+from apps.rag_py.utils.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -15,7 +16,8 @@ def load_and_split_documents(path: str, req_type: str) -> List[Document]:
     try:
         logger.info(f"Loading documents from: {path}")
         
-        docs = load_doc_file(path, req_type)
+        with metrics.stage('load'):
+            docs = load_doc_file(path, req_type)
         
         text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=settings.CHUNK_SIZE,
@@ -24,7 +26,8 @@ def load_and_split_documents(path: str, req_type: str) -> List[Document]:
             is_separator_regex=False,
         )
         
-        splits = text_splitter.split_documents(docs)
+        with metrics.stage('split'):
+            splits = text_splitter.split_documents(docs)
         logger.info(f"Split into {len(splits)} chunks")        
         return splits
     except Exception as e:
@@ -0,0 +1,156 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import struct
+import threading
+import time
+import unicodedata
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from apps.rag_py.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_STRUCT_CODES = {'float32': 'f', 'float16': 'e'}
+
+
+def normalize_text(text: str) -> str:
+    return unicodedata.normalize('NFC', text.replace('\r\n', '\n')).strip()
+
+
+def text_key(text: str) -> str:
+    return hashlib.blake2b(normalize_text(text).encode('utf-8'), digest_size=16).hexdigest()
+
+
+class EmbeddingCache:
+    """Disk-backed vector cache keyed by (model, normalized input hash).
+
+    Vectors are stored as packed float32 (or float16) blobs in SQLite. Once the
+    stored blobs exceed `max_bytes` the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str, max_bytes: int, dtype: str = 'float32'):
+        if dtype not in _STRUCT_CODES:
+            raise ValueError(f"Unsupported embedding cache dtype: {dtype}")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.dtype = dtype
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                dtype TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)")
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    def _pack(self, vector: List[float]) -> bytes:
+        return struct.pack(f"<{len(vector)}{_STRUCT_CODES[self.dtype]}", *vector)
+
+    @staticmethod
+    def _unpack(blob: bytes, dtype: str) -> List[float]:
+        code = _STRUCT_CODES[dtype]
+        return list(struct.unpack(f"<{len(blob) // struct.calcsize(code)}{code}", blob))
+
+    def get_many(self, model: str, keys: List[str]) -> List[Optional[List[float]]]:
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                batch = list(set(keys[i:i + 500]))
+                placeholders = ','.join('?' * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, dtype, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch],
+                ).fetchall()
+                for text_hash, dtype, blob in rows:
+                    found[text_hash] = self._unpack(blob, dtype)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, text_hash) for text_hash in found],
+                )
+                self._conn.commit()
+
+        vectors = [found.get(key) for key in keys]
+        hits = sum(vector is not None for vector in vectors)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        metrics.inc('embedding_cache_hits', hits)
+        metrics.inc('embedding_cache_misses', len(keys) - hits)
+        return vectors
+
+    def put_many(self, model: str, keys: List[str], vectors: List[List[float]]):
+        now = time.time()
+        rows = [(model, key, self.dtype, self._pack(vector), now) for key, vector in zip(keys, vectors)]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows)
+            self._total_bytes += sum(len(row[3]) for row in rows)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # Evict down to 90% of the cap so a full cache doesn't evict on every write
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute(
+            "SELECT model, text_hash, LENGTH(vector) FROM embeddings ORDER BY last_access"
+        ).fetchall()
+        removed = []
+        for model, text_hash, size in rows:
+            if self._total_bytes <= target:
+                break
+            removed.append((model, text_hash))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM embeddings WHERE model = ? AND text_hash = ?", removed)
+        logger.info(f"Evicted {len(removed)} cached embeddings")
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends cache misses to the wrapped model"""
+
+    def __init__(self, embedder: Embeddings, cache: EmbeddingCache, model_key: str):
+        self.embedder = embedder
+        self.cache = cache
+        self.model_key = model_key
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [text_key(text) for text in texts]
+        vectors = self.cache.get_many(self.model_key, keys)
+
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            # Identical texts within one call are embedded once
+            unique = {}
+            for i in missing:
+                unique.setdefault(keys[i], texts[i])
+            new_vectors = self.embedder.embed_documents(list(unique.values()))
+            computed = dict(zip(unique.keys(), new_vectors))
+            self.cache.put_many(self.model_key, list(computed.keys()), new_vectors)
+            for i in missing:
+                vectors[i] = computed[keys[i]]
+
+        logger.info(f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} misses")
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embedder.embed_query(text)
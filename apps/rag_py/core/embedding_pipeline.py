@@ -1,3 +1,4 @@
+import hashlib
 import logging
 from typing import List
 
@@ -38,6 +39,12 @@ def create_input_texts(chunks: List[Document]) -> List[dict]:
     return result
 
 
+def make_chunk_id(item: dict) -> str:
+    """Content-addressed ID so re-ingesting the same chunk upserts instead of duplicating"""
+    content_hash = hashlib.blake2b(item["text"].encode("utf-8"), digest_size=8).hexdigest()
+    return f"{item['metadata'].get('source', 'doc')}::{content_hash}"
+
+
 def create_embeddings(text_chunks: List[dict]) -> List[dict]:
     embedder = get_embeddings()
     texts = [item["text"] for item in text_chunks]
@@ -49,22 +56,24 @@ def create_embeddings(text_chunks: List[dict]) -> List[dict]:
             "embedding": vectors[i],
             "text": item["original_text"],
             "metadata": item["metadata"],
-            "id": f"{item['metadata'].get('source', 'doc')}_{i}"
+            "id": make_chunk_id(item)
         })
     return enriched
 
 
 def add_embeddings_to_vectorstore(collection_name: str, enriched_chunks: List[dict]):
-    from core.vectorstore import get_chroma_client
-    client = get_chroma_client()
-    collection = client.get_or_create_collection(name=collection_name)
+    from apps.rag_py.core.vectorstore import get_collection
+    collection = get_collection(collection_name, create=True)
+
+    # Repeated chunks share a content-addressed ID; upsert needs unique IDs per call
+    enriched_chunks = list({e["id"]: e for e in enriched_chunks}.values())
 
     texts = [e["text"] for e in enriched_chunks]
     metadatas = [e["metadata"] for e in enriched_chunks]
     vectors = [e["embedding"] for e in enriched_chunks]
     ids = [e["id"] for e in enriched_chunks]
 
-    collection.add(
+    collection.upsert(
         embeddings=vectors,
         documents=texts,
         metadatas=metadatas,
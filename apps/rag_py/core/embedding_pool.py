@@ -0,0 +1,101 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from apps.rag_py.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Model loaded once per worker process by _init_worker
+_worker_model: Optional[Embeddings] = None
+
+
+def _init_worker(backend: str, threads: int):
+    global _worker_model
+    # Ctrl+C is handled by the server process, which shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+
+    from apps.rag_py.config.settings import settings
+    from apps.rag_py.core.embeddings import create_embedding_backend
+
+    settings.EMBEDDING_THREADS = threads
+    _worker_model = create_embedding_backend(backend)
+
+
+def _embed_batch(texts: List[str]) -> List[List[float]]:
+    return _worker_model.embed_documents(texts)
+
+
+def _embed_query(text: str) -> List[float]:
+    return _worker_model.embed_query(text)
+
+
+class EmbeddingWorkerPool(Embeddings):
+    """Spreads embedding over worker processes that each hold one model copy.
+
+    Inputs are sorted by length and cut into batches that all workers pull
+    from one shared queue, then reassembled in input order. The sort happens
+    here because each worker only sees its own batch, which the model's own
+    length sort can't fix. Each worker gets
+    `threads_per_worker` threads so workers together don't oversubscribe the
+    cores.
+
+    Queries are embedded by a separate single-threaded worker, started on the
+    first query, so a chat during a large ingest doesn't wait behind every
+    queued batch.
+    """
+
+    def __init__(self, backend: str, workers: int, batch_size: int, threads_per_worker: int = 0):
+        self.workers = workers
+        self.batch_size = max(1, batch_size)
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        self.backend = backend
+        self._executor = self._start(workers, self.threads_per_worker)
+        self._query_executor: Optional[ProcessPoolExecutor] = None
+        self._query_lock = threading.Lock()
+        atexit.register(self.shutdown)
+        logger.info(
+            f"Embedding worker pool: {workers} processes x {self.threads_per_worker} threads ({backend})"
+        )
+
+    def _start(self, workers: int, threads: int) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            # Forking a process that already loaded torch is unsafe
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self.backend, threads),
+        )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        batches = [order[start:start + self.batch_size] for start in range(0, len(order), self.batch_size)]
+
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        with metrics.stage('embed'):
+            results = self._executor.map(_embed_batch, [[texts[i] for i in batch] for batch in batches])
+            for batch, batch_vectors in zip(batches, results):
+                for i, vector in zip(batch, batch_vectors):
+                    vectors[i] = vector
+        metrics.inc('chunks_embedded', len(texts))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        with self._query_lock:
+            if self._query_executor is None:
+                self._query_executor = self._start(1, 1)
+        with metrics.stage('embed'):
+            return self._query_executor.submit(_embed_query, text).result()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._query_executor is not None:
+            self._query_executor.shutdown(wait=False, cancel_futures=True)
@@ -1,17 +1,219 @@
-
+import logging
+import math
+import threading
 from functools import lru_cache
+from pathlib import Path
+
+from typing import List
 
+from langchain_core.embeddings import Embeddings
 from langchain_huggingface import HuggingFaceEmbeddings
 
+from apps.rag_py.config.settings import settings
+from apps.rag_py.core.embedding_cache import CachedEmbeddings, EmbeddingCache
+from apps.rag_py.core.embedding_pool import EmbeddingWorkerPool
+from apps.rag_py.utils.metrics import metrics
 
-@lru_cache(maxsize=1)
-def get_embeddings():
-    # model_name = "sentence-transformers/all-mpnet-base-v2"
-    model_name = "thenlper/gte-small"
-    model_kwargs = {'device': 'cpu'}
-    encode_kwargs = {'normalize_embeddings': False}
-    return HuggingFaceEmbeddings(
+logger = logging.getLogger(__name__)
+
+ENCODE_KWARGS = {'normalize_embeddings': False}
+
+PARITY_SAMPLE_TEXTS = [
+    "def add(a, b):\n    return a + b",
+    "class Retriever(BaseRetriever):\n    vectorstore: Chroma",
+    "How do I configure the ZeroMQ server port?",
+    "Embeddings are cached on disk keyed by model and input hash.",
+]
+
+
+def _set_thread_count():
+    if settings.EMBEDDING_THREADS <= 0:
+        return
+    import torch
+    torch.set_num_threads(settings.EMBEDDING_THREADS)
+
+
+def _cap_sequence_length(model: HuggingFaceEmbeddings):
+    """Truncate inputs longer than EMBEDDING_MAX_TOKENS instead of growing every batch.
+
+    HuggingFaceEmbeddings doesn't expose the SentenceTransformer it wraps, so
+    the cap is only applied where that model and its public max_seq_length
+    are found, and never raised above what the model supports.
+    """
+    client = getattr(model, '_client', None)
+    current = getattr(client, 'max_seq_length', None)
+    if current is None:
+        logger.warning(f"Can't cap the sequence length of {settings.EMBEDDING_MODEL}; inputs use the model default")
+        return
+    client.max_seq_length = min(current, settings.EMBEDDING_MAX_TOKENS)
+
+
+def _huggingface_backend() -> HuggingFaceEmbeddings:
+    _set_thread_count()
+    model = HuggingFaceEmbeddings(
+        model_name=settings.EMBEDDING_MODEL,
+        model_kwargs={'device': settings.EMBEDDING_DEVICE},
+        encode_kwargs={**ENCODE_KWARGS, 'batch_size': settings.EMBEDDING_BATCH_SIZE},
+    )
+    _cap_sequence_length(model)
+    return model
+
+
+def _export_quantized_onnx(export_dir: Path) -> str:
+    """Export an int8 dynamically quantized ONNX copy of the model once and reuse it"""
+    file_name = f"onnx/model_qint8_{settings.EMBEDDING_ONNX_QUANTIZATION}.onnx"
+    if not (export_dir / file_name).exists():
+        from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+        logger.info(f"Exporting int8 ONNX model for {settings.EMBEDDING_MODEL} to {export_dir}")
+        model = SentenceTransformer(settings.EMBEDDING_MODEL, device='cpu', backend='onnx')
+        model.save(str(export_dir))
+        export_dynamic_quantized_onnx_model(model, settings.EMBEDDING_ONNX_QUANTIZATION, str(export_dir))
+    return file_name
+
+
+def _onnx_backend() -> HuggingFaceEmbeddings:
+    """Sentence-transformers ONNX Runtime backend for CPU-only hosts"""
+    try:
+        import onnxruntime
+    except ImportError as e:
+        raise ImportError(
+            "The 'onnx' embedding backend needs extra packages: pip install 'sentence-transformers[onnx]'"
+        ) from e
+
+    session_options = onnxruntime.SessionOptions()
+    if settings.EMBEDDING_THREADS > 0:
+        session_options.intra_op_num_threads = settings.EMBEDDING_THREADS
+        session_options.inter_op_num_threads = 1
+
+    model_name = settings.EMBEDDING_MODEL
+    ort_kwargs = {'provider': 'CPUExecutionProvider', 'session_options': session_options}
+    if settings.EMBEDDING_ONNX_QUANTIZATION:
+        export_dir = Path(settings.EMBEDDING_ONNX_DIR) / settings.EMBEDDING_MODEL.replace('/', '__')
+        ort_kwargs['file_name'] = _export_quantized_onnx(export_dir)
+        model_name = str(export_dir)
+
+    model = HuggingFaceEmbeddings(
         model_name=model_name,
-        model_kwargs=model_kwargs,
-        encode_kwargs=encode_kwargs
-    )
\ No newline at end of file
+        model_kwargs={'device': 'cpu', 'backend': 'onnx', 'model_kwargs': ort_kwargs},
+        encode_kwargs={**ENCODE_KWARGS, 'batch_size': settings.EMBEDDING_BATCH_SIZE},
+    )
+    _cap_sequence_length(model)
+    return model
+
+
+EMBEDDING_BACKENDS = {
+    'huggingface': _huggingface_backend,
+    'onnx': _onnx_backend,
+}
+
+
+class MeteredEmbeddings(Embeddings):
+    """Records embedding time and volume for an in-process model.
+
+    Inputs go to the model in one call: SentenceTransformer.encode already
+    sorts them by length and cuts batches of EMBEDDING_BATCH_SIZE, so short
+    texts aren't padded to the longest one in a mixed list.
+    """
+
+    def __init__(self, embedder: Embeddings):
+        self.embedder = embedder
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with metrics.stage('embed'):
+            vectors = self.embedder.embed_documents(texts)
+        metrics.inc('chunks_embedded', len(texts))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        with metrics.stage('embed'):
+            return self.embedder.embed_query(text)
+
+
+def create_embedding_backend(backend: str) -> Embeddings:
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}'. Expected one of: {', '.join(EMBEDDING_BACKENDS)}")
+    logger.info(f"Loading {backend} embedding backend for {settings.EMBEDDING_MODEL}")
+    return EMBEDDING_BACKENDS[backend]()
+
+
+def get_model_key(backend: str = None) -> str:
+    """Identifies which vectors a backend produces, for keying caches"""
+    backend = backend or settings.EMBEDDING_BACKEND
+    variant = backend
+    if backend == 'onnx' and settings.EMBEDDING_ONNX_QUANTIZATION:
+        variant = f"onnx-qint8-{settings.EMBEDDING_ONNX_QUANTIZATION}"
+    return f"{settings.EMBEDDING_MODEL}:{variant}:{ENCODE_KWARGS['normalize_embeddings']}"
+
+
+# lru_cache alone lets concurrent first callers each build a model
+_embeddings_lock = threading.Lock()
+
+
+def get_embeddings():
+    with _embeddings_lock:
+        return _load_embeddings()
+
+
+@lru_cache(maxsize=1)
+def _load_embeddings():
+    if settings.EMBEDDING_WORKERS > 1:
+        # Workers load their own model; the pool sorts by length before cutting batches
+        embedder = EmbeddingWorkerPool(
+            settings.EMBEDDING_BACKEND,
+            settings.EMBEDDING_WORKERS,
+            settings.EMBEDDING_BATCH_SIZE,
+            settings.EMBEDDING_THREADS,
+        )
+    else:
+        embedder = MeteredEmbeddings(create_embedding_backend(settings.EMBEDDING_BACKEND))
+
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return embedder
+
+    cache = EmbeddingCache(
+        settings.EMBEDDING_CACHE_PATH,
+        settings.EMBEDDING_CACHE_MAX_MB * 1024 * 1024,
+        settings.EMBEDDING_CACHE_DTYPE,
+    )
+    return CachedEmbeddings(embedder, cache, model_key=get_model_key())
+
+
+def _cosine(a: list[float], b: list[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def check_embedding_parity(
+    backend: str = 'onnx',
+    reference: str = 'huggingface',
+    texts: list[str] = None,
+    tolerance: float = None,
+) -> dict:
+    """Embed the same texts with two backends and check their cosine similarity"""
+    texts = texts or PARITY_SAMPLE_TEXTS
+    tolerance = settings.EMBEDDING_PARITY_TOLERANCE if tolerance is None else tolerance
+
+    expected = create_embedding_backend(reference).embed_documents(texts)
+    actual = create_embedding_backend(backend).embed_documents(texts)
+    similarities = [_cosine(a, b) for a, b in zip(expected, actual)]
+
+    result = {
+        'backend': backend,
+        'reference': reference,
+        'min_cosine': min(similarities),
+        'mean_cosine': sum(similarities) / len(similarities),
+        'tolerance': tolerance,
+        'passed': all(1 - sim <= tolerance for sim in similarities),
+    }
+    log = logger.info if result['passed'] else logger.warning
+    log(f"Embedding parity {backend} vs {reference}: {result}")
+    return result
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(0 if check_embedding_parity(*sys.argv[1:2])['passed'] else 1)
@@ -0,0 +1,369 @@
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+logger = logging.getLogger(__name__)
+
+# Rows scored per block, bounding the float32 scratch space for float16 indexes
+SEARCH_BLOCK_ROWS = 65536
+# Rewrite the vector file once this share of its rows belongs to deleted ids
+COMPACT_DEAD_FRACTION = 0.25
+COMPACT_MIN_ROWS = 1024
+
+
+def _where_clause(where: Optional[dict]) -> Tuple[str, list]:
+    """Translate the subset of Chroma `where` filters we use into SQL over JSON metadata"""
+    if not where:
+        return "", []
+
+    clauses, params = [], []
+    for key, condition in where.items():
+        if key == "$and":
+            for sub in condition:
+                clause, sub_params = _where_clause(sub)
+                clauses.append(clause.removeprefix(" WHERE "))
+                params.extend(sub_params)
+            continue
+
+        column = "json_extract(metadata, ?)"
+        params.append(f'$."{key}"')
+        if isinstance(condition, dict):
+            (op, value), = condition.items()
+            if op == "$in":
+                clauses.append(f"{column} IN ({','.join('?' * len(value))})")
+                params.extend(value)
+            elif op == "$ne":
+                clauses.append(f"{column} != ?")
+                params.append(value)
+            elif op == "$eq":
+                clauses.append(f"{column} = ?")
+                params.append(value)
+            else:
+                raise ValueError(f"Unsupported filter operator: {op}")
+        else:
+            clauses.append(f"{column} = ?")
+            params.append(condition)
+    return " WHERE " + " AND ".join(clauses), params
+
+
+class FlatVectorStore(VectorStore):
+    """Exact-search vector store backed by a memory-mapped .npy file.
+
+    Normalized vectors live in `vectors.npy` (float32 or float16, grown by
+    doubling); ids, documents and metadata live in an SQLite side table that
+    maps each id to its row. Deleted rows are masked out of searches until
+    they make up COMPACT_DEAD_FRACTION of the file, which is then rewritten
+    without them. Top-k is a blocked matrix-vector product plus
+    `argpartition`, so results are exact and there is no index to load.
+
+    Besides the LangChain VectorStore interface it implements the subset of
+    Chroma's collection API the pipeline uses (get/upsert/update/delete/count,
+    collection metadata and modify), so it can stand in for both.
+    """
+
+    def __init__(self, path: str, embedding: Embeddings, dtype: str = "float32"):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.name = self.path.name
+        self._embedding = embedding
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path / "meta.sqlite3", check_same_thread=False)
+        self._conn.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS rows (
+                id TEXT PRIMARY KEY,
+                row INTEGER NOT NULL UNIQUE,
+                document TEXT,
+                metadata TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            """
+        )
+        self.dtype = np.dtype(self._info("dtype", dtype))
+        self._used = int(self._info("used", 0))
+        self._vectors: Optional[np.memmap] = None
+        self._alive: Optional[np.ndarray] = None
+
+    # -- storage -------------------------------------------------------------
+
+    def _info(self, key: str, default: Any = None):
+        row = self._conn.execute("SELECT value FROM info WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _set_info(self, key: str, value: Any):
+        self._conn.execute("INSERT OR REPLACE INTO info VALUES (?, ?)", (key, json.dumps(value)))
+
+    @property
+    def _vectors_path(self) -> Path:
+        # Compaction writes a new file and switches to it in the same
+        # transaction that renumbers the rows
+        return self.path / self._info("vectors_file", "vectors.npy")
+
+    def _open_vectors(self) -> Optional[np.memmap]:
+        if self._vectors is None and self._vectors_path.exists():
+            self._vectors = np.load(self._vectors_path, mmap_mode="r+")
+        return self._vectors
+
+    def _alive_rows(self) -> np.ndarray:
+        if self._alive is None:
+            alive = np.zeros(self._used, dtype=bool)
+            rows = [r for (r,) in self._conn.execute("SELECT row FROM rows")]
+            alive[rows] = True
+            self._alive = alive
+        return self._alive
+
+    def _reserve(self, extra: int, dim: int):
+        """Make room for `extra` more rows, doubling the file's capacity when full"""
+        vectors = self._open_vectors()
+        capacity = 0 if vectors is None else vectors.shape[0]
+        if self._used + extra <= capacity:
+            return
+
+        new_capacity = max(self._used + extra, capacity * 2, 1024)
+        tmp_path = self.path / "vectors.tmp.npy"
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=self.dtype, shape=(new_capacity, dim))
+        if vectors is not None:
+            grown[:self._used] = vectors[:self._used]
+        grown.flush()
+        del grown
+        self._vectors = None
+        os.replace(tmp_path, self._vectors_path)
+
+    def _normalize(self, embeddings: Iterable[List[float]]) -> np.ndarray:
+        matrix = np.asarray(list(embeddings), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    # -- Chroma collection API subset ------------------------------------------
+
+    @property
+    def metadata(self) -> dict:
+        with self._lock:
+            return self._info("collection_metadata", {})
+
+    def modify(self, metadata: dict = None, **_):
+        with self._lock:
+            self._set_info("collection_metadata", metadata or {})
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+
+    def upsert(self, ids: List[str], embeddings, documents: List[str] = None, metadatas: List[dict] = None):
+        if not ids:
+            return
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [{}] * len(ids)
+        matrix = self._normalize(embeddings)
+
+        with self._lock:
+            existing = dict(self._conn.execute(
+                f"SELECT id, row FROM rows WHERE id IN ({','.join('?' * len(ids))})", ids
+            ).fetchall())
+            new_count = sum(1 for i in ids if i not in existing)
+            self._reserve(new_count, matrix.shape[1])
+            vectors = self._open_vectors()
+
+            rows = []
+            for i, id_ in enumerate(ids):
+                row = existing.get(id_)
+                if row is None:
+                    row = self._used
+                    self._used += 1
+                rows.append(row)
+                vectors[row] = matrix[i]
+            vectors.flush()
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO rows VALUES (?, ?, ?, ?)",
+                [(id_, row, doc, json.dumps(meta or {})) for id_, row, doc, meta in zip(ids, rows, documents, metadatas)],
+            )
+            self._set_info("used", self._used)
+            self._set_info("dtype", self.dtype.name)
+            self._conn.commit()
+            self._alive = None
+
+    add = upsert
+
+    def update(self, ids: List[str], metadatas: List[dict] = None, documents: List[str] = None, embeddings=None):
+        """Update existing ids; like Chroma, ids that aren't stored are ignored"""
+        if not ids:
+            return
+        with self._lock:
+            if embeddings is not None:
+                rows = dict(self._conn.execute(
+                    f"SELECT id, row FROM rows WHERE id IN ({','.join('?' * len(ids))})", ids
+                ).fetchall())
+                vectors = self._open_vectors()
+                for id_, vector in zip(ids, self._normalize(embeddings)):
+                    if id_ in rows:
+                        vectors[rows[id_]] = vector
+                if vectors is not None:
+                    vectors.flush()
+            if metadatas is not None:
+                self._conn.executemany(
+                    "UPDATE rows SET metadata = ? WHERE id = ?",
+                    [(json.dumps(meta), id_) for id_, meta in zip(ids, metadatas)],
+                )
+            if documents is not None:
+                self._conn.executemany(
+                    "UPDATE rows SET document = ? WHERE id = ?", list(zip(documents, ids))
+                )
+            self._conn.commit()
+
+    def get(self, ids: List[str] = None, where: dict = None, include: List[str] = None, **_) -> dict:
+        include = ["metadatas", "documents"] if include is None else include
+        sql, params = _where_clause(where)
+        if ids is not None:
+            sql += (" AND " if sql else " WHERE ") + f"id IN ({','.join('?' * len(ids))})"
+            params += list(ids)
+
+        with self._lock:
+            result_rows = self._conn.execute(f"SELECT id, document, metadata FROM rows{sql}", params).fetchall()
+        result = {"ids": [r[0] for r in result_rows]}
+        if "documents" in include:
+            result["documents"] = [r[1] for r in result_rows]
+        if "metadatas" in include:
+            result["metadatas"] = [json.loads(r[2]) for r in result_rows]
+        return result
+
+    def delete(self, ids: List[str] = None, where: dict = None, **_):
+        sql, params = _where_clause(where)
+        if ids is not None:
+            sql += (" AND " if sql else " WHERE ") + f"id IN ({','.join('?' * len(ids))})"
+            params += list(ids)
+        with self._lock:
+            # Freed rows stay in the vector file and are masked out of searches
+            self._conn.execute(f"DELETE FROM rows{sql}", params)
+            self._conn.commit()
+            self._alive = None
+            alive = self.count()
+            if self._used >= COMPACT_MIN_ROWS and self._used - alive > COMPACT_DEAD_FRACTION * self._used:
+                self._compact()
+
+    def _compact(self):
+        """Rewrite the vector file with only live rows; called with the lock held"""
+        vectors = self._open_vectors()
+        old_rows = [r for (r,) in self._conn.execute("SELECT row FROM rows ORDER BY row")]
+        live = len(old_rows)
+        dim = vectors.shape[1]
+        file_name = f"vectors.{uuid.uuid4().hex[:8]}.npy"
+        compacted = np.lib.format.open_memmap(
+            self.path / file_name, mode="w+", dtype=self.dtype, shape=(max(live, COMPACT_MIN_ROWS), dim)
+        )
+        for start in range(0, live, SEARCH_BLOCK_ROWS):
+            compacted[start:start + SEARCH_BLOCK_ROWS] = vectors[old_rows[start:start + SEARCH_BLOCK_ROWS]]
+        compacted.flush()
+        del compacted
+
+        old_path = self._vectors_path
+        # Ascending order means every target row is already free
+        self._conn.executemany("UPDATE rows SET row = ? WHERE row = ?", enumerate(old_rows))
+        self._set_info("used", live)
+        self._set_info("vectors_file", file_name)
+        self._conn.commit()
+
+        logger.info(f"Compacted flat index '{self.name}': {self._used} -> {live} rows")
+        self._used = live
+        self._vectors = None
+        self._alive = None
+        old_path.unlink(missing_ok=True)
+
+    # -- LangChain VectorStore API -----------------------------------------------
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def add_texts(self, texts: Iterable[str], metadatas: List[dict] = None, ids: List[str] = None, **_) -> List[str]:
+        texts = list(texts)
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        self.upsert(ids, self._embedding.embed_documents(texts), texts, metadatas)
+        return ids
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: List[float], k: int = 4, filter: dict = None
+    ) -> List[Tuple[Document, float]]:
+        with self._lock:
+            vectors = self._open_vectors()
+            if vectors is None or self._used == 0:
+                return []
+            alive = self._alive_rows()
+            if filter:
+                sql, params = _where_clause(filter)
+                alive = np.zeros(self._used, dtype=bool)
+                alive[[r for (r,) in self._conn.execute(f"SELECT row FROM rows{sql}", params)]] = True
+
+            query = self._normalize([embedding])[0]
+            best_rows = np.empty(0, dtype=np.int64)
+            best_scores = np.empty(0, dtype=np.float32)
+            for start in range(0, self._used, SEARCH_BLOCK_ROWS):
+                end = min(start + SEARCH_BLOCK_ROWS, self._used)
+                scores = vectors[start:end].astype(np.float32, copy=False) @ query
+                scores[~alive[start:end]] = -np.inf
+                top = min(k, end - start)
+                idx = np.argpartition(-scores, top - 1)[:top]
+                best_rows = np.concatenate([best_rows, idx + start])
+                best_scores = np.concatenate([best_scores, scores[idx]])
+                if len(best_rows) > k:
+                    keep = np.argpartition(-best_scores, k - 1)[:k]
+                    best_rows, best_scores = best_rows[keep], best_scores[keep]
+
+            order = np.argsort(-best_scores)
+            hits = [(int(best_rows[i]), float(best_scores[i])) for i in order if np.isfinite(best_scores[i])]
+            if not hits:
+                return []
+
+            by_row = {
+                row: (id_, doc, meta)
+                for id_, row, doc, meta in self._conn.execute(
+                    f"SELECT id, row, document, metadata FROM rows WHERE row IN ({','.join('?' * len(hits))})",
+                    [row for row, _ in hits],
+                )
+            }
+        return [
+            (Document(id=by_row[row][0], page_content=by_row[row][1] or "", metadata=json.loads(by_row[row][2])), score)
+            for row, score in hits
+        ]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, filter: dict = None, **_) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: dict = None, **_) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k, filter)
+
+    def similarity_search(self, query: str, k: int = 4, filter: dict = None, **_) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: List[dict] = None,
+        path: str = None,
+        **kwargs,
+    ) -> "FlatVectorStore":
+        store = cls(path, embedding, kwargs.get("dtype", "float32"))
+        store.add_texts(texts, metadatas, kwargs.get("ids"))
+        return store
+
+    def drop(self):
+        with self._lock:
+            self._conn.close()
+            self._vectors = None
+            shutil.rmtree(self.path, ignore_errors=True)
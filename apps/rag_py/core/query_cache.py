@@ -0,0 +1,128 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from apps.rag_py.config.settings import settings
+from apps.rag_py.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r'\s+', ' ', query).strip()
+
+
+class QueryEmbeddingCache:
+    """Bounded LRU of query embeddings keyed by (model, normalized query)"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def embed(self, query: str, embedder: Embeddings, model_key: str) -> List[float]:
+        normalized = normalize_query(query)
+        key = (model_key, normalized)
+
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                metrics.inc('query_cache_hits')
+                return vector
+            self.misses += 1
+            metrics.inc('query_cache_misses')
+
+        vector = embedder.embed_query(normalized)
+
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return vector
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+class QueryResultCache:
+    """Bounded LRU of search results keyed by (collection, version, normalized query, top_k).
+
+    The collection version is bumped by every write, so a result can never be
+    served from an older state of the collection; entries also expire after
+    `ttl` seconds. Writes drop the collection's entries eagerly through
+    `discard` to free the memory.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()  # key -> (expires_at, documents)
+        self._lock = threading.Lock()
+
+    def _key(self, collection_name: str, version: int, query: str, top_k: int) -> tuple:
+        return (collection_name, version, normalize_query(query), top_k)
+
+    def get(self, collection_name: str, version: int, query: str, top_k: int) -> Optional[List[Document]]:
+        key = self._key(collection_name, version, query, top_k)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                metrics.inc('result_cache_misses')
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            metrics.inc('result_cache_hits')
+            # Callers get their own list; the cached one stays intact
+            return list(entry[1])
+
+    def put(self, collection_name: str, version: int, query: str, top_k: int, documents: List[Document]):
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        key = self._key(collection_name, version, query, top_k)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, list(documents))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, collection_name: str):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == collection_name]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+# Shared by every Retriever in the process
+query_embedding_cache = QueryEmbeddingCache(settings.QUERY_EMBEDDING_CACHE_SIZE)
+query_result_cache = QueryResultCache(settings.QUERY_RESULT_CACHE_SIZE, settings.QUERY_RESULT_CACHE_TTL)
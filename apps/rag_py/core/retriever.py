@@ -1,24 +1,60 @@
 import logging
-from typing import List
+from typing import List, Optional
 
-from langchain_chroma import Chroma
 from langchain_core.documents import Document
 from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
 from pydantic import Field
 
 from apps.rag_py.config.settings import settings
+from apps.rag_py.core.embeddings import get_model_key
+from apps.rag_py.core.query_cache import query_embedding_cache, query_result_cache
+from apps.rag_py.core.vectorstore import get_collection_version, get_vectorstore
+from apps.rag_py.utils.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
 class Retriever(BaseRetriever):
     
-    vectorstore: Chroma = Field(...)
+    vectorstore: VectorStore = Field(...)
     top_k: int = Field(default=settings.TOP_K)
+    # Set to share search results with other retrievers over the same collection,
+    # and to search whatever handle the collection has now rather than `vectorstore`
+    collection_name: Optional[str] = Field(default=None)
+
+    def current_vectorstore(self) -> VectorStore:
+        """The collection's live vectorstore; a rebuild replaces the handle this retriever was made with"""
+        if self.collection_name is None:
+            return self.vectorstore
+        return get_vectorstore(self.collection_name)
 
     def _get_relevant_documents(self, query: str) -> List[Document]:
+        if self.collection_name is None:
+            return self._search(query)
+
+        version = get_collection_version(self.collection_name)
+        docs = query_result_cache.get(self.collection_name, version, query, self.top_k)
+        if docs is not None:
+            logger.info(
+                f"Served {len(docs)} cached documents for query: {query} "
+                f"(result cache: {query_result_cache.stats()})"
+            )
+            return docs
+        docs = self._search(query)
+        query_result_cache.put(self.collection_name, version, query, self.top_k, docs)
+        return docs
+
+    def _search(self, query: str) -> List[Document]:
         try:
-            docs = self.vectorstore.similarity_search(query, k=self.top_k)
-            logger.info(f"Retrieved {len(docs)} documents for query: {query}")
+            vectorstore = self.current_vectorstore()
+            with metrics.stage('retrieve'):
+                # Repeated queries reuse their cached embedding and skip the model
+                embedding = query_embedding_cache.embed(query, vectorstore.embeddings, get_model_key())
+                docs = vectorstore.similarity_search_by_vector(embedding, k=self.top_k)
+            logger.info(
+                f"Retrieved {len(docs)} documents for query: {query} "
+                f"(query embedding cache: {query_embedding_cache.stats()})"
+            )
             return docs
         except Exception as e:
             logger.error(f"Retrieval failed for query '{query}': {e}")
@@ -0,0 +1,68 @@
+import hashlib
+import logging
+import os
+
+from apps.rag_py.config.settings import settings
+from apps.rag_py.core.vectorstore import collection_exists, get_collection, get_collection_count
+
+logger = logging.getLogger(__name__)
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def splitter_fingerprint() -> dict:
+    return {'chunk_size': settings.CHUNK_SIZE, 'chunk_overlap': settings.CHUNK_OVERLAP}
+
+
+def is_collection_current(collection_name: str, path: str, req_type: str) -> bool:
+    """True when the collection was built from this exact source with the current splitter settings.
+
+    Size and mtime are checked first; the file is only hashed when they differ,
+    so an unchanged source costs a stat() call. Webpages can't be fingerprinted
+    without fetching them, so an existing webpage collection is always current.
+    """
+    if not collection_exists(collection_name) or get_collection_count(collection_name) == 0:
+        return False
+
+    stored = get_collection(collection_name).metadata or {}
+    if any(stored.get(key) != value for key, value in splitter_fingerprint().items()):
+        return False
+
+    if req_type == 'webpage' or not os.path.isfile(path):
+        return stored.get('source') == path
+
+    st = os.stat(path)
+    if stored.get('source_size') == st.st_size and stored.get('source_mtime_ns') == st.st_mtime_ns:
+        return True
+    if stored.get('source_size') != st.st_size or stored.get('source_hash') != hash_file(path):
+        return False
+
+    # Touched but identical: remember the new mtime so the next check is a stat() again
+    record_source_fingerprint(collection_name, path, req_type)
+    return True
+
+
+def record_source_fingerprint(collection_name: str, path: str, req_type: str):
+    fingerprint = {'source': path, **splitter_fingerprint()}
+    if req_type != 'webpage' and os.path.isfile(path):
+        st = os.stat(path)
+        fingerprint.update({
+            'source_size': st.st_size,
+            'source_mtime_ns': st.st_mtime_ns,
+            'source_hash': hash_file(path),
+        })
+
+    collection = get_collection(collection_name, create=True)
+    # HNSW settings are fixed at creation time and can't be passed to modify()
+    metadata = {k: v for k, v in (collection.metadata or {}).items() if not k.startswith('hnsw:')}
+    metadata.update(fingerprint)
+    collection.modify(metadata=metadata)
+    logger.info(f"Recorded source fingerprint for collection '{collection_name}'")
@@ -0,0 +1,65 @@
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from apps.rag_py.core.embedding_cache import CachedEmbeddings, EmbeddingCache, text_key
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text)), 0.5] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 0.5]
+
+
+def test_round_trip_and_model_isolation(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "emb.sqlite3"), 1 << 20)
+    cache.put_many("m1", ["k1"], [[1.0, 2.5]])
+
+    assert cache.get_many("m1", ["k1", "k2"]) == [[1.0, 2.5], None]
+    assert cache.get_many("m2", ["k1"]) == [None]
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_float16_storage(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "emb.sqlite3"), 1 << 20, dtype="float16")
+    cache.put_many("m", ["k"], [[0.1, 1.0]])
+
+    assert cache.get_many("m", ["k"])[0] == pytest.approx([0.1, 1.0], abs=1e-3)
+
+
+def test_unsupported_dtype(tmp_path):
+    with pytest.raises(ValueError):
+        EmbeddingCache(str(tmp_path / "emb.sqlite3"), 1 << 20, dtype="int8")
+
+
+def test_evicts_least_recently_used(tmp_path):
+    # Each two-dimensional float32 vector takes 8 bytes
+    cache = EmbeddingCache(str(tmp_path / "emb.sqlite3"), 20)
+    cache.put_many("m", ["a"], [[1.0, 1.0]])
+    cache.put_many("m", ["b"], [[2.0, 2.0]])
+    cache.get_many("m", ["a"])
+    cache.put_many("m", ["c"], [[3.0, 3.0]])
+
+    assert cache.get_many("m", ["a", "b", "c"]) == [[1.0, 1.0], None, [3.0, 3.0]]
+
+
+def test_only_misses_reach_the_model(tmp_path):
+    model = CountingEmbeddings()
+    embedder = CachedEmbeddings(model, EmbeddingCache(str(tmp_path / "emb.sqlite3"), 1 << 20), "m")
+
+    first = embedder.embed_documents(["one", "three", "one"])
+    assert model.embedded == ["one", "three"]
+
+    second = embedder.embed_documents(["three", "  one\r\n", "seven"])
+    assert model.embedded == ["one", "three", "seven"]
+    assert second == [first[1], first[0], [5.0, 0.5]]
+
+
+def test_text_key_normalizes_whitespace_and_line_endings():
+    assert text_key("def f():\r\n    pass\n") == text_key("def f():\n    pass")
+    assert text_key("a") != text_key("b")
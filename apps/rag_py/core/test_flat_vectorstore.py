@@ -0,0 +1,109 @@
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from apps.rag_py.core import flat_vectorstore
+from apps.rag_py.core.flat_vectorstore import FlatVectorStore
+
+
+class UnusedEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        raise AssertionError("tests pass vectors directly")
+
+    def embed_query(self, text):
+        raise AssertionError("tests pass vectors directly")
+
+
+def _store(tmp_path, dtype="float32") -> FlatVectorStore:
+    return FlatVectorStore(str(tmp_path / "index"), UnusedEmbeddings(), dtype)
+
+
+def _unit(i: int, dim: int = 8) -> list:
+    vector = [0.0] * dim
+    vector[i % dim] = 1.0
+    return vector
+
+
+def _ids(results) -> list:
+    return [doc.id for doc in results]
+
+
+def test_search_returns_nearest_first(tmp_path):
+    store = _store(tmp_path)
+    store.upsert(["a", "b", "c"], [_unit(0), _unit(1), [1.0, 1.0] + [0.0] * 6], ["A", "B", "C"])
+
+    results = store.similarity_search_by_vector_with_score(_unit(0), k=2)
+    assert [doc.id for doc, _ in results] == ["a", "c"]
+    assert results[0][0].page_content == "A"
+    assert np.isclose(results[0][1], 1.0)
+
+
+def test_upsert_replaces_in_place_and_empty_input_is_a_no_op(tmp_path):
+    store = _store(tmp_path)
+    store.upsert([], [])
+    store.upsert(["a"], [_unit(0)], ["old"])
+    store.upsert(["a"], [_unit(1)], ["new"])
+
+    assert store.count() == 1
+    assert store._used == 1
+    assert store.get(ids=["a"])["documents"] == ["new"]
+    assert _ids(store.similarity_search_by_vector(_unit(1), k=1)) == ["a"]
+
+
+def test_update_ignores_unknown_ids(tmp_path):
+    store = _store(tmp_path)
+    store.upsert(["a"], [_unit(0)], metadatas=[{"kind": "x"}])
+    store.update(["a", "missing"], metadatas=[{"kind": "y"}, {"kind": "z"}], embeddings=[_unit(2), _unit(3)])
+
+    assert store.get()["ids"] == ["a"]
+    assert store.get(ids=["a"])["metadatas"] == [{"kind": "y"}]
+    assert _ids(store.similarity_search_by_vector(_unit(2), k=1)) == ["a"]
+
+
+def test_where_filters(tmp_path):
+    store = _store(tmp_path)
+    store.upsert(
+        ["a", "b", "c"],
+        [_unit(0), _unit(0), _unit(0)],
+        metadatas=[{"file": "x.py", "type": "function"}, {"file": "y.py", "type": "class"}, {"file": "x.py", "type": "class"}],
+    )
+
+    assert sorted(store.get(where={"file": "x.py"})["ids"]) == ["a", "c"]
+    assert store.get(where={"$and": [{"file": "x.py"}, {"type": {"$ne": "function"}}]})["ids"] == ["c"]
+    assert sorted(_ids(store.similarity_search_by_vector(_unit(0), k=3, filter={"type": {"$in": ["class"]}}))) == ["b", "c"]
+
+
+def test_deleted_rows_are_masked_then_compacted(tmp_path, monkeypatch):
+    monkeypatch.setattr(flat_vectorstore, "COMPACT_MIN_ROWS", 4)
+    store = _store(tmp_path)
+    ids = [f"id{i}" for i in range(8)]
+    store.upsert(ids, [_unit(i) for i in range(8)], ids)
+
+    store.delete(ids=["id0"])
+    assert store._used == 8
+    assert _ids(store.similarity_search_by_vector(_unit(0), k=1)) != ["id0"]
+
+    store.delete(ids=["id1", "id2"])
+    assert store._used == 5
+    assert store.count() == 5
+    assert len(list((tmp_path / "index").glob("*.npy"))) == 1
+
+    # Rows were renumbered: every id still finds its own vector, also after reopening
+    reopened = _store(tmp_path)
+    for i in range(3, 8):
+        assert _ids(reopened.similarity_search_by_vector(_unit(i), k=1)) == [f"id{i}"]
+
+
+def test_float16_index(tmp_path):
+    store = _store(tmp_path, dtype="float16")
+    store.upsert(["a", "b"], [_unit(0), _unit(1)])
+
+    assert _store(tmp_path).dtype == np.float16
+    assert _ids(store.similarity_search_by_vector(_unit(1), k=1)) == ["b"]
+
+
+def test_drop_removes_the_index(tmp_path):
+    store = _store(tmp_path)
+    store.upsert(["a"], [_unit(0)])
+    store.drop()
+
+    assert not (tmp_path / "index").exists()
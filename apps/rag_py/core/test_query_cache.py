@@ -0,0 +1,86 @@
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from apps.rag_py.core import query_cache
+from apps.rag_py.core.query_cache import QueryEmbeddingCache, QueryResultCache
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.queries = []
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return [float(len(text))]
+
+
+def test_query_embeddings_are_reused_across_whitespace():
+    cache = QueryEmbeddingCache(max_size=4)
+    model = CountingEmbeddings()
+
+    assert cache.embed("where is  the\nserver", model, "m") == cache.embed(" where is the server ", model, "m")
+    assert model.queries == ["where is the server"]
+    cache.embed("where is the server", model, "other-model")
+    assert len(model.queries) == 2
+
+
+def test_query_embedding_cache_is_lru_bounded():
+    cache = QueryEmbeddingCache(max_size=2)
+    model = CountingEmbeddings()
+    for query in ["a", "b", "a", "c"]:
+        cache.embed(query, model, "m")
+
+    cache.embed("a", model, "m")
+    cache.embed("b", model, "m")
+    assert model.queries == ["a", "b", "c", "b"]
+
+
+def test_results_are_keyed_by_collection_version_and_top_k():
+    cache = QueryResultCache(max_size=8, ttl=60)
+    docs = [Document(page_content="x")]
+    cache.put("c", 1, "query", 4, docs)
+
+    assert cache.get("c", 1, "query ", 4) == docs
+    assert cache.get("c", 2, "query", 4) is None
+    assert cache.get("c", 1, "query", 5) is None
+    assert cache.get("other", 1, "query", 4) is None
+
+
+def test_callers_get_their_own_list():
+    cache = QueryResultCache(max_size=8, ttl=60)
+    cache.put("c", 1, "q", 4, [Document(page_content="x")])
+
+    cache.get("c", 1, "q", 4).clear()
+    assert len(cache.get("c", 1, "q", 4)) == 1
+
+
+def test_results_expire(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(query_cache.time, "monotonic", lambda: now[0])
+    cache = QueryResultCache(max_size=8, ttl=10)
+    cache.put("c", 1, "q", 4, [])
+
+    now[0] += 9
+    assert cache.get("c", 1, "q", 4) == []
+    now[0] += 2
+    assert cache.get("c", 1, "q", 4) is None
+
+
+def test_discard_drops_one_collection():
+    cache = QueryResultCache(max_size=8, ttl=60)
+    cache.put("c", 1, "q", 4, [])
+    cache.put("d", 1, "q", 4, [])
+    cache.discard("c")
+
+    assert cache.get("c", 1, "q", 4) is None
+    assert cache.get("d", 1, "q", 4) == []
+
+
+def test_disabled_result_cache_stores_nothing():
+    cache = QueryResultCache(max_size=0, ttl=60)
+    cache.put("c", 1, "q", 4, [])
+
+    assert cache.stats()["size"] == 0
@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+from langchain_core.documents import Document
+
+from apps.rag_py.config.settings import settings
+from apps.rag_py.core import vectorstore
+from apps.rag_py.core.query_cache import query_result_cache
+from apps.rag_py.utils.cancellation import RequestCancelled, cancel_request, request_scope
+
+
+@pytest.fixture
+def flat_backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_BACKEND", "flat")
+    monkeypatch.setattr(settings, "FLAT_INDEX_DIR", str(tmp_path))
+    monkeypatch.setattr(vectorstore, "get_embeddings", lambda: None)
+    yield
+    for name in list(vectorstore._collections):
+        vectorstore.release_vectorstore(name)
+        vectorstore._collections.pop(name, None)
+        vectorstore._vectorstores.pop(name, None)
+
+
+def test_every_collection_write_invalidates_cached_results(flat_backend):
+    collection = vectorstore.get_collection("c", create=True)
+    collection.upsert(["a"], [[1.0, 0.0]], ["A"], [{"line": 1}])
+    assert vectorstore.get_collection_count("c") == 1
+
+    for write in (
+        lambda: collection.update(ids=["a"], metadatas=[{"line": 2}]),
+        lambda: collection.upsert(["b"], [[0.0, 1.0]]),
+        lambda: collection.delete(ids=["b"]),
+    ):
+        version = vectorstore.get_collection_version("c")
+        query_result_cache.put("c", version, "q", 1, [Document(page_content="A")])
+        write()
+        assert vectorstore.get_collection_version("c") == version + 1
+        assert query_result_cache.get("c", version, "q", 1) is None
+
+    assert vectorstore.get_collection_count("c") == 1
+    assert vectorstore.get_vectorstore("c").get(ids=["a"])["metadatas"] == [{"line": 2}]
+
+
+def test_flat_collection_and_vectorstore_share_one_index(flat_backend):
+    collection = vectorstore.get_collection("c", create=True)
+    collection.upsert(["a"], [[1.0, 0.0]], ["A"])
+
+    assert vectorstore.get_vectorstore("c").count() == 1
+    assert vectorstore.get_collection("c") is collection
+
+
+def test_ingests_of_one_collection_run_one_at_a_time():
+    entered, release = threading.Event(), threading.Event()
+    order = []
+
+    def first():
+        with vectorstore.ingest_lock("c"):
+            order.append("first")
+            entered.set()
+            release.wait(5)
+            order.append("first done")
+
+    thread = threading.Thread(target=first)
+    thread.start()
+    entered.wait(5)
+    with vectorstore.ingest_lock("other"):
+        order.append("other collection")
+    release.set()
+    with vectorstore.ingest_lock("c"), vectorstore.ingest_lock("c"):
+        order.append("second")
+    thread.join()
+
+    assert order == ["first", "other collection", "first done", "second"]
+
+
+def test_waiting_for_an_ingest_lock_can_be_cancelled():
+    held, release = threading.Event(), threading.Event()
+
+    def holder():
+        with vectorstore.ingest_lock("c"):
+            held.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=holder)
+    thread.start()
+    held.wait(5)
+    try:
+        with request_scope("waiting"):
+            cancel_request("waiting")
+            with pytest.raises(RequestCancelled):
+                with vectorstore.ingest_lock("c"):
+                    pass
+    finally:
+        release.set()
+        thread.join()
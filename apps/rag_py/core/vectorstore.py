@@ -1,65 +1,225 @@
 import logging
-from typing import List, Optional
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import List
 
 import chromadb
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
 
 from apps.rag_py.config.settings import settings
 from apps.rag_py.core.embeddings import get_embeddings
+from apps.rag_py.core.query_cache import query_result_cache
+from apps.rag_py.utils.cancellation import check_cancelled
+from apps.rag_py.utils.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+# Process-wide collection handles and cached counts, keyed by collection name.
+# Counts are dropped by invalidate_collection() whenever a collection is written,
+# which also bumps the version that cached search results are keyed by; writes
+# through get_collection() handles do this on their own.
+_collections = {}
+_collection_counts = {}
+_collection_versions = {}
+_vectorstores = {}
+_registry_lock = threading.RLock()
+# Called with a collection name after its handles are released or it is dropped
+_release_callbacks = []
+# One ingest at a time per collection, across the heavy lane's workers
+_ingest_locks = {}
+
+INDEX_BATCH_SIZE = 256
+
+@lru_cache(maxsize=1)
 def get_chroma_client():
-    """Create and return a ChromaDB client"""
+    """Return the shared ChromaDB client"""
     return chromadb.PersistentClient(path=settings.PERSIST_DIR)
 
-def initialize_vectorstore(collection_name: str, documents: List[Document] = None) -> Chroma:
-    """Initialize vectorstore with optional documents"""
-    client = get_chroma_client()
-    embeddings = get_embeddings()
-    
+def _use_flat_index() -> bool:
+    return settings.VECTOR_BACKEND == 'flat'
+
+def _flat_index_path(collection_name: str) -> Path:
+    return Path(settings.FLAT_INDEX_DIR) / collection_name
+
+def _open_flat_index(collection_name: str):
+    # Imported lazily so the Chroma backend doesn't need numpy at import time
+    from apps.rag_py.core.flat_vectorstore import FlatVectorStore
+    return FlatVectorStore(_flat_index_path(collection_name), get_embeddings(), settings.FLAT_INDEX_DTYPE)
+
+class TrackedCollection:
+    """Collection handle that invalidates cached state after every write.
+
+    Reads and anything else are passed through to the wrapped Chroma
+    collection or flat index, so callers can't write and forget to call
+    invalidate_collection().
+    """
+
+    WRITES = ('add', 'upsert', 'update', 'delete')
+
+    def __init__(self, collection_name: str, collection):
+        self._collection_name = collection_name
+        self._collection = collection
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name not in self.WRITES:
+            return attr
+
+        def write(*args, **kwargs):
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                # Also after a failed write, which may have been partly applied
+                invalidate_collection(self._collection_name)
+        return write
+
+def get_collection(collection_name: str, create: bool = False):
+    """Return a cached collection handle; raises if missing and `create` is False"""
+    with _registry_lock:
+        collection = _collections.get(collection_name)
+        if collection is None and _use_flat_index():
+            if not create and not _flat_index_path(collection_name).exists():
+                raise ValueError(f"Collection {collection_name} does not exist.")
+            # The flat index is its own collection and vectorstore
+            flat_index = _vectorstores.get(collection_name) or _open_flat_index(collection_name)
+            _vectorstores[collection_name] = flat_index
+            collection = _collections[collection_name] = TrackedCollection(collection_name, flat_index)
+        elif collection is None:
+            client = get_chroma_client()
+            if create:
+                collection = client.get_or_create_collection(name=collection_name)
+            else:
+                collection = client.get_collection(name=collection_name)
+            collection = _collections[collection_name] = TrackedCollection(collection_name, collection)
+        return collection
+
+def collection_exists(collection_name: str) -> bool:
+    try:
+        get_collection(collection_name)
+        return True
+    except Exception:
+        return False
+
+def get_collection_count(collection_name: str) -> int:
+    with _registry_lock:
+        if collection_name not in _collection_counts:
+            _collection_counts[collection_name] = get_collection(collection_name).count()
+        return _collection_counts[collection_name]
+
+def get_collection_version(collection_name: str) -> int:
+    """Counter bumped on every write; 0 until the collection is first written in this process"""
+    with _registry_lock:
+        return _collection_versions.get(collection_name, 0)
+
+def invalidate_collection(collection_name: str):
+    """Forget cached state that a write to the collection makes stale"""
+    with _registry_lock:
+        _collection_counts.pop(collection_name, None)
+        _collection_versions[collection_name] = _collection_versions.get(collection_name, 0) + 1
+    query_result_cache.discard(collection_name)
+
+@contextmanager
+def ingest_lock(collection_name: str):
+    """Serialize drops, rebuilds and syncs of one collection.
+
+    Reentrant, so a rebuild can call initialize_vectorstore() while holding
+    it. A request waiting for another ingest still stops when cancelled.
+    """
+    with _registry_lock:
+        lock = _ingest_locks.setdefault(collection_name, threading.RLock())
+    while not lock.acquire(timeout=1.0):
+        check_cancelled()
+    try:
+        yield
+    finally:
+        lock.release()
+
+def add_release_callback(callback):
+    """Have `callback(collection_name)` called whenever a collection is released or dropped"""
+    _release_callbacks.append(callback)
+
+def _notify_released(collection_name: str):
+    for callback in _release_callbacks:
+        callback(collection_name)
+
+def release_vectorstore(collection_name: str):
+    """Drop the cached handles for a collection nothing is chatting with any more.
+
+    Only Chroma handles are released: a flat index may be shared with an
+    ingest that is still writing to it, and must stay a single instance.
+    """
+    if _use_flat_index():
+        return
+    with _registry_lock:
+        _collections.pop(collection_name, None)
+        _vectorstores.pop(collection_name, None)
+    _notify_released(collection_name)
+
+def drop_collection(collection_name: str):
+    """Delete a collection and everything cached about it"""
+    with ingest_lock(collection_name), _registry_lock:
+        if _use_flat_index():
+            if collection_exists(collection_name):
+                get_collection(collection_name).drop()
+        elif collection_exists(collection_name):
+            get_chroma_client().delete_collection(name=collection_name)
+        _collections.pop(collection_name, None)
+        _vectorstores.pop(collection_name, None)
+    invalidate_collection(collection_name)
+    _notify_released(collection_name)
+
+def initialize_vectorstore(collection_name: str, documents: List[Document] = None, progress=None) -> VectorStore:
+    """Initialize vectorstore with optional documents.
+
+    Documents are added INDEX_BATCH_SIZE at a time; `progress(stage, **counts)`
+    is called after each batch and may raise to stop between batches.
+    """
     try:
-        # Check if collection exists and has documents
-        existing_collections = [col.name for col in client.list_collections()]
-        if collection_name in existing_collections:
-            collection = client.get_collection(collection_name)
-            if collection.count() > 0:
-                logger.info(f"Using existing collection with {collection.count()} documents")
-                return Chroma(
-                    client=client,
-                    collection_name=collection_name,
-                    embedding_function=embeddings,
-                    persist_directory=settings.PERSIST_DIR
-                )
+        with ingest_lock(collection_name):
+            # Check if collection exists and has documents
+            if collection_exists(collection_name):
+                count = get_collection_count(collection_name)
+                if count > 0:
+                    logger.info(f"Using existing collection with {count} documents")
+                    return get_vectorstore(collection_name)
         
-        # Create new collection with documents if provided
-        logger.info(f"Creating new collection: {collection_name}")
-        if documents:
-            logger.info(f"Indexing {len(documents)} documents")
-            return Chroma.from_documents(
-                documents=documents,
-                embedding=embeddings,
-                collection_name=collection_name,
-                persist_directory=settings.PERSIST_DIR,
-                client=client
-            )
-        return Chroma(
-            client=client,
-            collection_name=collection_name,
-            embedding_function=embeddings,
-            persist_directory=settings.PERSIST_DIR
-        )
+            # Create new collection with documents if provided
+            logger.info(f"Creating new collection: {collection_name}")
+            vectorstore = get_vectorstore(collection_name)
+            if documents:
+                logger.info(f"Indexing {len(documents)} documents")
+                progress = progress or (lambda stage, **counts: None)
+                progress('embed', total=len(documents))
+                for i in range(0, len(documents), INDEX_BATCH_SIZE):
+                    check_cancelled()
+                    batch = documents[i:i + INDEX_BATCH_SIZE]
+                    # The vectorstore embeds as it adds; that time is recorded as 'embed'
+                    with metrics.stage('store'):
+                        vectorstore.add_documents(batch)
+                    invalidate_collection(collection_name)
+                    progress('store', embedded=i + len(batch), stored=i + len(batch))
+            return vectorstore
     except Exception as e:
         logger.error(f"Vectorstore initialization failed: {e}")
         raise
 
-def get_vectorstore(collection_name: str) -> Chroma:
-    client = get_chroma_client()
-    embeddings = get_embeddings()
-    return Chroma(
-        client=client,
-        collection_name=collection_name,
-        embedding_function=embeddings,
-        persist_directory=settings.PERSIST_DIR,
-    )
+def get_vectorstore(collection_name: str) -> VectorStore:
+    """Return the shared vectorstore for a collection, creating it if needed"""
+    with _registry_lock:
+        vectorstore = _vectorstores.get(collection_name)
+        if vectorstore is None and _use_flat_index():
+            get_collection(collection_name, create=True)
+            vectorstore = _vectorstores[collection_name]
+        elif vectorstore is None:
+            vectorstore = Chroma(
+                client=get_chroma_client(),
+                collection_name=collection_name,
+                embedding_function=get_embeddings(),
+                persist_directory=settings.PERSIST_DIR,
+            )
+            _vectorstores[collection_name] = vectorstore
+        return vectorstore
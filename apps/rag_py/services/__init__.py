@@ -1,4 +1,8 @@
+from .job_manager import IndexJob, JobCancelled, JobManager, job_manager
 from .rag_pipeline import init_session, query_session, run_rag_pipeline
 from .session_manager import SessionManager
+from .session_registry import SessionRegistry
+from .session_store import ChatSession, SessionStore, session_store
+from .session_warmup import join_warmup, warm_session, warm_session_in_background
 
-__all__ = ['run_rag_pipeline', 'init_session', 'query_session', 'SessionManager']
\ No newline at end of file
+__all__ = ['run_rag_pipeline', 'init_session', 'query_session', 'SessionManager', 'ChatSession', 'SessionStore', 'SessionRegistry', 'session_store', 'join_warmup', 'warm_session', 'warm_session_in_background', 'IndexJob', 'JobCancelled', 'JobManager', 'job_manager']
\ No newline at end of file
@@ -0,0 +1,166 @@
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from apps.rag_py.config.settings import settings
+from apps.rag_py.utils.cancellation import DeadlineExceeded, RequestCancelled
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED = {DONE, FAILED, CANCELLED}
+
+
+class JobCancelled(RequestCancelled):
+    pass
+
+
+class IndexJob:
+    """A long-running ingest whose progress can be polled, pushed or cancelled.
+
+    Ingest code reports progress through `update`, which is also where a
+    cancelled job stops: the next batch boundary raises `JobCancelled`.
+    A streaming job also owns a bounded queue of uploaded batches.
+    """
+
+    def __init__(self, job_id: str, kind: str, collection_name: str = None):
+        self.id = job_id
+        self.kind = kind
+        self.collection_name = collection_name
+        self.status = QUEUED
+        self.counts = {'parsed': 0, 'embedded': 0, 'stored': 0, 'total': 0}
+        self.stage = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.listener: Optional[Callable[[dict], None]] = None
+        self.batches: Optional[queue.Queue] = None
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def open_stream(self, max_batches: int):
+        self.batches = queue.Queue(max_batches)
+
+    def close_stream(self):
+        """Stop accepting batches and drop any that were never consumed"""
+        self.batches = None
+
+    def start(self):
+        if self.cancelled:
+            raise JobCancelled(self.id)
+        self.status = RUNNING
+        self.started_at = time.time()
+        self._notify()
+
+    def update(self, stage: str = None, **counts):
+        if stage:
+            self.stage = stage
+        self.counts.update(counts)
+        self._notify()
+        if self.cancelled:
+            raise JobCancelled(self.id)
+
+    def finish(self, result=None, error: Exception = None):
+        if isinstance(error, RequestCancelled) and not isinstance(error, DeadlineExceeded):
+            self.status = CANCELLED
+        elif error is not None:
+            self.status = FAILED
+            self.error = str(error)
+        else:
+            self.status = DONE
+            self.result = result
+        self.finished_at = time.time()
+        self._notify()
+
+    def eta_seconds(self) -> Optional[float]:
+        """Linear estimate from the stored rate; None until something is stored"""
+        total, stored = self.counts['total'], self.counts['stored']
+        if self.status != RUNNING or not total or not stored:
+            return None
+        elapsed = time.time() - self.started_at
+        return round(elapsed / stored * (total - stored), 1)
+
+    def snapshot(self) -> dict:
+        batches = self.batches
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'collection': self.collection_name,
+            'status': self.status,
+            'stage': self.stage,
+            **self.counts,
+            'eta_seconds': self.eta_seconds(),
+            'queued_batches': batches.qsize() if batches is not None else None,
+            'result': self.result,
+            'error': self.error,
+        }
+
+    def _notify(self):
+        if self.listener is None:
+            return
+        try:
+            self.listener(self.snapshot())
+        except Exception as e:
+            logger.warning(f"Dropping progress update for job {self.id}: {e}")
+
+
+class JobManager:
+    """Registry of index jobs; finished jobs are kept for polling up to `max_finished`"""
+
+    def __init__(self, max_finished: int = 100):
+        self.max_finished = max_finished
+        self._jobs: OrderedDict[str, IndexJob] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, kind: str, collection_name: str = None, stream_batches: int = 0) -> IndexJob:
+        job = IndexJob(uuid.uuid4().hex[:12], kind, collection_name)
+        if stream_batches:
+            job.open_stream(stream_batches)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        return job
+
+    def get(self, job_id: str) -> Optional[IndexJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[IndexJob]:
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel()
+        if job.status == QUEUED:
+            # Never started, so nothing will report the cancellation for it
+            job.finish(error=JobCancelled(job.id))
+            job.close_stream()
+        return job
+
+    def list(self) -> list[dict]:
+        with self._lock:
+            return [job.snapshot() for job in self._jobs.values()]
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+
+job_manager = JobManager(settings.MAX_FINISHED_JOBS)
@@ -6,14 +6,42 @@ from apps.rag_py.config.logging_config import configure_logging
 from apps.rag_py.config.settings import settings
 from apps.rag_py.core.document_processing import load_and_split_documents
 from apps.rag_py.core.retriever import Retriever
-from apps.rag_py.core.vectorstore import initialize_vectorstore
+from apps.rag_py.core.source_fingerprint import (
+    is_collection_current,
+    record_source_fingerprint,
+)
+from apps.rag_py.core.vectorstore import (
+    drop_collection,
+    get_vectorstore,
+    ingest_lock,
+    initialize_vectorstore,
+)
+from apps.rag_py.services.session_store import ChatSession, session_store
+from apps.rag_py.services.session_warmup import join_warmup, warm_session_in_background
 from apps.rag_py.utils.sanitize_collection_name import sanitize_collection_name
 
 logger = logging.getLogger(__name__)
 configure_logging()
 
-# session_id -> Retriever
-session_store: dict[str, Retriever] = {}
+def build_docs_vectorstore(collection_name: str, path: str, req_type: str):
+    """Return the collection's vectorstore, loading and splitting the source only if it changed"""
+    # Held from the freshness check on, so a second build waits and then finds the collection current
+    with ingest_lock(collection_name):
+        if is_collection_current(collection_name, path, req_type):
+            logger.info(f"Collection '{collection_name}' is up to date, skipping document loading")
+            return get_vectorstore(collection_name)
+
+        documents = load_and_split_documents(path, req_type)
+        logger.info(f"Loaded and split {len(documents)} documents")
+        if not documents:
+            return initialize_vectorstore(collection_name)
+
+        # Stale or legacy collection: rebuild it from the current source
+        drop_collection(collection_name)
+        vectorstore = initialize_vectorstore(collection_name, documents)
+        record_source_fingerprint(collection_name, path, req_type)
+        return vectorstore
+
 
 def run_rag_pipeline(path: str, query: str, req_type: str) -> list[str]:
     logger.info("Starting RAG pipeline")
@@ -24,12 +52,9 @@ def run_rag_pipeline(path: str, query: str, req_type: str) -> list[str]:
 
     start_time = time.time()
 
-    documents = load_and_split_documents(path, req_type)
-    logger.info(f"Loaded and split {len(documents)} documents")
+    vectorstore = build_docs_vectorstore(COLLECTION_NAME, path, req_type)
 
-    vectorstore = initialize_vectorstore(COLLECTION_NAME, documents)
-
-    retriever = Retriever(vectorstore=vectorstore)
+    retriever = Retriever(vectorstore=vectorstore, collection_name=COLLECTION_NAME)
 
     results = retriever.invoke(query)
 
@@ -40,22 +65,20 @@ def run_rag_pipeline(path: str, query: str, req_type: str) -> list[str]:
 
 
 
-def init_session(session_id: str, path: str, doc_type: str):
+def init_session(session_id: str, path: str, doc_type: str, query: str = None, warm_up: bool = False):
     logger.info(f"Initializing session: {session_id}")
 
     COLLECTION_NAME = sanitize_collection_name(path)
     logger.info(f"Sanitized collection name: {COLLECTION_NAME}")
 
-    documents = load_and_split_documents(path, doc_type)
-    logger.info(f"Loaded and split {len(documents)} documents for session: {session_id}")
-
-    vectorstore = initialize_vectorstore(COLLECTION_NAME, documents)
+    vectorstore = build_docs_vectorstore(COLLECTION_NAME, path, doc_type)
 
-    retriever = Retriever(vectorstore=vectorstore)
+    retriever = Retriever(vectorstore=vectorstore, collection_name=COLLECTION_NAME)
 
-    from services import rag_pipeline
-    rag_pipeline.session_store[session_id] = retriever
+    session = session_store.put(ChatSession(session_id, 'docs', COLLECTION_NAME, retriever, path, doc_type))
     logger.info(f"Retriever stored for session: {session_id}")
+    if warm_up:
+        warm_session_in_background(session, query)
 
     return retriever
 
@@ -63,12 +86,13 @@ def init_session(session_id: str, path: str, doc_type: str):
 def query_session(session_id: str, query: str) -> list[str]:
     logger.info(f"Querying session: {session_id}")
 
-    retriever = session_store.get(session_id)
-    if not retriever:
+    session = session_store.get(session_id)
+    if not session:
         logger.error("Invalid session_id")
         raise ValueError("Invalid session_id")
 
-    results = retriever.invoke(query)
+    join_warmup(session.collection_name)
+    results = session.retriever.invoke(query)
 
     logger.info(f"Query completed for session: {session_id}")
     return [doc.page_content for doc in results]
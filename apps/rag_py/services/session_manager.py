@@ -1,50 +1,59 @@
 import logging
 
+from apps.rag_py.config.settings import settings
 from apps.rag_py.core.retriever import Retriever
 from apps.rag_py.core.vectorstore import get_vectorstore
+from apps.rag_py.services.session_store import ChatSession, session_store
+from apps.rag_py.services.session_warmup import join_warmup, warm_session_in_background
 from apps.rag_py.utils.sanitize_collection_name import sanitize_collection_name
 
 logger = logging.getLogger(__name__)
 
 
-SESSION_STORE = {} 
-
 class SessionManager:
     def __init__(self, request):
         self.session_id = request.get('session_id')
         self.path = request.get('path')
         self.type = request.get('type')
         self.query = request.get('query') or request.get('message')
+        self.warm_up = request.get('warm_up', settings.SESSION_WARMUP)
 
     def initialize_session(self):
         try:
             collection_name = sanitize_collection_name(self.path)
             vectorstore = get_vectorstore(collection_name)
-            retriever = Retriever(vectorstore=vectorstore)
+            retriever = Retriever(vectorstore=vectorstore, collection_name=collection_name)
 
-            SESSION_STORE[self.session_id] = {
-                'retriever' : retriever,
-                'collection_name' : collection_name
-            }
+            session = session_store.put(ChatSession(self.session_id, 'codebase', collection_name, retriever, self.path, self.type))
+            if self.warm_up:
+                # The first chat_message then finds the index and model loaded
+                warm_session_in_background(session, self.query)
 
             logger.info(f'\n\nChat initialization Successfull \n\n')
             return {'success': True,'retriever':retriever, 'collection_name' : collection_name}
         except Exception as e:    
             return {'success': False,'error':e}
 
+    def end_session(self):
+        if not session_store.end(self.session_id):
+            return {'success': False, 'error': "Invalid session ID"}
+        logger.info(f"Chat session {self.session_id} ended")
+        return {'success': True}
+
     def query_session(self):
         try:
             print('\n\n inside query session \n\n')
             print(f'\n\n self.session_id = {self.session_id}  \n\n')
             print(f'\n\n self.query = {self.query}  \n\n')
 
-            retriever = SESSION_STORE.get(self.session_id).get('retriever')
-            collection_name = SESSION_STORE.get(self.session_id).get('collection_name')
-            print(f'\n\n retriever got successfully \n\n')
-            if not retriever:
+            session = session_store.get(self.session_id)
+            if not session:
                 raise ValueError("Invalid session ID")
+            collection_name = session.collection_name
+            print(f'\n\n retriever got successfully \n\n')
 
-            results = retriever.invoke(self.query)
+            join_warmup(collection_name)
+            results = session.retriever.invoke(self.query)
             print(f'\n\n Results got successfully: \n {results} \n\n')
 
             logger.info(f'\n\nChat Query Successful. Received {len(results)} documents \n\n')
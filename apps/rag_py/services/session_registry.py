@@ -0,0 +1,102 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SessionRegistry:
+    """SQLite record of chat session descriptors, so sessions survive a restart.
+
+    Only what is needed to reopen a session is kept: its kind, collection,
+    source path, doc type and top_k. Descriptors unused for `ttl` seconds
+    are pruned, and at most `max_entries` are kept.
+    """
+
+    def __init__(self, path: str, ttl: float, max_entries: int):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None  # opened on first use
+
+    def _db(self) -> sqlite3.Connection:
+        """Open the database on first use; must be called with the lock held"""
+        if self._conn is not None:
+            return self._conn
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                collection_name TEXT NOT NULL,
+                path TEXT,
+                doc_type TEXT,
+                top_k INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_used ON sessions (last_used)")
+        conn.commit()
+        self._conn = conn
+        return conn
+
+    def save(self, descriptor: dict):
+        with self._lock:
+            conn = self._db()
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    descriptor['session_id'],
+                    descriptor['kind'],
+                    descriptor['collection_name'],
+                    descriptor.get('path'),
+                    descriptor.get('doc_type'),
+                    descriptor['top_k'],
+                    descriptor['created_at'],
+                    time.time(),
+                ),
+            )
+            self._prune(conn)
+            conn.commit()
+
+    def load(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db().execute(
+                "SELECT session_id, kind, collection_name, path, doc_type, top_k, created_at, last_used "
+                "FROM sessions WHERE session_id = ? AND last_used >= ?",
+                (session_id, time.time() - self.ttl),
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ('session_id', 'kind', 'collection_name', 'path', 'doc_type', 'top_k', 'created_at', 'last_used')
+        return dict(zip(keys, row))
+
+    def touch(self, session_id: str):
+        with self._lock:
+            conn = self._db()
+            conn.execute("UPDATE sessions SET last_used = ? WHERE session_id = ?", (time.time(), session_id))
+            conn.commit()
+
+    def delete(self, session_id: str):
+        with self._lock:
+            conn = self._db()
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            conn.commit()
+
+    def _prune(self, conn: sqlite3.Connection):
+        conn.execute("DELETE FROM sessions WHERE last_used < ?", (time.time() - self.ttl,))
+        conn.execute(
+            "DELETE FROM sessions WHERE session_id NOT IN "
+            "(SELECT session_id FROM sessions ORDER BY last_used DESC LIMIT ?)",
+            (self.max_entries,),
+        )
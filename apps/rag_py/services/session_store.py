@@ -0,0 +1,253 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from apps.rag_py.config.settings import settings
+from apps.rag_py.core.retriever import Retriever
+from apps.rag_py.core.vectorstore import (
+    collection_exists,
+    get_vectorstore,
+    release_vectorstore,
+)
+from apps.rag_py.services.session_registry import SessionRegistry
+
+logger = logging.getLogger(__name__)
+
+# Seconds between writes of a session's last use to the registry
+REGISTRY_TOUCH_INTERVAL = 60.0
+# Seconds between resident memory checks, so one burst can't evict many sessions
+MEMORY_CHECK_INTERVAL = 5.0
+
+
+def current_rss_mb() -> Optional[float]:
+    """Resident memory of this process, or None where /proc isn't available"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+class ChatSession:
+    def __init__(
+        self,
+        session_id: str,
+        kind: str,
+        collection_name: str,
+        retriever: Retriever,
+        path: str = None,
+        doc_type: str = None,
+    ):
+        self.id = session_id
+        self.kind = kind  # 'codebase' or 'docs'
+        self.collection_name = collection_name
+        self.retriever = retriever
+        self.path = path
+        self.doc_type = doc_type
+        self.created_at = time.time()
+        self.last_used = time.monotonic()
+        self.persisted_at = self.last_used
+
+    def descriptor(self) -> dict:
+        return {
+            'session_id': self.id,
+            'kind': self.kind,
+            'collection_name': self.collection_name,
+            'path': self.path,
+            'doc_type': self.doc_type,
+            'top_k': self.retriever.top_k,
+            'created_at': self.created_at,
+        }
+
+    @classmethod
+    def from_descriptor(cls, descriptor: dict) -> 'ChatSession':
+        """Reopen a session over its existing collection; nothing is loaded or re-embedded"""
+        collection_name = descriptor['collection_name']
+        retriever = Retriever(
+            vectorstore=get_vectorstore(collection_name),
+            collection_name=collection_name,
+            top_k=descriptor['top_k'],
+        )
+        session = cls(
+            descriptor['session_id'],
+            descriptor['kind'],
+            collection_name,
+            retriever,
+            descriptor.get('path'),
+            descriptor.get('doc_type'),
+        )
+        session.created_at = descriptor['created_at']
+        return session
+
+
+class SessionStore:
+    """Chat sessions of every kind, bounded by idle time, count and memory.
+
+    Sessions idle for `idle_ttl` seconds expire and at most `max_sessions`
+    are kept, least recently used going first. While the process is above
+    `max_memory_mb` of resident memory, the least recently used session is
+    evicted, at most one per MEMORY_CHECK_INTERVAL, and only as long as the
+    previous eviction brought memory down: a session holds little beyond
+    its share of a vectorstore, and the model and client stay loaded
+    regardless. Expiry is checked lazily on every access, and the session
+    being stored or looked up is never the one evicted for count or memory.
+
+    Sessions over the same collection share its vectorstore handle; the
+    handle is released when the last session using it goes away.
+
+    With a `registry`, session descriptors are also written to disk. A
+    session that was evicted, or lost to a restart, is reopened from its
+    descriptor on the next access, as long as its collection still exists.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int,
+        idle_ttl: float,
+        max_memory_mb: int = 0,
+        registry: Optional[SessionRegistry] = None,
+    ):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_memory_mb = max_memory_mb
+        self.registry = registry
+        self._sessions: OrderedDict[str, ChatSession] = OrderedDict()
+        self._lock = threading.Lock()
+        self._memory_checked_at = 0.0
+        self._rss_at_eviction = None  # RSS when memory last caused an eviction
+
+    def put(self, session: ChatSession) -> ChatSession:
+        with self._lock:
+            released = self._insert(session)
+        self._release(released)
+        if self.registry is not None and session.id:
+            self.registry.save(session.descriptor())
+        return session
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        with self._lock:
+            released = self._evict(keep=session_id)
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_used = time.monotonic()
+                self._sessions.move_to_end(session_id)
+        self._release(released)
+        if session is None:
+            return self._rehydrate(session_id)
+
+        if self.registry is not None and session.last_used - session.persisted_at > REGISTRY_TOUCH_INTERVAL:
+            session.persisted_at = session.last_used
+            self.registry.touch(session_id)
+        return session
+
+    def end(self, session_id: str) -> bool:
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            ended = session is not None
+            if self.registry is not None and session_id:
+                # A session that was evicted from memory can still be ended.
+                # Deleted under the lock, so a concurrent reopen either lands
+                # before this and is popped, or finds no descriptor
+                ended = ended or self.registry.load(session_id) is not None
+                self.registry.delete(session_id)
+        self._release([session] if session is not None else [])
+        return ended
+
+    def _rehydrate(self, session_id: str) -> Optional[ChatSession]:
+        if self.registry is None or not session_id:
+            return None
+        descriptor = self.registry.load(session_id)
+        if descriptor is None:
+            return None
+        if not collection_exists(descriptor['collection_name']):
+            logger.warning(f"Dropping session {session_id}: collection {descriptor['collection_name']} is gone")
+            self.registry.delete(session_id)
+            return None
+        logger.info(f"Reopening {descriptor['kind']} session {session_id} from the registry")
+        session = ChatSession.from_descriptor(descriptor)
+        with self._lock:
+            # The session may have been ended, or reopened by another caller,
+            # while its collection was being opened
+            if self.registry.load(session_id) is None:
+                released = [session]
+                session = None
+            elif session_id in self._sessions:
+                released = [session]
+                session = self._sessions[session_id]
+            else:
+                released = self._insert(session)
+        self._release(released)
+        if session is not None:
+            # A touch, unlike a save, can't bring back a descriptor deleted since
+            self.registry.touch(session_id)
+        return session
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'collections': len({session.collection_name for session in self._sessions.values()}),
+                'rss_mb': current_rss_mb(),
+            }
+
+    def _insert(self, session: ChatSession) -> list[ChatSession]:
+        """Store a session and return those it displaced; must be called with the lock held"""
+        replaced = self._sessions.pop(session.id, None)
+        self._sessions[session.id] = session
+        released = [replaced] if replaced is not None and replaced is not session else []
+        return released + self._evict(keep=session.id)
+
+    def _evict(self, keep: str = None) -> list[ChatSession]:
+        """Drop expired and surplus sessions; must be called with the lock held"""
+        evicted = []
+        cutoff = time.monotonic() - self.idle_ttl
+        for session_id, session in list(self._sessions.items()):
+            if session.last_used >= cutoff:
+                break  # ordered by last use, so the rest are fresher
+            evicted.append(self._sessions.pop(session_id))
+
+        def evict_oldest() -> bool:
+            oldest = next((session_id for session_id in self._sessions if session_id != keep), None)
+            if oldest is None:
+                return False
+            evicted.append(self._sessions.pop(oldest))
+            return True
+
+        while len(self._sessions) > self.max_sessions and evict_oldest():
+            pass
+        if self.max_memory_mb and not evicted and time.monotonic() - self._memory_checked_at >= MEMORY_CHECK_INTERVAL:
+            self._memory_checked_at = time.monotonic()
+            rss = current_rss_mb() or 0
+            if rss <= self.max_memory_mb:
+                self._rss_at_eviction = None
+            elif (self._rss_at_eviction is None or rss < self._rss_at_eviction) and evict_oldest():
+                self._rss_at_eviction = rss
+
+        for session in evicted:
+            logger.info(f"Evicted {session.kind} session {session.id}")
+        return evicted
+
+    def _release(self, sessions: list[ChatSession]):
+        with self._lock:
+            in_use = {session.collection_name for session in self._sessions.values()}
+        for collection_name in {session.collection_name for session in sessions} - in_use:
+            release_vectorstore(collection_name)
+
+
+# Shared by the codebase and docs chat handlers
+session_store = SessionStore(
+    settings.SESSION_MAX_SESSIONS,
+    settings.SESSION_IDLE_TTL,
+    settings.SESSION_MAX_MEMORY_MB,
+    SessionRegistry(
+        # Relative paths are kept under PERSIST_DIR, next to the collections they point at
+        os.path.join(os.path.abspath(settings.PERSIST_DIR), settings.SESSION_REGISTRY_PATH),
+        settings.SESSION_REGISTRY_TTL,
+        settings.SESSION_REGISTRY_MAX,
+    )
+    if settings.SESSION_REGISTRY_PATH else None,
+)
@@ -0,0 +1,112 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+from apps.rag_py.config.settings import settings
+from apps.rag_py.core.vectorstore import add_release_callback, get_collection_count
+from apps.rag_py.services.session_store import ChatSession
+
+logger = logging.getLogger(__name__)
+
+# Embedded only to load the model; never cached as a query
+WARMUP_TEXT = "warm up"
+# Warm-ups waiting for a thread beyond this are skipped, not queued
+MAX_PENDING_WARMUPS = 8
+
+# One small pool for every session, so a burst of init_chats can't run
+# unbounded model and index work next to the worker lanes
+_executor = ThreadPoolExecutor(max_workers=settings.SESSION_WARMUP_WORKERS, thread_name_prefix='warmup')
+_warmups: OrderedDict[str, Future] = OrderedDict()  # collection -> running or successful warm-up
+# Reentrant: cancelling a future under the lock runs its done-callback right away
+_warmups_lock = threading.RLock()
+
+
+def warm_session(session: ChatSession, query: Optional[str] = None) -> bool:
+    """Load everything a session's first query would otherwise wait for.
+
+    A dummy embedding loads the embedding model, a one-result search pulls
+    the collection's vector index into memory, and the collection count is
+    cached. With a `query` (init_chat carries the user's first question) it
+    is retrieved through the session's retriever as well, so the query
+    embedding and result caches already hold the first answer.
+
+    Returns whether the warm-up succeeded.
+    """
+    started = time.perf_counter()
+    try:
+        vectorstore = session.retriever.current_vectorstore()
+        embedding = vectorstore.embeddings.embed_query(WARMUP_TEXT)
+        if get_collection_count(session.collection_name):
+            vectorstore.similarity_search_by_vector(embedding, k=1)
+        if query:
+            session.retriever.invoke(query)
+    except Exception as e:
+        logger.warning(f"Warm-up of session {session.id} failed: {e}")
+        return False
+    logger.info(f"Warmed up session {session.id} in {time.perf_counter() - started:.2f}s")
+    return True
+
+
+def forget_warmup(collection_name: str, future: Optional[Future] = None):
+    """Let the next session over a collection warm it up again.
+
+    With a `future`, the entry is only dropped if it is still that warm-up.
+    """
+    with _warmups_lock:
+        if future is None or _warmups.get(collection_name) is future:
+            _warmups.pop(collection_name, None)
+
+
+def _forget_unless_warmed(collection_name: str, future: Future):
+    if future.cancelled() or future.exception() is not None or not future.result():
+        forget_warmup(collection_name, future)
+
+
+# A released or rebuilt collection has nothing loaded any more
+add_release_callback(forget_warmup)
+
+
+def warm_session_in_background(session: ChatSession, query: Optional[str] = None) -> Optional[Future]:
+    """Queue a warm-up on the shared pool, once per collection.
+
+    Returns the collection's existing warm-up if one is running or done,
+    and None when too many are already waiting. A warm-up that fails or is
+    cancelled is forgotten, as is one whose collection is released or
+    rebuilt, so a later session can try again.
+    """
+    with _warmups_lock:
+        future = _warmups.get(session.collection_name)
+        if future is not None:
+            return future
+        if sum(not future.done() for future in _warmups.values()) >= MAX_PENDING_WARMUPS:
+            logger.info(f"Skipping warm-up of session {session.id}: too many warm-ups pending")
+            return None
+        future = _executor.submit(warm_session, session, query)
+        _warmups[session.collection_name] = future
+        # Remember finished warm-ups for as many collections as sessions can hold
+        while len(_warmups) > settings.SESSION_MAX_SESSIONS:
+            _warmups.popitem(last=False)
+    future.add_done_callback(lambda done: _forget_unless_warmed(session.collection_name, done))
+    return future
+
+
+def join_warmup(collection_name: str):
+    """Let a query share the collection's warm-up instead of redoing it.
+
+    A warm-up still waiting for a thread is cancelled, since the query does
+    the same work itself; one already running is waited for, up to
+    SESSION_WARMUP_WAIT seconds.
+    """
+    with _warmups_lock:
+        future = _warmups.get(collection_name)
+        if future is None or future.done():
+            return
+        if future.cancel():
+            return  # its done-callback forgets it
+    try:
+        future.result(timeout=settings.SESSION_WARMUP_WAIT)
+    except Exception:
+        pass  # warm_session logs its own failures; a slow one is simply not waited for
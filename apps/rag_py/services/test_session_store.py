@@ -0,0 +1,133 @@
+import importlib
+from types import SimpleNamespace
+
+import pytest
+
+from apps.rag_py.services.session_registry import SessionRegistry
+from apps.rag_py.services.session_store import ChatSession, SessionStore
+
+# By path: the services package re-exports the store instance under the module's name
+store_module = importlib.import_module("apps.rag_py.services.session_store")
+
+
+@pytest.fixture(autouse=True)
+def released(monkeypatch):
+    """Collections whose vectorstore handles were released"""
+    names = []
+    monkeypatch.setattr(store_module, "release_vectorstore", names.append)
+    return names
+
+
+def _session(session_id: str, collection_name: str = "c") -> ChatSession:
+    return ChatSession(session_id, "docs", collection_name, SimpleNamespace(top_k=3))
+
+
+def test_count_limit_evicts_least_recently_used():
+    store = SessionStore(max_sessions=2, idle_ttl=3600)
+    for session_id in ["a", "b"]:
+        store.put(_session(session_id))
+    store.get("a")
+    store.put(_session("c"))
+
+    assert store.get("b") is None
+    assert store.get("a") is not None and store.get("c") is not None
+
+
+def test_idle_sessions_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(store_module.time, "monotonic", lambda: now[0])
+    store = SessionStore(max_sessions=10, idle_ttl=60)
+    store.put(_session("old"))
+    now[0] += 30
+    store.put(_session("new"))
+    now[0] += 40
+
+    assert store.get("old") is None
+    assert store.get("new") is not None
+
+
+def test_memory_pressure_evicts_one_session_per_check(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(store_module.time, "monotonic", lambda: now[0])
+    rss = [500.0]
+    monkeypatch.setattr(store_module, "current_rss_mb", lambda: rss[0])
+    store = SessionStore(max_sessions=10, idle_ttl=3600, max_memory_mb=100)
+
+    store.put(_session("a"))
+    now[0] += store_module.MEMORY_CHECK_INTERVAL
+    # Puts within one check interval evict at most one session between them
+    for session_id in ["b", "c", "d"]:
+        now[0] += 0.1
+        store.put(_session(session_id))
+    assert list(store._sessions) == ["b", "c", "d"]
+
+    # Memory didn't drop after that eviction, so evicting more wouldn't help
+    now[0] += store_module.MEMORY_CHECK_INTERVAL
+    store.put(_session("e"))
+    assert list(store._sessions) == ["b", "c", "d", "e"]
+
+    # A lookup never evicts the session being looked up
+    rss[0] = 400.0
+    now[0] += store_module.MEMORY_CHECK_INTERVAL
+    assert store.get("b") is not None
+    assert list(store._sessions) == ["d", "e", "b"]
+
+
+def test_last_session_of_a_collection_releases_its_vectorstore(released):
+    store = SessionStore(max_sessions=10, idle_ttl=3600)
+    store.put(_session("a", "shared"))
+    store.put(_session("b", "shared"))
+
+    store.end("a")
+    assert released == []
+    store.end("b")
+    assert released == ["shared"]
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(store_module, "collection_exists", lambda name: name != "gone")
+    monkeypatch.setattr(
+        ChatSession,
+        "from_descriptor",
+        classmethod(lambda cls, descriptor: _session(descriptor["session_id"], descriptor["collection_name"])),
+    )
+    return SessionRegistry(str(tmp_path / "sessions.sqlite3"), ttl=3600, max_entries=100)
+
+
+def test_registry_is_created_on_first_use(tmp_path):
+    path = tmp_path / "data" / "sessions.sqlite3"
+    registry = SessionRegistry(str(path), ttl=3600, max_entries=100)
+    assert not path.parent.exists()
+
+    assert registry.load("missing") is None
+    assert path.exists()
+
+
+def test_evicted_session_is_reopened_from_the_registry(registry):
+    store = SessionStore(max_sessions=1, idle_ttl=3600, registry=registry)
+    store.put(_session("a"))
+    store.put(_session("b"))
+    assert "a" not in store._sessions
+
+    reopened = store.get("a")
+    assert reopened is not None and reopened.collection_name == "c"
+    assert store.get("a") is reopened
+
+
+def test_sessions_over_dropped_collections_are_forgotten(registry):
+    SessionStore(max_sessions=10, idle_ttl=3600, registry=registry).put(_session("a", "gone"))
+    store = SessionStore(max_sessions=10, idle_ttl=3600, registry=registry)
+
+    assert store.get("a") is None
+    assert registry.load("a") is None
+
+
+def test_ended_session_is_not_reopened(registry):
+    store = SessionStore(max_sessions=1, idle_ttl=3600, registry=registry)
+    store.put(_session("a"))
+    store.put(_session("b"))
+
+    assert store.end("a") is True
+    assert store.get("a") is None
+    assert store.end("a") is False
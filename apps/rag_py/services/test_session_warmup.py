@@ -0,0 +1,74 @@
+import importlib
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from apps.rag_py.core import vectorstore
+
+warmup = importlib.import_module("apps.rag_py.services.session_warmup")
+
+
+@pytest.fixture(autouse=True)
+def clean_warmups():
+    warmup._warmups.clear()
+    yield
+    warmup._warmups.clear()
+
+
+def _session(session_id: str, collection_name: str = "c"):
+    return SimpleNamespace(id=session_id, collection_name=collection_name)
+
+
+def test_one_warmup_per_collection(monkeypatch):
+    calls = []
+    monkeypatch.setattr(warmup, "warm_session", lambda session, query=None: calls.append(session.id) or True)
+
+    first = warmup.warm_session_in_background(_session("s1"))
+    first.result(timeout=5)
+    assert warmup.warm_session_in_background(_session("s2")) is first
+    assert calls == ["s1"]
+
+
+def test_failed_warmup_is_retried(monkeypatch):
+    results = iter([False, True])
+    monkeypatch.setattr(warmup, "warm_session", lambda session, query=None: next(results))
+
+    failed = warmup.warm_session_in_background(_session("s1"))
+    assert failed.result(timeout=5) is False
+    assert "c" not in warmup._warmups
+
+    retried = warmup.warm_session_in_background(_session("s2"))
+    assert retried is not failed and retried.result(timeout=5) is True
+    assert warmup._warmups["c"] is retried
+
+
+def test_released_collection_is_warmed_again(monkeypatch):
+    monkeypatch.setattr(warmup, "warm_session", lambda session, query=None: True)
+    monkeypatch.setattr(vectorstore, "_use_flat_index", lambda: False)
+
+    warmup.warm_session_in_background(_session("s1")).result(timeout=5)
+    vectorstore.release_vectorstore("c")
+    assert "c" not in warmup._warmups
+
+
+@pytest.mark.skipif(warmup._executor._max_workers != 1, reason="needs the default single warm-up thread")
+def test_query_cancels_a_warmup_that_has_not_started(monkeypatch):
+    running = threading.Event()
+    release = threading.Event()
+
+    def slow(session, query=None):
+        running.set()
+        return release.wait(5)
+
+    monkeypatch.setattr(warmup, "warm_session", slow)
+    blocker = warmup.warm_session_in_background(_session("s1", "busy"))
+    running.wait(5)
+    queued = warmup.warm_session_in_background(_session("s2", "c"))
+
+    warmup.join_warmup("c")
+    assert queued.cancelled()
+    assert "c" not in warmup._warmups
+
+    release.set()
+    blocker.result(timeout=5)
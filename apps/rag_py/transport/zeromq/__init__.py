@@ -1,15 +1,19 @@
 from .agent_req_handler import (
     agent_handler,
     crawl_markdown_from_url,
+    ingest_urls,
     split_markdown_by_headings,
 )
 from .codebase_rag_handler import (
     codebase_rag_handler,
     format_codebase_results,
     handle_chat,
+    ingest_codebase,
     retrieve_data,
 )
+from .codec import decode, encode, supported_content_types
+from .dispatcher import create_index_job, handle_request, request_lane
 from .docs_rag_handler import docs_rag_handler
 from .server import ZeroMQServer
 
-__all__ = ['crawl_markdown_from_url', 'split_markdown_by_headings', 'agent_handler', 'format_codebase_results', 'retrieve_data', 'handle_chat', 'codebase_rag_handler', 'docs_rag_handler', 'ZeroMQServer']
\ No newline at end of file
+__all__ = ['crawl_markdown_from_url', 'split_markdown_by_headings', 'agent_handler', 'ingest_urls', 'format_codebase_results', 'retrieve_data', 'handle_chat', 'ingest_codebase', 'codebase_rag_handler', 'docs_rag_handler', 'decode', 'encode', 'supported_content_types', 'create_index_job', 'handle_request', 'request_lane', 'ZeroMQServer']
\ No newline at end of file
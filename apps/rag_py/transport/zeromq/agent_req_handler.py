@@ -12,7 +12,9 @@ from unstructured.partition.md import partition_md
 from apps.rag_py.config.settings import settings
 from apps.rag_py.core.retriever import Retriever
 from apps.rag_py.core.vectorstore import initialize_vectorstore
+from apps.rag_py.utils.cancellation import check_cancelled
 from apps.rag_py.utils.sanitize_collection_name import sanitize_collection_name
+from apps.rag_py.utils.metrics import metrics
 from apps.rag_py.utils.sanitize_text import sanitize_text
 
 
@@ -66,6 +68,45 @@ def split_markdown_by_headings(markdown: str) -> list[Document]:
 
 
 
+def ingest_urls(urls: list[str], progress=None):
+    """Crawl, split and store the pages behind `urls`; returns the vectorstore"""
+    progress = progress or (lambda stage, **counts: None)
+    os.environ['USER_AGENT'] = settings.USER_AGENT
+
+    all_docs = []
+    for url in urls:
+        check_cancelled()
+        with metrics.stage('load'):
+            markdown = crawl_markdown_from_url(url)
+        with metrics.stage('split'):
+            docs = split_markdown_by_headings(markdown)
+        all_docs.extend(docs)
+        progress('parse', parsed=len(all_docs))
+
+    print(f"Grouped into {len(all_docs)} heading-based chunks")
+
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=settings.CHUNK_SIZE,
+        chunk_overlap=settings.CHUNK_OVERLAP,
+        length_function=len,
+        is_separator_regex=False,
+    )
+
+    smart_splits = []
+    with metrics.stage('split'):
+        for doc in all_docs:
+            if len(doc.page_content) > settings.CHUNK_SIZE:
+                smart_splits.extend(text_splitter.split_documents([doc]))
+            else:
+                smart_splits.append(doc)
+
+    print(f"Final stored chunks: {len(smart_splits)}")
+
+    # Store in vector DB (e.g., Chroma)
+    COLLECTION_NAME = sanitize_collection_name(json.dumps(urls))
+    return initialize_vectorstore(COLLECTION_NAME, smart_splits, progress)
+
+
 def agent_handler(request: dict) -> list[str]:
     """
     RAG Agent for querying content from crawled markdown pages.
@@ -79,7 +120,6 @@ def agent_handler(request: dict) -> list[str]:
         list of relevant chunk texts
     """
     start_time = time.time()
-    os.environ['USER_AGENT'] = settings.USER_AGENT
 
     urls = request.get("urls")
     query = request.get("query")
@@ -89,36 +129,10 @@ def agent_handler(request: dict) -> list[str]:
     if not query:
         raise ValueError("`query` is required")
 
-    all_docs = []
-    for url in urls:
-        markdown = crawl_markdown_from_url(url)
-        docs = split_markdown_by_headings(markdown)
-        all_docs.extend(docs)
-
-    print(f"Grouped into {len(all_docs)} heading-based chunks")
-
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=settings.CHUNK_SIZE,
-        chunk_overlap=settings.CHUNK_OVERLAP,
-        length_function=len,
-        is_separator_regex=False,
-    )
-
-    smart_splits = []
-    for doc in all_docs:
-        if len(doc.page_content) > settings.CHUNK_SIZE:
-            smart_splits.extend(text_splitter.split_documents([doc]))
-        else:
-            smart_splits.append(doc)
-
-    print(f"Final stored chunks: {len(smart_splits)}")
-
-    # Store in vector DB (e.g., Chroma)
-    COLLECTION_NAME = sanitize_collection_name(json.dumps(urls))
-    vectorstore = initialize_vectorstore(COLLECTION_NAME, smart_splits)
+    vectorstore = ingest_urls(urls)
 
     # Retrieve
-    retriever = Retriever(vectorstore=vectorstore)
+    retriever = Retriever(vectorstore=vectorstore, collection_name=sanitize_collection_name(json.dumps(urls)))
     results = retriever.invoke(query)
 
     duration = time.time() - start_time
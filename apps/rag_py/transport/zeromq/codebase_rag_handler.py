@@ -4,13 +4,10 @@ import time
 
 from apps.rag_py.config.logging_config import configure_logging
 from apps.rag_py.config.settings import settings
-from apps.rag_py.core.codebase.add_embeddings_to_vectorstore import (
-    add_embeddings_to_vectorstore,
-)
 from apps.rag_py.core.codebase.check_existing_collection import (
     check_existing_collection,
 )
-from apps.rag_py.core.codebase.create_embeddings import create_embeddings
+from apps.rag_py.core.codebase.sync_collection import sync_codebase_collection
 from apps.rag_py.core.retriever import Retriever
 from apps.rag_py.core.vectorstore import get_vectorstore
 from apps.rag_py.services.session_manager import SessionManager
@@ -52,9 +49,9 @@ def retrieve_data(collection_name: str, query:str):
     logger.info(f"Retrieving Started for: {collection_name}")
     start_time = time.time()
     vectorstore = get_vectorstore(collection_name)
-    retriever = Retriever(vectorstore=vectorstore)
+    retriever = Retriever(vectorstore=vectorstore, collection_name=collection_name)
     results = retriever.invoke(query)
-    return format_codebase_results(results, collection_name, query, time.time())
+    return format_codebase_results(results, collection_name, query, start_time)
 
 def handle_chat(request):
     chat = SessionManager(request)
@@ -71,6 +68,7 @@ def handle_chat(request):
 
     elif chat_type == "chat_message":
         print("\n>> Inside chat_message")
+        start_time = time.time()
         response = chat.query_session()
         if not response.get("success"):
             err = response.get("error")
@@ -78,14 +76,35 @@ def handle_chat(request):
             return {"success": False, "error": str(err)} 
         results = response.get("results")
         collection_name = response.get("collection_name")
-        data = format_codebase_results(results, collection_name, chat.query, time.time())  
+        data = format_codebase_results(results, collection_name, chat.query, start_time)
         return {'success': True, 'type': request.get('type'), 'data': data }
 
+    elif chat_type == "end_chat":
+        response = chat.end_session()
+        if not response.get("success"):
+            return {"success": False, "error": response.get("error")}
+        return {"success": True, "msg": "Chat Session Ended"}
+
     else:
         print(f"\n>> Unknown chat_type: {chat_type}")
         return {"success": False, "error": f"Unknown chat_type: {chat_type}"}
 
 
+def ingest_codebase(request, progress=None) -> tuple[str, dict]:
+    """Sync the request's parsed codebase into its collection; returns (collection name, sync counts)"""
+    parsedCodebase = request.get('parsedCodebase')
+    COLLECTION_NAME = sanitize_collection_name(request.get('path'))
+
+    # A new collection is built from scratch; an existing one only re-embeds
+    # changed files when the client sends a fresh parse
+    if parsedCodebase or not check_existing_collection(COLLECTION_NAME):
+        synced = sync_codebase_collection(COLLECTION_NAME, parsedCodebase or [], progress)
+        if not synced.get('success', False):
+            raise Exception(synced.get('error', "Failed to add embeddings to vectorstore"))
+        return COLLECTION_NAME, synced
+    return COLLECTION_NAME, {'success': True}
+
+
 def codebase_rag_handler(request):
     try:
 
@@ -93,24 +112,12 @@ def codebase_rag_handler(request):
         chat_type = request.get("chat_type", "").strip().lower() or ""
         print(f">> chat_type: {chat_type}")
 
-        if chat_type == 'init_chat' or chat_type == 'chat_message':
+        if chat_type in ('init_chat', 'chat_message', 'end_chat'):
             return handle_chat(request)
 
 
-        path = request.get('path')
-        parsedCodebase = request.get('parsedCodebase')
         query = request.get('query')
-
-        COLLECTION_NAME = sanitize_collection_name(path)
-
-        if not check_existing_collection(COLLECTION_NAME):
-            # Create embeddings
-            embedded_chunks = create_embeddings(parsedCodebase)
-
-            # Store them in ChromaDB
-            added_embeddings = add_embeddings_to_vectorstore(COLLECTION_NAME, embedded_chunks)
-            if not added_embeddings.get('success', False):
-                raise Exception("Failed to add embeddings to vectorstore")
+        COLLECTION_NAME, _ = ingest_codebase(request)
 
         data = retrieve_data(COLLECTION_NAME, query)
         return data
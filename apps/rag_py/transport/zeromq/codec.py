@@ -0,0 +1,80 @@
+import json
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Content types look like "application/msgpack" or "application/msgpack+zstd".
+# A message without a content-type frame is plain JSON, as before.
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+
+
+class UnsupportedContentType(ValueError):
+    pass
+
+
+@lru_cache(maxsize=None)
+def _module(name: str):
+    """Import an optional codec dependency, or None when it isn't installed"""
+    try:
+        if name == 'lz4':
+            import lz4.frame
+            return lz4.frame
+        return __import__(name)
+    except ImportError:
+        return None
+
+
+def _zstd_compress(data: bytes) -> bytes:
+    return _module('zstandard').ZstdCompressor(level=3).compress(data)
+
+
+def _zstd_decompress(data) -> bytes:
+    # decompressobj copes with frames that don't record their content size
+    return _module('zstandard').ZstdDecompressor().decompressobj().decompress(data)
+
+
+COMPRESSIONS = {
+    'zstd': ('zstandard', _zstd_compress, _zstd_decompress),
+    'lz4': ('lz4', lambda data: _module('lz4').compress(data), lambda data: _module('lz4').decompress(data)),
+}
+
+
+def supported_content_types() -> list[str]:
+    formats = [JSON] + ([MSGPACK] if _module('msgpack') else [])
+    compressions = [name for name, (module, _, _) in COMPRESSIONS.items() if _module(module)]
+    return formats + [f"{fmt}+{compression}" for fmt in formats for compression in compressions]
+
+
+def parse_content_type(content_type: str) -> tuple[str, str]:
+    """Split a content type into (format, compression) and check it can be served"""
+    fmt, _, compression = (content_type or JSON).partition('+')
+    if fmt not in (JSON, MSGPACK) or (compression and compression not in COMPRESSIONS):
+        raise UnsupportedContentType(f"Unsupported content type: {content_type}")
+    if fmt == MSGPACK and not _module('msgpack'):
+        raise UnsupportedContentType("msgpack is not installed on the server")
+    if compression and not _module(COMPRESSIONS[compression][0]):
+        raise UnsupportedContentType(f"{compression} compression is not installed on the server")
+    return fmt, compression
+
+
+def decode(payload, content_type: str = '') -> dict:
+    """Decode a request body; `payload` may be bytes or a zero-copy memoryview of a frame"""
+    fmt, compression = parse_content_type(content_type)
+    if compression:
+        payload = COMPRESSIONS[compression][2](payload)
+    if fmt == MSGPACK:
+        return _module('msgpack').unpackb(payload, raw=False, strict_map_key=False)
+    return json.loads(bytes(payload) if isinstance(payload, memoryview) else payload)
+
+
+def encode(data, content_type: str = '') -> bytes:
+    fmt, compression = parse_content_type(content_type)
+    if fmt == MSGPACK:
+        payload = _module('msgpack').packb(data, use_bin_type=True, default=str)
+    else:
+        payload = json.dumps(data).encode()
+    if compression:
+        payload = COMPRESSIONS[compression][1](payload)
+    return payload
@@ -0,0 +1,351 @@
+import json
+import logging
+import queue
+import threading
+import time
+
+import zmq
+
+from apps.rag_py.config.settings import settings
+from apps.rag_py.core.codebase.check_existing_collection import (
+    check_existing_collection,
+)
+from apps.rag_py.core.codebase.sync_collection import sync_codebase_stream
+from apps.rag_py.services.job_manager import FINISHED, IndexJob, JobCancelled, job_manager
+from apps.rag_py.transport.zeromq.agent_req_handler import agent_handler, ingest_urls
+from apps.rag_py.transport.zeromq.codebase_rag_handler import (
+    codebase_rag_handler,
+    ingest_codebase,
+)
+from apps.rag_py.transport.zeromq.codec import decode, encode
+from apps.rag_py.transport.zeromq.docs_rag_handler import docs_rag_handler
+from apps.rag_py.utils.cancellation import (
+    DeadlineExceeded,
+    RequestCancelled,
+    cancel_request,
+    check_cancelled,
+    register_request,
+    release_request,
+    request_scope,
+)
+from apps.rag_py.utils.metrics import metrics
+from apps.rag_py.utils.sanitize_collection_name import sanitize_collection_name
+
+logger = logging.getLogger(__name__)
+
+FAST_LANE = 'fast'
+HEAVY_LANE = 'heavy'
+
+# Worker <-> broker frame kinds on the inproc backend
+READY = b'READY'
+REPLY = b'REPLY'  # final answer to a client; the worker is idle again
+PUSH = b'PUSH'  # unsolicited frame for a client; the worker is still busy
+DONE = b'DONE'  # finished a job nobody is waiting on; the worker is idle again
+
+# Frames for clients posted by threads that don't own a worker socket
+BROKER_OUTBOX = 'inproc://codr-outbox'
+
+INDEX_TARGETS = ('codebase', 'agent')
+
+# Request types recorded in metrics under their own name; the type comes from
+# the client, so anything else is recorded as 'unknown' to bound the series
+REQUEST_TYPES = frozenset({
+    'agent', 'cancel', 'check_collection', 'codebase', 'doc', 'index',
+    'job_status', 'stats', 'webpage', 'upload', 'none',
+})
+
+# An empty body in a stream frame marks the end of the stream
+END_OF_STREAM = None
+
+
+def metric_type(req_type) -> str:
+    return req_type if isinstance(req_type, str) and req_type in REQUEST_TYPES else 'unknown'
+
+
+def request_lane(request: dict) -> str:
+    """Cheap requests go to the fast lane so they never queue behind an ingest"""
+    req_type = request.get('type')
+    chat_type = (request.get('chat_type') or '').strip().lower()
+
+    if req_type in ('check_collection', 'job_status', 'cancel') or chat_type in ('chat_message', 'end_chat'):
+        return FAST_LANE
+    # Starting a codebase chat only opens the existing collection; docs chats
+    # may have to load and embed their sources first
+    if req_type == 'codebase' and chat_type == 'init_chat':
+        return FAST_LANE
+    return HEAVY_LANE
+
+
+def create_index_job(request: dict) -> IndexJob:
+    """Validate an `index` request and register its job; the work runs later on the heavy lane"""
+    target = request.get('target', 'codebase')
+    if target == 'codebase':
+        if not request.get('path'):
+            raise ValueError("`path` is required")
+        collection_name = sanitize_collection_name(request.get('path'))
+        if request.get('stream'):
+            return job_manager.create(target, collection_name, settings.INDEX_STREAM_MAX_QUEUED)
+    elif target == 'agent':
+        urls = request.get('urls')
+        if not urls or not isinstance(urls, list):
+            raise ValueError("`urls` must be a non-empty list")
+        collection_name = sanitize_collection_name(json.dumps(urls))
+    else:
+        raise ValueError(f"Unknown index target '{target}'. Expected one of: {', '.join(INDEX_TARGETS)}")
+    return job_manager.create(target, collection_name)
+
+
+def accept_stream_batch(job_id: str, content_type: str, payload) -> dict:
+    """Queue one uploaded batch (or the end marker) for a streaming index job.
+
+    The batch is queued undecoded; the worker consuming the stream decodes
+    it. A full queue is answered with `busy` so the client retries later,
+    which bounds what the server holds to INDEX_STREAM_MAX_QUEUED batches.
+    """
+    job = job_manager.get(job_id)
+    batches = job.batches if job is not None else None
+    if batches is None:
+        status = job.status if job is not None else 'unknown'
+        return {"success": False, "error": f"Job {job_id} is not accepting batches ({status})"}
+
+    item = END_OF_STREAM if len(payload) == 0 else (content_type, payload)
+    try:
+        batches.put_nowait(item)
+    except queue.Full:
+        return {"success": False, "busy": True, "error": "Stream queue is full, retry shortly", **job.snapshot()}
+    return {"success": True, **job.snapshot()}
+
+
+def iter_stream_batches(job: IndexJob):
+    """Yield decoded entity batches from a streaming job until its end marker"""
+    last_batch = time.monotonic()
+    while True:
+        batches = job.batches
+        if batches is None or job.cancelled:
+            raise JobCancelled(job.id)
+        try:
+            item = batches.get(timeout=1)
+        except queue.Empty:
+            if time.monotonic() - last_batch > settings.INDEX_STREAM_IDLE_TIMEOUT:
+                raise TimeoutError(f"No batch received for {settings.INDEX_STREAM_IDLE_TIMEOUT}s")
+            continue
+        if item is END_OF_STREAM:
+            return
+        content_type, payload = item
+        with metrics.stage('decode'):
+            body = decode(payload.buffer, content_type)
+        yield body['entities'] if isinstance(body, dict) else body
+        last_batch = time.monotonic()
+
+
+def run_index_job(job: IndexJob, request: dict):
+    if job.status in FINISHED:
+        # Cancelled while still queued
+        return
+    try:
+        job.start()
+        if job.batches is not None:
+            result = sync_codebase_stream(job.collection_name, iter_stream_batches(job), job.update)
+            if not result.get('success', False):
+                raise Exception(result.get('error', "Failed to add embeddings to vectorstore"))
+        elif job.kind == 'codebase':
+            _, result = ingest_codebase(request, job.update)
+        else:
+            ingest_urls(request['urls'], job.update)
+            result = {'success': True}
+        job.finish(result)
+    except Exception as e:
+        if isinstance(e, DeadlineExceeded):
+            logger.warning(f"Index job {job.id} ran past its deadline")
+            metrics.inc('deadline_exceeded', type=metrics.request_type)
+        elif isinstance(e, RequestCancelled):
+            logger.info(f"Index job {job.id} cancelled")
+        else:
+            logger.error(f"Index job {job.id} failed: {e}")
+        job.finish(error=e)
+    finally:
+        job.close_stream()
+
+
+def handle_job_request(request: dict, identity: bytes = b'') -> dict:
+    job_id = request.get('job_id')
+    if request.get('type') == 'job_status' and not job_id:
+        return {"success": True, "jobs": job_manager.list()}
+    if request.get('type') == 'cancel' and not job_id:
+        # Not a job: stop a plain request this client sent with a `request_id`
+        request_id = request.get('request_id')
+        if not cancel_request(request_id, identity):
+            return {"success": False, "error": f"Unknown request_id: {request_id}"}
+        return {"success": True, "request_id": request_id, "status": "cancelling"}
+
+    job = job_manager.cancel(job_id) if request.get('type') == 'cancel' else job_manager.get(job_id)
+    if job is None:
+        return {"success": False, "error": f"Unknown job_id: {job_id}"}
+    return {"success": True, **job.snapshot()}
+
+
+def handle_request(request: dict, identity: bytes = b'') -> dict:
+    req_type = request.get('type')
+    if req_type in ('job_status', 'cancel'):
+        return handle_job_request(request, identity)
+    if req_type == 'agent':
+        return agent_handler(request)
+    if req_type == 'check_collection':
+        exists = check_existing_collection(sanitize_collection_name(request.get('path')))
+        return {"success": True, "exists": exists}
+    if req_type == 'codebase':
+        return codebase_rag_handler(request)
+    return docs_rag_handler(request)
+
+
+def decode_request(payload, content_type: str) -> dict:
+    """Decode a request body, recording the time under the request's own type"""
+    started = time.perf_counter()
+    request = decode(payload, content_type)
+    req_type = metric_type(request.get('type') or 'none')
+    metrics.observe('decode', time.perf_counter() - started, req_type)
+    metrics.inc('requests', type=req_type)
+    return request
+
+
+def cancellable_id(request: dict):
+    """The id a request can be cancelled by; a `cancel` names its target with the same field"""
+    if request.get('type') in ('cancel', 'job_status'):
+        return None
+    return request.get('request_id')
+
+
+def request_deadline(request: dict, received_at: float):
+    """Absolute time.time() deadline from `deadline_ms` (relative to receipt) or `deadline` (epoch seconds)"""
+    if request.get('deadline_ms') is not None:
+        return received_at + float(request['deadline_ms']) / 1000
+    if request.get('deadline') is not None:
+        return float(request['deadline'])
+    return None
+
+
+def post_to_broker(context: zmq.Context, frames: list):
+    """Send frames through the broker's outbox from a thread that doesn't own `socket`"""
+    outbox = context.socket(zmq.PUSH)
+    outbox.setsockopt(zmq.LINGER, 1000)
+    try:
+        outbox.connect(BROKER_OUTBOX)
+        outbox.send_multipart(frames, copy=False)
+    finally:
+        outbox.close()
+
+
+def _serve_task(socket: zmq.Socket, task: dict):
+    identity, content_type = task['identity'], task['content_type']
+    owner = threading.get_ident()
+
+    def send(kind: bytes, data: dict):
+        with metrics.stage('encode'):
+            payload = encode(data, content_type)
+        frames = [kind, identity, content_type.encode(), payload]
+        if threading.get_ident() == owner:
+            socket.send_multipart(frames, copy=False)
+        else:
+            # A job listener runs on whichever thread cancelled the job, and
+            # ZeroMQ sockets aren't thread-safe
+            post_to_broker(socket.context, frames)
+
+    request, job = task['request'], task['job']
+    try:
+        if request is None:
+            request = decode_request(task['payload'].buffer, content_type)
+            task['payload'] = None
+            if request.get('type') == 'index':
+                job = create_index_job(request)
+            if cancellable_id(request):
+                # Queued as an undecoded upload, so the broker couldn't register it
+                register_request(cancellable_id(request), identity)
+            if job is not None:
+                send(PUSH, {"success": True, **job.snapshot()})
+    except Exception as e:
+        logger.error(f"Request failed: {e}")
+        metrics.inc('request_errors', type='undecoded')
+        send(REPLY, {"success": False, "error": str(e)})
+        return
+
+    req_type = metric_type(request.get('type') or 'none')
+    request_id = cancellable_id(request)
+    with metrics.request(req_type):
+        metrics.observe('queue', time.perf_counter() - task['received'])
+        try:
+            deadline = request_deadline(request, task['received_at'])
+        except (TypeError, ValueError):
+            deadline = None
+            logger.warning(f"Ignoring malformed deadline in {req_type} request")
+
+        if deadline is not None and time.time() > deadline:
+            # Went stale while queued; don't start work nobody is waiting for
+            logger.info(f"Dropping {req_type} request, deadline passed while queued")
+            metrics.inc('deadline_exceeded', type=req_type)
+            if request_id:
+                release_request(request_id, identity)
+            if job is not None:
+                job.finish(error=DeadlineExceeded("Request deadline exceeded"))
+                job.close_stream()
+                if request.get('subscribe'):
+                    # No listener was ever attached; this is the job's last frame
+                    send(PUSH, {"event": "job_progress", **job.snapshot()})
+                socket.send(DONE)
+            else:
+                send(REPLY, {"success": False, "error": "Request deadline exceeded", "deadline_exceeded": True})
+            return
+
+        with request_scope(request_id, deadline, identity):
+            if job is not None:
+                if request.get('subscribe'):
+                    job.listener = lambda snapshot: send(PUSH, {"event": "job_progress", **snapshot})
+                run_index_job(job, request)
+                job.listener = None
+                if job.error:
+                    metrics.inc('request_errors', type=req_type)
+                socket.send(DONE)
+                return
+
+            try:
+                check_cancelled()  # cancelled while it was queued
+                response = handle_request(request, identity)
+            except DeadlineExceeded as e:
+                metrics.inc('deadline_exceeded', type=req_type)
+                response = {"success": False, "error": str(e), "deadline_exceeded": True}
+            except RequestCancelled as e:
+                logger.info(f"Request {request_id} cancelled")
+                response = {"success": False, "error": str(e), "cancelled": True}
+            except Exception as e:
+                logger.error(f"Request failed: {e}")
+                response = {"success": False, "error": str(e)}
+        if isinstance(response, dict) and response.get('error'):
+            metrics.inc('request_errors', type=req_type)
+        send(REPLY, response)
+        metrics.observe('total', time.perf_counter() - task['received'])
+
+
+def run_worker(context: zmq.Context, endpoint: str, tasks: dict, stop: threading.Event):
+    """Serve requests handed out by the broker until `stop` is set.
+
+    The broker keeps tasks in `tasks` and only sends the task id over the
+    backend socket, so large payloads are never copied. Oversized bodies
+    arrive undecoded and are decoded here, as are all replies, off the
+    broker thread.
+
+    Index jobs are acknowledged before they run; while one runs, its
+    progress snapshots are pushed to the submitting client if it asked to
+    `subscribe` (which needs a DEALER client, a REQ socket can't take them).
+    """
+    socket = context.socket(zmq.DEALER)
+    socket.setsockopt(zmq.LINGER, 0)
+    socket.connect(endpoint)
+    socket.send(READY)
+
+    poller = zmq.Poller()
+    poller.register(socket, zmq.POLLIN)
+    while not stop.is_set():
+        if not poller.poll(timeout=100):
+            continue
+        _serve_task(socket, tasks.pop(socket.recv()))
+
+    socket.close()
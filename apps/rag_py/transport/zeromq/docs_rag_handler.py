@@ -1,6 +1,6 @@
-from apps.rag_py.services.rag_pipeline import init_session, run_rag_pipeline
-
-session_store = {}
+from apps.rag_py.config.settings import settings
+from apps.rag_py.services.rag_pipeline import init_session, query_session, run_rag_pipeline
+from apps.rag_py.services.session_store import session_store
 
 def docs_rag_handler(request: dict) -> dict:
     chat_type = request.get("chat_type")
@@ -15,8 +15,7 @@ def docs_rag_handler(request: dict) -> dict:
             return {"error": "Missing 'session_id', 'path', or 'query'"}
 
         try:
-            retriever = init_session(session_id, path, type)
-            session_store[session_id] = retriever 
+            init_session(session_id, path, type, query, request.get("warm_up", settings.SESSION_WARMUP))
             return { "msg": "Chat Session Created"}
         except Exception as e:
             return { "error": str(e) }
@@ -28,17 +27,21 @@ def docs_rag_handler(request: dict) -> dict:
         if not session_id or not query:
             return {"error": "Missing 'session_id' or 'message'"}
 
-        retriever = session_store.get(session_id)
-        if not retriever:
+        if not session_store.get(session_id):
             return {"error": "Invalid session_id or session expired."}
 
         try:
-            results = retriever.invoke(query)
-            results = [doc.page_content for doc in results]
+            results = query_session(session_id, query)
             return {'success': True, 'type': request.get('type'), 'data': results }
         except Exception as e:
             return { "error": str(e) }
 
+    elif chat_type == "end_chat":
+        session_id = request.get("session_id")
+        if not session_store.end(session_id):
+            return {"error": "Invalid session_id or session expired."}
+        return {"success": True, "msg": "Chat Session Ended"}
+
     else:
         path = request.get("path")
         query = request.get("query")
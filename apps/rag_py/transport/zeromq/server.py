@@ -1,95 +1,321 @@
-import json
 import logging
-import os
 import signal
-import sys
+import threading
+import time
+from collections import OrderedDict, deque
 
 import zmq
 
-from apps.rag_py.core.codebase.check_existing_collection import (
-    check_existing_collection,
+from apps.rag_py.config.settings import settings
+from apps.rag_py.services.job_manager import FINISHED
+from apps.rag_py.transport.zeromq.codec import (
+    UnsupportedContentType,
+    encode,
+    parse_content_type,
+    supported_content_types,
 )
-from apps.rag_py.utils.sanitize_collection_name import sanitize_collection_name
+from apps.rag_py.transport.zeromq.dispatcher import (
+    BROKER_OUTBOX,
+    DONE,
+    FAST_LANE,
+    HEAVY_LANE,
+    PUSH,
+    READY,
+    REPLY,
+    accept_stream_batch,
+    cancellable_id,
+    create_index_job,
+    decode_request,
+    metric_type,
+    request_lane,
+    run_worker,
+)
+from apps.rag_py.utils.cancellation import register_request, release_request
+from apps.rag_py.utils.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))  
 
-from transport.zeromq.agent_req_handler import agent_handler
-from transport.zeromq.codebase_rag_handler import codebase_rag_handler
-from transport.zeromq.docs_rag_handler import docs_rag_handler
+class ZeroMQServer:
+    """ROUTER front end that hands requests to lanes of worker threads.
+
+    Each lane has its own inproc ROUTER backend; workers connect with a DEALER
+    socket and announce themselves idle, and the broker only sends a task to
+    an idle worker, so a long ingest on the heavy lane never holds up `ping`,
+    `check_collection` or chat queries on the fast lane. Only this thread
+    touches the front-end socket.
 
+    A request is [content type, body] after the envelope, or just a JSON
+    body; see codec.py. Replies use the request's content type. Batches for
+    a streaming index job are [content type, batch, job id] and go straight
+    to that job's queue without being decoded here.
 
-class ZeroMQServer:
-    def __init__(self, host: str = '127.0.0.1', port: str = '5500'):
+    Each request type may only have so many requests waiting for a worker
+    (SERVER_QUEUE_LIMITS); beyond that it is answered `busy` with a
+    `retry_after_ms` hint. A request may carry `deadline_ms` (or an absolute
+    `deadline`) after which it is dropped or stopped at the next batch, and
+    a `request_id` that a later `cancel` request from the same client socket
+    can name.
+
+    Worker threads that need to reach a client without owning a worker
+    socket (a job listener fired by a cancel) post frames to the outbox,
+    which this thread forwards.
+    """
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: str = '5500',
+        fast_workers: int = None,
+        heavy_workers: int = None,
+    ):
         self.port = port
         self.host = host
         self.context = zmq.Context()
         self.socket = self.context.socket(zmq.ROUTER) 
+        self.outbox = self.context.socket(zmq.PULL)
+        self.outbox.setsockopt(zmq.LINGER, 0)
         self.poller = zmq.Poller()
-        self.clients = {}  # client_id -> metadata
+        self.clients = OrderedDict()  # client_id -> metadata, least recently seen first
         self.running = False
+        self.lanes = {
+            FAST_LANE: self._make_lane(FAST_LANE, fast_workers or settings.SERVER_FAST_WORKERS),
+            HEAVY_LANE: self._make_lane(HEAVY_LANE, heavy_workers or settings.SERVER_HEAVY_WORKERS),
+        }
+        self.tasks = {}  # task_id -> task, handed to workers by id
+        self._queued = {}  # request type -> tasks waiting for a worker
+        self._next_task = 0
+        self._stop_workers = threading.Event()
+        self._threads = []
+        self._next_metrics_dump = 0.0
+
+    def _make_lane(self, name: str, workers: int) -> dict:
+        backend = self.context.socket(zmq.ROUTER)
+        backend.setsockopt(zmq.LINGER, 0)
+        return {
+            'name': name,
+            'endpoint': f"inproc://codr-{name}-workers",
+            'backend': backend,
+            'workers': workers,
+            'idle': deque(),
+            'pending': deque(),
+        }
 
     def start(self):
         self.socket.bind(f"tcp://{self.host}:{self.port}")
         self.poller.register(self.socket, zmq.POLLIN) 
+        self.outbox.bind(BROKER_OUTBOX)
+        self.poller.register(self.outbox, zmq.POLLIN)
+        for lane in self.lanes.values():
+            lane['backend'].bind(lane['endpoint'])
+            self.poller.register(lane['backend'], zmq.POLLIN)
+            for i in range(lane['workers']):
+                thread = threading.Thread(
+                    target=run_worker,
+                    args=(self.context, lane['endpoint'], self.tasks, self._stop_workers),
+                    name=f"{lane['name']}-worker-{i}",
+                    daemon=True,
+                )
+                thread.start()
+                self._threads.append(thread)
         self._setup_signal_handlers()
         self.running = True
 
-        logger.info(f"\nServer started on tcp://{self.host}:{self.port}")
-        self._event_loop()
+        logger.info(
+            f"\nServer started on tcp://{self.host}:{self.port} "
+            f"({self.lanes[FAST_LANE]['workers']} fast, {self.lanes[HEAVY_LANE]['workers']} heavy workers)"
+        )
+        try:
+            self._event_loop()
+        finally:
+            self._close()
 
     def _event_loop(self):
         while self.running:
             socks = dict(self.poller.poll(timeout=100))
             if self.socket in socks:
                 self._handle_request()
+            for lane in self.lanes.values():
+                if lane['backend'] in socks:
+                    self._handle_worker_message(lane)
+            if self.outbox in socks:
+                _, *frames = self.outbox.recv_multipart()
+                self._send_frames(*frames)
+            self._reap_finished_jobs()
+            self._dump_metrics()
 
     def _handle_request(self):
+        content_type = ''
         try:
-            parts = self.socket.recv_multipart()
-            if len(parts) == 3:
-                identity, empty, msg_bytes = parts
-            elif len(parts) == 2:
-                identity, msg_bytes = parts
+            # copy=False keeps large payload frames as zero-copy buffers
+            identity, *frames = self.socket.recv_multipart(copy=False)
+            identity = identity.bytes
+            if frames and len(frames[0]) == 0:
+                frames = frames[1:]  # REQ envelope delimiter
+            if len(frames) == 3:
+                # [content type, batch, job id]: an upload to a streaming index job
+                content_type, payload = frames[0].bytes.decode(), frames[1]
+                parse_content_type(content_type)
+                response = accept_stream_batch(frames[2].bytes.decode(), content_type, payload)
+                return self.send_to_client(identity, response, content_type)
+            elif len(frames) == 2:
+                content_type, payload = frames[0].bytes.decode(), frames[1]
+            elif len(frames) == 1:
+                content_type, payload = '', frames[0]
             else:
-                raise ValueError(f"Unexpected frame count: {len(parts)}")
-
-            print(identity, msg_bytes)
+                raise ValueError(f"Unexpected frame count: {len(frames) + 1}")
 
-            request = json.loads(msg_bytes.decode())
             logger.info(f"Received request from {identity}")
+            self._touch_client(identity)
 
-            self.clients[identity] = {}
-
-            req_type = request.get('type')
-            if req_type == 'agent':
-                response = agent_handler(request)
-            elif req_type == 'ping':
-                return self.send_to_client(identity, {"success": True, "msg": "pong"})
-            elif req_type == 'check_collection':
-                exists = check_existing_collection(sanitize_collection_name(request.get('path')))
-                return self.send_to_client(identity, {"success": True, "exists": exists})
-            elif req_type == 'codebase':
-                response = codebase_rag_handler(request)
-            else:
-                response = docs_rag_handler(request)
+            task = {
+                'identity': identity,
+                'content_type': content_type,
+                'request': None,
+                'payload': payload,
+                'job': None,
+                'kind': 'upload',
+                'received': time.perf_counter(),
+                'received_at': time.time(),
+            }
+            if len(payload) > settings.SERVER_INLINE_DECODE_BYTES:
+                # Only ingestion sends payloads this big; decode it on a heavy
+                # worker rather than stall the fast lane behind it. Its type
+                # isn't known yet, so it waits under the 'upload' limit and
+                # its request_id is registered once a worker decodes it
+                parse_content_type(content_type)
+                if self._admit(task):
+                    self._enqueue(self.lanes[HEAVY_LANE], task)
+                return
+
+            request = decode_request(payload.buffer, content_type)
+            task.update(request=request, payload=None, kind=request.get('type') or 'none')
+
+            if request.get('type') == 'ping':
+                return self.send_to_client(
+                    identity,
+                    {"success": True, "msg": "pong", "content_types": supported_content_types()},
+                    content_type,
+                )
+
+            if request.get('type') == 'stats':
+                return self.send_to_client(identity, {"success": True, **metrics.snapshot()}, content_type)
 
-            self.send_to_client(identity, response)
+            if not self._admit(task):
+                return
+            if request.get('type') == 'index':
+                # Raises on a bad request, so nothing is registered for it yet
+                task['job'] = create_index_job(request)
+            if cancellable_id(request):
+                # Cancellable by id while it waits as well as while it runs
+                register_request(cancellable_id(request), identity)
 
+            if task['job'] is not None:
+                # Acknowledge right away; progress follows as pushes or polls
+                self.send_to_client(identity, {"success": True, **task['job'].snapshot()}, content_type)
+                return self._enqueue(self.lanes[HEAVY_LANE], task)
+
+            self._enqueue(self.lanes[request_lane(request)], task)
+
+        except UnsupportedContentType as e:
+            logger.warning(f"Rejected request: {e}")
+            # Answer in JSON without a content-type frame, which every client reads
+            self.send_to_client(identity, {"success": False, "error": str(e), "content_types": supported_content_types()})
         except Exception as e:
             logger.error(f"Request failed: {e}")
             # Ensure identity is defined before using it here
             if 'identity' in locals():
-                self.send_to_client(identity, {"success": False, "error": str(e)})
+                self.send_to_client(identity, {"success": False, "error": str(e)}, content_type)
+
+    def _touch_client(self, identity: bytes):
+        client = self.clients.pop(identity, None) or {'first_seen': time.time(), 'requests': 0}
+        client['last_seen'] = time.time()
+        client['requests'] += 1
+        self.clients[identity] = client
+        while len(self.clients) > settings.SERVER_MAX_CLIENTS:
+            self.clients.popitem(last=False)
+
+    def _admit(self, task: dict) -> bool:
+        """Reject a request with `busy` when too many of its type are already waiting"""
+        kind = task['kind']
+        limit = settings.SERVER_QUEUE_LIMITS.get(kind, settings.SERVER_QUEUE_LIMIT)
+        if self._queued.get(kind, 0) < limit:
+            return True
+        metrics.inc('rejected_busy', type=metric_type(kind))
+        self.send_to_client(
+            task['identity'],
+            {
+                "success": False,
+                "busy": True,
+                "error": f"Server busy: {limit} '{kind}' requests already queued",
+                "retry_after_ms": settings.SERVER_BUSY_RETRY_MS,
+            },
+            task['content_type'],
+        )
+        return False
+
+    def _enqueue(self, lane: dict, task: dict):
+        self._queued[task['kind']] = self._queued.get(task['kind'], 0) + 1
+        lane['pending'].append(task)
+        self._dispatch(lane)
+
+    def _dispatch(self, lane: dict):
+        while lane['idle'] and lane['pending']:
+            worker = lane['idle'].popleft()
+            task = lane['pending'].popleft()
+            self._queued[task['kind']] -= 1
+            task_id = str(self._next_task).encode()
+            self._next_task += 1
+            self.tasks[task_id] = task
+            lane['backend'].send_multipart([worker, task_id])
+        metrics.set_gauge('queue_depth', len(lane['pending']), lane=lane['name'])
+        metrics.set_gauge('busy_workers', lane['workers'] - len(lane['idle']), lane=lane['name'])
 
+    def _reap_finished_jobs(self):
+        """Drop queued index jobs that were cancelled before a worker took them.
 
-    def send_to_client(self, client_id: bytes, data: dict):
-        self.socket.send_multipart([
-            client_id,
-            b'',
-            json.dumps(data).encode()
-        ])
+        Nothing ran them, so nothing pushed their final state either: tell
+        subscribed clients here, or they would wait for progress forever.
+        """
+        lane = self.lanes[HEAVY_LANE]
+        finished = [task for task in lane['pending'] if task['job'] is not None and task['job'].status in FINISHED]
+        for task in finished:
+            lane['pending'].remove(task)
+            self._queued[task['kind']] -= 1
+            if cancellable_id(task['request']):
+                # No worker will run it, so its request_id is never released otherwise
+                release_request(cancellable_id(task['request']), task['identity'])
+            if task['request'].get('subscribe'):
+                self.send_to_client(
+                    task['identity'],
+                    {"event": "job_progress", **task['job'].snapshot()},
+                    task['content_type'],
+                )
+
+    def _dump_metrics(self):
+        if not settings.METRICS_PROMETHEUS_FILE or time.monotonic() < self._next_metrics_dump:
+            return
+        self._next_metrics_dump = time.monotonic() + settings.METRICS_DUMP_INTERVAL
+        try:
+            metrics.dump_prometheus(settings.METRICS_PROMETHEUS_FILE)
+        except OSError as e:
+            logger.warning(f"Could not write metrics to {settings.METRICS_PROMETHEUS_FILE}: {e}")
+
+    def _handle_worker_message(self, lane: dict):
+        worker, kind, *rest = lane['backend'].recv_multipart()
+        if kind in (REPLY, PUSH):
+            self._send_frames(*rest)
+        if kind in (READY, REPLY, DONE):
+            lane['idle'].append(worker)
+            self._dispatch(lane)
+
+    def _send_frames(self, client_id: bytes, content_type: bytes, payload: bytes):
+        # Clients that sent a content-type frame get one back; others get bare JSON
+        frames = [client_id, b'', content_type, payload] if content_type else [client_id, b'', payload]
+        self.socket.send_multipart(frames, copy=False)
+
+    def send_to_client(self, client_id: bytes, data: dict, content_type: str = ''):
+        self._send_frames(client_id, content_type.encode(), encode(data, content_type))
 
     def _setup_signal_handlers(self):
         signal.signal(signal.SIGINT, self.shutdown)
@@ -98,8 +324,19 @@ class ZeroMQServer:
     def shutdown(self, *_):
         print("\n\nServer shutdown initiated.")
         self.running = False
+
+    def _close(self):
+        # Idle workers exit within a poll interval; a worker stuck in a long
+        # request is a daemon thread and dies with the process
+        self._stop_workers.set()
+        for thread in self._threads:
+            thread.join(timeout=settings.SERVER_SHUTDOWN_GRACE)
+        for lane in self.lanes.values():
+            lane['backend'].close()
+        self.outbox.close()
         self.socket.close()
-        self.context.term()
+        if not any(thread.is_alive() for thread in self._threads):
+            self.context.term()
         logger.info("Server shutdown complete.")
 
 if __name__ == "__main__":
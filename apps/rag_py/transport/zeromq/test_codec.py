@@ -0,0 +1,37 @@
+import pytest
+
+from apps.rag_py.transport.zeromq import codec
+from apps.rag_py.transport.zeromq.codec import UnsupportedContentType, decode, encode, supported_content_types
+
+REQUEST = {"type": "chat", "query": "what does ünïcode do?", "top_k": 5, "paths": ["a.py", "b.py"], "nested": {"ok": True}}
+
+
+@pytest.mark.parametrize("content_type", supported_content_types())
+def test_round_trip(content_type):
+    assert decode(encode(REQUEST, content_type), content_type) == REQUEST
+
+
+@pytest.mark.parametrize("content_type", supported_content_types())
+def test_decodes_memoryview_frames(content_type):
+    assert decode(memoryview(encode(REQUEST, content_type)), content_type) == REQUEST
+
+
+def test_no_content_type_means_json():
+    assert encode(REQUEST) == encode(REQUEST, codec.JSON)
+    assert decode(b'{"type": "chat"}') == {"type": "chat"}
+
+
+@pytest.mark.parametrize("content_type", ["text/plain", "application/json+gzip", "application/msgpack+br"])
+def test_rejects_unknown_content_types(content_type):
+    with pytest.raises(UnsupportedContentType):
+        decode(b"{}", content_type)
+
+
+def test_rejects_codecs_that_are_not_installed(monkeypatch):
+    monkeypatch.setattr(codec, "_module", lambda name: None)
+
+    assert supported_content_types() == [codec.JSON]
+    with pytest.raises(UnsupportedContentType):
+        encode(REQUEST, "application/json+zstd")
+    with pytest.raises(UnsupportedContentType):
+        encode(REQUEST, codec.MSGPACK)
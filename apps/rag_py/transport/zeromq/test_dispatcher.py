@@ -0,0 +1,300 @@
+import json
+import threading
+import time
+
+import pytest
+import zmq
+
+from apps.rag_py.services.job_manager import job_manager
+from apps.rag_py.transport.zeromq import dispatcher
+from apps.rag_py.transport.zeromq.dispatcher import (
+    BROKER_OUTBOX,
+    FAST_LANE,
+    HEAVY_LANE,
+    PUSH,
+    READY,
+    REPLY,
+    _serve_task,
+    accept_stream_batch,
+    create_index_job,
+    handle_job_request,
+    iter_stream_batches,
+    post_to_broker,
+    request_lane,
+    run_index_job,
+    run_worker,
+)
+from apps.rag_py.transport.zeromq.server import ZeroMQServer
+from apps.rag_py.utils import cancellation
+from apps.rag_py.utils.cancellation import cancel_request, register_request
+
+
+class RecordingSocket:
+    """Stands in for a worker's DEALER socket and keeps what it was sent"""
+
+    def __init__(self):
+        self.sent = []
+
+    def send_multipart(self, frames, copy=True):
+        kind, identity, _, payload = frames
+        self.sent.append((kind, identity, json.loads(bytes(payload))))
+
+    def send(self, frame):
+        self.sent.append((frame, None, None))
+
+
+def _task(request: dict, identity: bytes = b"client", job=None) -> dict:
+    return {
+        'identity': identity,
+        'content_type': '',
+        'request': request,
+        'payload': None,
+        'job': job,
+        'kind': request.get('type'),
+        'received': time.perf_counter(),
+        'received_at': time.time(),
+    }
+
+
+@pytest.fixture(autouse=True)
+def forget_requests():
+    yield
+    cancellation._active.clear()
+
+
+@pytest.fixture
+def server():
+    server = ZeroMQServer(fast_workers=1, heavy_workers=1)
+    yield server
+    for lane in server.lanes.values():
+        lane['backend'].close()
+    server.outbox.close()
+    server.socket.close()
+    server.context.term()
+
+
+def test_cancel_only_reaches_the_senders_own_request():
+    event = register_request("shared", b"client-a")
+    register_request("shared", b"client-b")
+
+    assert handle_job_request({"type": "cancel", "request_id": "shared"}, b"client-c")["success"] is False
+    assert handle_job_request({"type": "cancel", "request_id": "shared"}, b"client-a")["success"] is True
+    assert event.is_set()
+    assert cancel_request("shared", b"client-b") is True
+
+
+def test_request_dropped_for_its_deadline_releases_its_id():
+    register_request("late", b"client")
+    socket = RecordingSocket()
+    _serve_task(socket, _task({"type": "doc", "request_id": "late", "deadline": time.time() - 1}))
+
+    [(kind, identity, response)] = socket.sent
+    assert (kind, identity) == (REPLY, b"client")
+    assert response["deadline_exceeded"] is True
+    assert cancel_request("late", b"client") is False
+
+
+def test_reaped_job_releases_its_id(server):
+    job = job_manager.create('codebase', 'c')
+    register_request("queued", b"client")
+    server.lanes[HEAVY_LANE]['pending'].append(_task({"type": "index", "request_id": "queued"}, job=job))
+    server._queued['index'] = 1
+
+    job_manager.cancel(job.id)
+    server._reap_finished_jobs()
+
+    assert not server.lanes[HEAVY_LANE]['pending']
+    assert cancel_request("queued", b"client") is False
+
+
+def test_frames_posted_from_another_thread_reach_the_client(server, monkeypatch):
+    sent = []
+
+    def record(*frames):
+        sent.append(frames)
+        server.running = False
+
+    monkeypatch.setattr(server, "_send_frames", record)
+    server.outbox.bind(BROKER_OUTBOX)
+    server.poller.register(server.outbox, zmq.POLLIN)
+    thread = threading.Thread(target=post_to_broker, args=(server.context, [PUSH, b"client", b"", b"{}"]))
+    thread.start()
+    thread.join()
+
+    # Stop the loop even if nothing arrives
+    timer = threading.Timer(5, setattr, (server, "running", False))
+    timer.start()
+    server.running = True
+    server._event_loop()
+    timer.cancel()
+
+    assert sent == [(b"client", b"", b"{}")]
+
+
+def test_cheap_requests_take_the_fast_lane():
+    assert request_lane({"type": "check_collection"}) == FAST_LANE
+    assert request_lane({"type": "doc", "chat_type": "chat_message"}) == FAST_LANE
+    assert request_lane({"type": "codebase", "chat_type": "init_chat"}) == FAST_LANE
+    assert request_lane({"type": "doc", "chat_type": "init_chat"}) == HEAVY_LANE
+    assert request_lane({"type": "index"}) == HEAVY_LANE
+
+
+def test_busy_heavy_lane_does_not_hold_up_the_fast_lane(server):
+    fast, heavy = server.lanes[FAST_LANE], server.lanes[HEAVY_LANE]
+    fast['idle'].append(b"fast-worker")
+    server._enqueue(heavy, _task({"type": "agent"}))
+    server._enqueue(fast, _task({"type": "check_collection"}))
+
+    assert len(heavy['pending']) == 1 and not fast['pending']
+    assert [task['kind'] for task in server.tasks.values()] == ["check_collection"]
+
+    heavy['idle'].append(b"heavy-worker")
+    server._dispatch(heavy)
+    assert not heavy['pending']
+    assert server._queued == {"agent": 0, "check_collection": 0}
+
+
+def test_worker_answers_tasks_handed_over_by_id():
+    context = zmq.Context()
+    backend = context.socket(zmq.ROUTER)
+    backend.bind("inproc://test-workers")
+    tasks, stop = {}, threading.Event()
+    thread = threading.Thread(target=run_worker, args=(context, "inproc://test-workers", tasks, stop))
+    thread.start()
+    try:
+        worker, kind = backend.recv_multipart()
+        assert kind == READY
+
+        tasks[b"1"] = _task({"type": "job_status"})
+        backend.send_multipart([worker, b"1"])
+        assert backend.poll(5000)
+        _, kind, identity, _, payload = backend.recv_multipart()
+
+        assert (kind, identity) == (REPLY, b"client")
+        assert json.loads(payload)["success"] is True
+        assert tasks == {}
+    finally:
+        stop.set()
+        thread.join()
+        backend.close()
+        context.term()
+
+
+@pytest.mark.parametrize("request_", [
+    {"type": "index"},
+    {"type": "index", "target": "agent", "urls": "https://example.com"},
+    {"type": "index", "target": "docs"},
+])
+def test_invalid_index_requests_create_no_job(request_):
+    with pytest.raises(ValueError):
+        create_index_job(request_)
+
+
+def test_index_job_reports_progress_until_done(monkeypatch):
+    def ingest_codebase(request, progress):
+        progress('embed', total=2, embedded=2)
+        return None, {"success": True}
+
+    monkeypatch.setattr(dispatcher, "ingest_codebase", ingest_codebase)
+    job = create_index_job({"type": "index", "path": "/repo"})
+    seen = []
+    job.listener = seen.append
+
+    run_index_job(job, {"type": "index", "path": "/repo"})
+
+    assert [snapshot['status'] for snapshot in seen] == ["running", "running", "done"]
+    assert seen[1]['embedded'] == 2
+    status = handle_job_request({"type": "job_status", "job_id": job.id})
+    assert status['status'] == "done" and status['result'] == {"success": True}
+
+
+def test_cancelled_queued_job_never_runs(monkeypatch):
+    monkeypatch.setattr(dispatcher, "ingest_codebase", pytest.fail)
+    job = create_index_job({"type": "index", "path": "/repo"})
+
+    assert handle_job_request({"type": "cancel", "job_id": job.id})['status'] == "cancelled"
+    run_index_job(job, {"type": "index", "path": "/repo"})
+    assert job.status == "cancelled"
+
+
+def test_reaped_job_tells_its_subscriber(server, monkeypatch):
+    sent = []
+    monkeypatch.setattr(server, "send_to_client", lambda identity, data, content_type='': sent.append((identity, data)))
+    job = job_manager.create('codebase', 'c')
+    server.lanes[HEAVY_LANE]['pending'].append(_task({"type": "index", "subscribe": True}, job=job))
+    server._queued['index'] = 1
+
+    job_manager.cancel(job.id)
+    server._reap_finished_jobs()
+
+    [(identity, data)] = sent
+    assert identity == b"client"
+    assert (data['event'], data['status']) == ("job_progress", "cancelled")
+
+
+def test_stream_batches_are_queued_undecoded_and_bounded(monkeypatch):
+    monkeypatch.setattr(dispatcher.settings, "INDEX_STREAM_MAX_QUEUED", 1)
+    job = create_index_job({"type": "index", "path": "/repo", "stream": True})
+    first = zmq.Frame(json.dumps({"entities": [{"entity_name": "f"}]}).encode())
+
+    assert accept_stream_batch(job.id, "", first)['success'] is True
+    assert accept_stream_batch(job.id, "", zmq.Frame(b"[]"))['busy'] is True
+
+    batches = iter_stream_batches(job)
+    assert next(batches) == [{"entity_name": "f"}]
+    assert accept_stream_batch(job.id, "", zmq.Frame(b""))['success'] is True
+    assert list(batches) == []
+
+
+def test_streamed_job_syncs_batches_as_they_arrive(monkeypatch):
+    received = []
+
+    def sync_codebase_stream(collection_name, batches, progress):
+        for batch in batches:
+            received.append(batch)
+        return {"success": True}
+
+    monkeypatch.setattr(dispatcher, "sync_codebase_stream", sync_codebase_stream)
+    job = create_index_job({"type": "index", "path": "/repo", "stream": True})
+    thread = threading.Thread(target=run_index_job, args=(job, {}))
+    thread.start()
+
+    for body in (b'{"entities": [1]}', b'[2]', b''):
+        while accept_stream_batch(job.id, "", zmq.Frame(body)).get('busy'):
+            time.sleep(0.01)
+    thread.join(5)
+
+    assert received == [[1], [2]]
+    assert job.status == "done"
+    assert accept_stream_batch(job.id, "", zmq.Frame(b"[]"))['success'] is False
+
+
+def test_batches_for_unknown_jobs_are_rejected():
+    assert accept_stream_batch("missing", "", zmq.Frame(b"[]"))['success'] is False
+
+
+def test_requests_beyond_their_queue_limit_are_answered_busy(server, monkeypatch):
+    monkeypatch.setattr(dispatcher.settings, "SERVER_QUEUE_LIMITS", {"agent": 1})
+    sent = []
+    monkeypatch.setattr(server, "send_to_client", lambda identity, data, content_type='': sent.append(data))
+
+    assert server._admit(_task({"type": "agent"}))
+    server._enqueue(server.lanes[HEAVY_LANE], _task({"type": "agent"}))
+    assert not server._admit(_task({"type": "agent"}))
+    assert server._admit(_task({"type": "doc"}))
+
+    [busy] = sent
+    assert busy['busy'] is True and busy['retry_after_ms'] > 0
+
+
+def test_request_cancelled_while_queued_never_runs(monkeypatch):
+    monkeypatch.setattr(dispatcher, "handle_request", pytest.fail)
+    register_request("r", b"client")
+    cancel_request("r", b"client")
+    socket = RecordingSocket()
+
+    _serve_task(socket, _task({"type": "doc", "request_id": "r"}))
+
+    [(kind, _, response)] = socket.sent
+    assert kind == REPLY and response['cancelled'] is True
+    assert cancel_request("r", b"client") is False
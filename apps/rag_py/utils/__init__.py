@@ -1,5 +1,24 @@
+from .cancellation import (
+    DeadlineExceeded,
+    RequestCancelled,
+    cancel_request,
+    check_cancelled,
+    request_scope,
+)
 from .extract_pdf_text import extract_pdf_text
+from .metrics import Metrics, metrics
 from .sanitize_collection_name import sanitize_collection_name
 from .sanitize_text import sanitize_text
 
-__all__ = ['extract_pdf_text', 'sanitize_collection_name', 'sanitize_text']
\ No newline at end of file
+__all__ = [
+    'DeadlineExceeded',
+    'RequestCancelled',
+    'cancel_request',
+    'check_cancelled',
+    'request_scope',
+    'extract_pdf_text',
+    'Metrics',
+    'metrics',
+    'sanitize_collection_name',
+    'sanitize_text',
+]
@@ -0,0 +1,69 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+
+class RequestCancelled(Exception):
+    pass
+
+
+class DeadlineExceeded(RequestCancelled):
+    pass
+
+
+_local = threading.local()
+# (owner, request_id) -> cancel event, for requests that are queued or running.
+# The owner is the client identity, so two clients reusing a request_id
+# can't cancel each other's requests
+_active: dict[tuple[bytes, str], threading.Event] = {}
+_active_lock = threading.Lock()
+
+
+def register_request(request_id: str, owner: bytes = b'') -> threading.Event:
+    """Make a request cancellable by id from the moment it is queued"""
+    with _active_lock:
+        return _active.setdefault((owner, request_id), threading.Event())
+
+
+def release_request(request_id: str, owner: bytes = b''):
+    with _active_lock:
+        _active.pop((owner, request_id), None)
+
+
+def cancel_request(request_id: str, owner: bytes = b'') -> bool:
+    with _active_lock:
+        event = _active.get((owner, request_id))
+    if event is None:
+        return False
+    event.set()
+    return True
+
+
+@contextmanager
+def request_scope(request_id: Optional[str] = None, deadline: Optional[float] = None, owner: bytes = b''):
+    """Run the enclosed work under a cancel event and an absolute time.time() deadline"""
+    previous = getattr(_local, 'scope', None)
+    _local.scope = (request_id, register_request(request_id, owner) if request_id else None, deadline)
+    try:
+        yield
+    finally:
+        _local.scope = previous
+        if request_id:
+            release_request(request_id, owner)
+
+
+def check_cancelled():
+    """Raise if the current request was cancelled or ran past its deadline.
+
+    Long-running work calls this between batches, so a stale or cancelled
+    ingest stops at the next batch boundary instead of running to the end.
+    """
+    scope = getattr(_local, 'scope', None)
+    if scope is None:
+        return
+    request_id, event, deadline = scope
+    if event is not None and event.is_set():
+        raise RequestCancelled(f"Request {request_id} was cancelled")
+    if deadline is not None and time.time() > deadline:
+        raise DeadlineExceeded("Request deadline exceeded")
@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Optional
+
+# Upper bounds in seconds, from a cache hit to a full ingest
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def escape_label(value) -> str:
+    """Escape a label value for the Prometheus text format"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histogram:
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th observation"""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def snapshot(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+        }
+
+
+class Metrics:
+    """Per request type and stage latency histograms, counters and gauges.
+
+    Stages are decode, load, split, embed, store, retrieve and encode, plus
+    queue (waiting for a worker) and total (receipt to reply) per request.
+
+    Stage timings are exclusive: time spent in a nested stage (embedding
+    inside a store, say) is only counted for the inner stage. The request
+    type is taken from the enclosing `request()` block on the same thread.
+    """
+
+    def __init__(self):
+        self._histograms = defaultdict(Histogram)  # (request_type, stage)
+        self._counters = defaultdict(float)  # (name, labels)
+        self._gauges = {}  # (name, labels)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def request_type(self) -> str:
+        return getattr(self._local, 'request_type', None) or 'none'
+
+    @contextmanager
+    def request(self, request_type: str):
+        previous = getattr(self._local, 'request_type', None)
+        self._local.request_type = request_type
+        try:
+            yield
+        finally:
+            self._local.request_type = previous
+
+    @contextmanager
+    def stage(self, name: str):
+        stack = self._local.__dict__.setdefault('stack', [])
+        frame = [time.perf_counter(), 0.0]  # start, time spent in nested stages
+        stack.append(frame)
+        try:
+            yield
+        finally:
+            stack.pop()
+            elapsed = time.perf_counter() - frame[0]
+            if stack:
+                stack[-1][1] += elapsed
+            self.observe(name, elapsed - frame[1])
+
+    def observe(self, stage: str, seconds: float, request_type: str = None):
+        with self._lock:
+            self._histograms[(request_type or self.request_type, stage)].observe(seconds)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] += value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stages = defaultdict(dict)
+            for (request_type, stage), histogram in sorted(self._histograms.items()):
+                stages[request_type][stage] = histogram.snapshot()
+            return {
+                'stages': dict(stages),
+                'counters': [{'name': name, **dict(labels), 'value': value} for (name, labels), value in sorted(self._counters.items())],
+                'gauges': [{'name': name, **dict(labels), 'value': value} for (name, labels), value in sorted(self._gauges.items())],
+            }
+
+    def to_prometheus(self, prefix: str = 'codr') -> str:
+        def fmt(labels) -> str:
+            return '{' + ','.join(f'{k}="{escape_label(v)}"' for k, v in labels) + '}' if labels else ''
+
+        lines = [f"# TYPE {prefix}_stage_seconds histogram"]
+        with self._lock:
+            for (request_type, stage), histogram in sorted(self._histograms.items()):
+                labels = (('request_type', request_type), ('stage', stage))
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f"{prefix}_stage_seconds_bucket{fmt(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{prefix}_stage_seconds_sum{fmt(labels)} {histogram.sum}")
+                lines.append(f"{prefix}_stage_seconds_count{fmt(labels)} {histogram.count}")
+
+            for kind, values in (('counter', self._counters), ('gauge', self._gauges)):
+                typed = set()
+                for (name, labels), value in sorted(values.items()):
+                    metric = f"{prefix}_{name}_total" if kind == 'counter' else f"{prefix}_{name}"
+                    if metric not in typed:
+                        lines.append(f"# TYPE {metric} {kind}")
+                        typed.add(metric)
+                    lines.append(f"{metric}{fmt(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def dump_prometheus(self, path: str):
+        """Write the text exposition atomically, for a node_exporter textfile collector"""
+        tmp_path = f"{path}.tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(tmp_path, 'w') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+
+# Shared by the whole server process
+metrics = Metrics()
@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+
+from apps.rag_py.utils import cancellation
+from apps.rag_py.utils.cancellation import (
+    DeadlineExceeded,
+    RequestCancelled,
+    cancel_request,
+    check_cancelled,
+    register_request,
+    request_scope,
+)
+
+
+def test_check_outside_a_scope_is_a_no_op():
+    check_cancelled()
+
+
+def test_cancel_reaches_running_work():
+    with request_scope("r1"):
+        check_cancelled()
+        assert cancel_request("r1") is True
+        with pytest.raises(RequestCancelled):
+            check_cancelled()
+
+
+def test_queued_request_can_be_cancelled_before_it_runs():
+    register_request("r2")
+    assert cancel_request("r2") is True
+
+    with request_scope("r2"):
+        with pytest.raises(RequestCancelled):
+            check_cancelled()
+
+
+def test_scope_exit_releases_the_id():
+    with request_scope("r3"):
+        pass
+
+    assert "r3" not in cancellation._active
+    assert cancel_request("r3") is False
+
+
+def test_deadline():
+    with request_scope(deadline=time.time() + 60):
+        check_cancelled()
+    with request_scope(deadline=time.time() - 1):
+        with pytest.raises(DeadlineExceeded):
+            check_cancelled()
+
+
+def test_nested_scope_restores_the_outer_one():
+    with request_scope("outer"):
+        with request_scope(deadline=time.time() - 1):
+            with pytest.raises(DeadlineExceeded):
+                check_cancelled()
+        check_cancelled()
+        cancel_request("outer")
+        with pytest.raises(RequestCancelled):
+            check_cancelled()
+
+
+def test_scopes_are_per_thread():
+    errors = []
+
+    def other_thread():
+        try:
+            check_cancelled()
+        except RequestCancelled as e:
+            errors.append(e)
+
+    with request_scope("r4"):
+        cancel_request("r4")
+        thread = threading.Thread(target=other_thread)
+        thread.start()
+        thread.join()
+
+    assert errors == []
+
+
+def test_same_request_id_from_two_clients_is_cancelled_separately():
+    first = register_request("shared", b"client-a")
+    second = register_request("shared", b"client-b")
+
+    assert cancel_request("shared", b"client-a") is True
+    assert first.is_set() and not second.is_set()
+    assert cancel_request("shared", b"client-c") is False
+
+    cancellation.release_request("shared", b"client-a")
+    cancellation.release_request("shared", b"client-b")
+    assert not cancellation._active
@@ -0,0 +1,25 @@
+from apps.rag_py.utils.metrics import Metrics
+
+
+def test_stage_times_exclude_nested_stages():
+    metrics = Metrics()
+    with metrics.request("index"):
+        with metrics.stage("store"):
+            with metrics.stage("embed"):
+                pass
+
+    stages = metrics.snapshot()["stages"]["index"]
+    assert stages["store"]["count"] == 1
+    assert stages["embed"]["count"] == 1
+
+
+def test_prometheus_label_values_are_escaped():
+    metrics = Metrics()
+    metrics.inc("requests", type='a"b\\c\nd')
+    metrics.observe("total", 0.2, request_type='x"y')
+
+    text = metrics.to_prometheus()
+    assert 'codr_requests_total{type="a\\"b\\\\c\\nd"} 1' in text
+    assert 'codr_stage_seconds_count{request_type="x\\"y",stage="total"} 1' in text
+    # Every sample stays on its own line
+    assert all(line.startswith(("#", "codr_")) for line in text.splitlines())